@@ -0,0 +1,329 @@
+"""
+Module for asynchronous (asyncio) audio input and tokenization, so that one event loop
+can read and tokenize many audio streams at once (e.g. streams received by a server).
+This module requires Python 3.6 or newer and is not imported by `auditok`, use:
+
+.. code:: python
+
+    from auditok.aio import AsyncStreamAudioSource, AsyncAudioDataSource
+
+Audio sources have the same parameters as those of :mod:`auditok.io`, but
+`open`, `close` and `read` are coroutines.
+
+Class summary
+=============
+
+.. autosummary::
+
+        AsyncAudioSource
+        AsyncStreamAudioSource
+        AsyncStdinAudioSource
+        AsyncExecutorAudioSource
+        AsyncAudioDataSource
+
+:Example:
+
+.. code:: python
+
+    async def handle_client(reader, writer):
+        tokenizer = StreamTokenizer(AudioEnergyValidator(sample_width=2, energy_threshold=50),
+                                    min_length=20, max_length=400, max_continuous_silence=30)
+        source = AsyncAudioDataSource(AsyncStreamAudioSource(reader), block_dur=0.01)
+        await source.open()
+        async for data, start, end in tokenizer.atokenize(source):
+            do_something(data, start, end)
+        await source.close()
+
+    server = await asyncio.start_server(handle_client, port=8888)
+"""
+
+from abc import ABCMeta, abstractmethod
+import asyncio
+import copy
+import sys
+
+from .io import DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH, DEFAULT_NB_CHANNELS
+
+__all__ = ["AsyncAudioSource", "AsyncStreamAudioSource", "AsyncStdinAudioSource",
+           "AsyncExecutorAudioSource", "AsyncAudioDataSource"]
+
+
+class AsyncAudioSource():
+    """
+    Base class for asynchronous audio sources, the counterpart of
+    :class:`auditok.io.AudioSource` where :func:`open`, :func:`close`
+    and :func:`read` are coroutines.
+
+    :Parameters:
+
+        `sampling_rate` : int
+            Number of samples per second of audio stream. Default = 16000.
+
+        `sample_width` : int
+            Size in bytes of one audio sample. Possible values : 1, 2, 4.
+            Default = 2.
+
+        `channels` : int
+            Number of channels of audio stream. Default = 1.
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self, sampling_rate=DEFAULT_SAMPLE_RATE,
+                 sample_width=DEFAULT_SAMPLE_WIDTH,
+                 channels=DEFAULT_NB_CHANNELS):
+
+        if not sample_width in (1, 2, 4):
+            raise ValueError("Sample width must be one of: 1, 2 or 4 (bytes)")
+
+        if channels < 1:
+            raise ValueError("Number of channels must be >= 1")
+
+        self._sampling_rate = sampling_rate
+        self._sample_width = sample_width
+        self._channels = channels
+
+    @abstractmethod
+    def is_open(self):
+        """ Return True if audio source is open, False otherwise """
+
+    @abstractmethod
+    async def open(self):
+        """ Open audio source """
+
+    @abstractmethod
+    async def close(self):
+        """ Close audio source """
+
+    @abstractmethod
+    async def read(self, size):
+        """
+        Read and return `size` audio samples at most, None if there is no more data.
+
+        :Parameters:
+
+            `size` : int
+                the number of samples to read.
+        """
+
+    def get_sampling_rate(self):
+        """ Return the number of samples per second of audio stream """
+        return self.sampling_rate
+
+    @property
+    def sampling_rate(self):
+        """ Number of samples per second of audio stream """
+        return self._sampling_rate
+
+    def get_sample_width(self):
+        """ Return the number of bytes used to represent one audio sample """
+        return self.sample_width
+
+    @property
+    def sample_width(self):
+        """ Number of bytes used to represent one audio sample """
+        return self._sample_width
+
+    def get_channels(self):
+        """ Return the number of channels of this audio source """
+        return self.channels
+
+    @property
+    def channels(self):
+        """ Number of channels of this audio source """
+        return self._channels
+
+
+class AsyncStreamAudioSource(AsyncAudioSource):
+    """
+    An :class:`AsyncAudioSource` that reads data from an `asyncio.StreamReader`, e.g. a
+    socket connection (see `asyncio.open_connection` and `asyncio.start_server`) or the
+    standard output of a subprocess. The stream is not closed by :func:`close`.
+
+    :Parameters:
+
+        `reader` : `asyncio.StreamReader`
+            the stream to read raw audio data from
+
+        `sampling_rate`, `sample_width`, `channels` :
+            see :class:`AsyncAudioSource`
+    """
+
+    def __init__(self, reader, sampling_rate=DEFAULT_SAMPLE_RATE,
+                 sample_width=DEFAULT_SAMPLE_WIDTH,
+                 channels=DEFAULT_NB_CHANNELS):
+
+        AsyncAudioSource.__init__(self, sampling_rate, sample_width, channels)
+        self._reader = reader
+        self._is_open = False
+
+    def is_open(self):
+        return self._is_open
+
+    async def open(self):
+        self._is_open = True
+
+    async def close(self):
+        self._is_open = False
+
+    async def read(self, size):
+        if not self._is_open:
+            raise IOError("Stream is not open")
+
+        frame_size = self.sample_width * self.channels
+        try:
+            return await self._reader.readexactly(size * frame_size)
+        except asyncio.IncompleteReadError as e:
+            # end of stream, drop an incomplete sample if any
+            data = e.partial[:len(e.partial) - len(e.partial) % frame_size]
+            if len(data) < 1:
+                return None
+            return data
+
+
+class AsyncStdinAudioSource(AsyncStreamAudioSource):
+    """
+    An :class:`AsyncAudioSource` that reads data from standard input. Standard input
+    must be a pipe, a socket or a character device (e.g. `cat file.raw | program`),
+    use an :class:`AsyncExecutorAudioSource` to read data from a regular file.
+    """
+
+    def __init__(self, sampling_rate=DEFAULT_SAMPLE_RATE,
+                 sample_width=DEFAULT_SAMPLE_WIDTH,
+                 channels=DEFAULT_NB_CHANNELS):
+
+        AsyncStreamAudioSource.__init__(self, None, sampling_rate, sample_width, channels)
+        self._transport = None
+
+    async def open(self):
+        if self._transport is None:
+            loop = asyncio.get_event_loop()
+            self._reader = asyncio.StreamReader()
+            protocol = asyncio.StreamReaderProtocol(self._reader)
+            self._transport, _ = await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+        self._is_open = True
+
+    async def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            self._reader = None
+        self._is_open = False
+
+
+class AsyncExecutorAudioSource(AsyncAudioSource):
+    """
+    An :class:`AsyncAudioSource` that runs the (blocking) methods of an
+    :class:`auditok.io.AudioSource` in an executor, so that reading a file
+    (e.g. with :class:`auditok.io.WaveAudioSource`) does not block the event loop.
+
+    :Parameters:
+
+        `audio_source` : :class:`auditok.io.AudioSource`
+            the audio source to read data from
+
+        `executor` : `concurrent.futures.Executor`
+            executor to run methods of `audio_source` in. Default: None, i.e.
+            the default executor of the event loop.
+    """
+
+    def __init__(self, audio_source, executor=None):
+
+        AsyncAudioSource.__init__(self, audio_source.get_sampling_rate(),
+                                  audio_source.get_sample_width(),
+                                  audio_source.get_channels())
+        self._audio_source = audio_source
+        self._executor = executor
+
+    def get_audio_source(self):
+        """ Return the audio source data is read from """
+        return self._audio_source
+
+    def _run(self, function, *args):
+        return asyncio.get_event_loop().run_in_executor(self._executor, function, *args)
+
+    def is_open(self):
+        return self._audio_source.is_open()
+
+    async def open(self):
+        await self._run(self._audio_source.open)
+
+    async def close(self):
+        await self._run(self._audio_source.close)
+
+    async def read(self, size):
+        return await self._run(self._audio_source.read, size)
+
+
+class AsyncAudioDataSource():
+    """
+    The asynchronous counterpart of :class:`auditok.util.ADSFactory.AudioDataSource`:
+    :func:`read` is a coroutine that returns one block of audio data. This is the data
+    source to use with :func:`auditok.core.StreamTokenizer.atokenize`.
+
+    :Parameters:
+
+        `audio_source` : :class:`AsyncAudioSource`
+            the audio source to read data from
+
+        `block_size` : int
+            number of samples of each block. Default: as many samples as `block_dur`.
+
+        `block_dur` : float
+            duration of each block in seconds, used if `block_size` is None. Default: 0.01.
+    """
+
+    def __init__(self, audio_source, block_size=None, block_dur=0.01):
+
+        if block_size is None:
+            block_size = int(audio_source.get_sampling_rate() * block_dur)
+        if block_size <= 0:
+            raise ValueError("block_size must be > 0")
+
+        self.audio_source = audio_source
+        self.block_size = block_size
+
+    def get_block_size(self):
+        return self.block_size
+
+    def get_audio_source(self):
+        return self.audio_source
+
+    def get_sampling_rate(self):
+        return self.audio_source.get_sampling_rate()
+
+    def get_sample_width(self):
+        return self.audio_source.get_sample_width()
+
+    def get_channels(self):
+        return self.audio_source.get_channels()
+
+    def is_open(self):
+        return self.audio_source.is_open()
+
+    async def open(self):
+        await self.audio_source.open()
+
+    async def close(self):
+        await self.audio_source.close()
+
+    async def read(self):
+        return await self.audio_source.read(self.block_size)
+
+
+async def _atokenize(tokenizer, data_source):
+    # Work on a copy so that many streams can be tokenized at once with the same
+    # tokenizer, frames are pushed to the automaton with 'feed'. Each stream has
+    # its own validator as some validators keep a state between frames (e.g.
+    # the noise floor of an AdaptiveEnergyValidator)
+    tokenizer = copy.copy(tokenizer)
+    tokenizer.validator = copy.deepcopy(tokenizer.validator)
+    tokenizer._feeding = False
+    while True:
+        frame = await data_source.read()
+        if frame is None:
+            break
+        for token in tokenizer.feed((frame,)):
+            yield token
+    for token in tokenizer.flush():
+        yield token
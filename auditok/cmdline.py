@@ -42,11 +42,18 @@ try:
     WITH_PYDUB = True
 except ImportError:
     WITH_PYDUB = False
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
     
 
 from .core import StreamTokenizer
-from .io import PyAudioSource, BufferAudioSource, StdinAudioSource, player_for
-from .util import ADSFactory, AudioEnergyValidator
+from .io import PyAudioSource, BufferAudioSource, WaveAudioSource, MmapWaveAudioSource, StdinAudioSource, \
+    FFmpegAudioSource, player_for, DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH, DEFAULT_NB_CHANNELS, \
+    _WITH_MMAP_BUFFERS
+from .util import ADSFactory, AudioEnergyValidator, EnergyIndex, EnergyHistogram
 from auditok import __version__ as version
 
 __all__ = []
@@ -74,50 +81,66 @@ def file_to_audio_source(filename, filetype=None, **kwargs):
     if filetype is not None:
         filetype = filetype.lower()
     
-    if filetype == "raw" or (filetype is None and lower_fname.endswith(".raw")):
-        
-        srate = kwargs.pop("sampling_rate", None)
-        if srate is None:
-            srate = kwargs.pop("sr", None)
-            
-        swidth = kwargs.pop("sample_width", None)
-        if swidth is None:
-            swidth = kwargs.pop("sw", None)
+    srate = kwargs.pop("sampling_rate", None)
+    if srate is None:
+        srate = kwargs.pop("sr", None)
         
-        ch = kwargs.pop("channels", None)
-        if ch is None:
-            ch = kwargs.pop("ch", None)
+    swidth = kwargs.pop("sample_width", None)
+    if swidth is None:
+        swidth = kwargs.pop("sw", None)
+    
+    ch = kwargs.pop("channels", None)
+    if ch is None:
+        ch = kwargs.pop("ch", None)
+    
+    if filetype == "raw" or (filetype is None and lower_fname.endswith(".raw")):
         
         if None in (swidth, srate, ch):
             raise Exception("All audio parameters are required for raw data") 
         
-        data = open(filename).read()
+        data = open(filename, "rb").read()
         rawdata = True
+    
+    elif filetype in ("wav", "wave") or (filetype is None and lower_fname.endswith(".wav")):
+        
+        # audio data is mapped into memory rather than read at once, a channel
+        # is selected by the validator, pydub is not needed
+        if _WITH_MMAP_BUFFERS:
+            return MmapWaveAudioSource(filename)
+        return WaveAudioSource(filename)
+    
+    elif which("ffmpeg") is not None and (None not in (srate, ch) or which("ffprobe") is not None):
+        
+        # decode data while it is read rather than decoding the whole file at once
+        # with pydub, audio parameters (if any) define the format of decoded data,
+        # the format of the file is kept otherwise (it is read with ffprobe)
+        audio_params = dict((name, value) for name, value in (("sampling_rate", srate),
+                                                               ("sample_width", swidth),
+                                                               ("channels", ch)) if value is not None)
+        return FFmpegAudioSource(filename, **audio_params)
         
     # try first with pydub
     if WITH_PYDUB:
         
+        # all channels are kept unless a channel is explicitly selected,
+        # AudioEnergyValidator can use any channel of multi-channel data
         use_channel = kwargs.pop("use_channel", None)
         if use_channel is None:
             use_channel = kwargs.pop("uc", None)
         
-        if use_channel is None:
-            use_channel = 1
-        else:
+        if use_channel is not None:
             try:
                 use_channel = int(use_channel)
             except ValueError:
                 pass
         
-        if not isinstance(use_channel, (int)) and not use_channel.lower() in ["left", "right", "mix"] :
-            raise ValueError("channel must be an integer or one of 'left', 'right' or 'mix'")
+            if not isinstance(use_channel, (int)) and not use_channel.lower() in ["left", "right", "mix"] :
+                raise ValueError("channel must be an integer or one of 'left', 'right' or 'mix'")
         
         asegment = None
         
         if rawdata:
             asegment = AudioSegment(data, sample_width=swidth, frame_rate=srate, channels=ch)
-        if filetype in("wave", "wav") or (filetype is None and lower_fname.endswith(".wav")):
-            asegment = AudioSegment.from_wav(filename)
         elif filetype == "mp3" or (filetype is None and lower_fname.endswith(".mp3")):
             asegment = AudioSegment.from_mp3(filename)
         elif filetype == "ogg" or (filetype is None and lower_fname.endswith(".ogg")):
@@ -127,7 +150,7 @@ def file_to_audio_source(filename, filetype=None, **kwargs):
         else:
             asegment = AudioSegment.from_file(filename)
             
-        if asegment.channels > 1:
+        if asegment.channels > 1 and use_channel is not None:
             
             if isinstance(use_channel, int):
                 if use_channel > asegment.channels:
@@ -153,28 +176,26 @@ def file_to_audio_source(filename, filetype=None, **kwargs):
     # fall back to standard python
     else:
         if rawdata:
-            if ch != 1:
-                raise ValueError("Cannot handle multi-channel audio without pydub")
-            return BufferAudioSource(data, srate, swidth, ch)
-    
-        if filetype in ("wav", "wave") or (filetype is None and lower_fname.endswith(".wav")):
-            
-            wfp = wave.open(filename)
-            
-            ch = wfp.getnchannels()
-            if ch != 1:
-                wfp.close()
-                raise ValueError("Cannot handle multi-channel audio without pydub")
-           
-            srate = wfp.getframerate()
-            swidth = wfp.getsampwidth()
-            data = wfp.readframes(wfp.getnframes())
-            wfp.close()
             return BufferAudioSource(data, srate, swidth, ch)
         
         raise AudioFileFormatError("Cannot read audio file format")
 
 
+def use_channel_from_option(use_channel, channels):
+    """
+    Convert the value of the `--use-channel` option (a 1-based channel number or a name)
+    into the `use_channel` argument of :class:`AudioEnergyValidator`.
+    """
+    try:
+        channel = int(use_channel)
+    except ValueError:
+        return use_channel.lower()
+    
+    if channel < 1 or channel > channels:
+        raise ValueError("Can not use channel '{0}', audio data has only {1} channels".format(channel, channels))
+    return channel - 1
+
+
 def save_audio_data(data, filename, filetype=None, **kwargs):
     
     lower_fname = filename.lower()
@@ -347,29 +368,37 @@ class TokenizerWorker(Worker):
         
     def run(self):
         
-        def notify_observers(data, start, end):
-            audio_data = b''.join(data)
-            self.count += 1
-            
-            start_time = start * self.analysis_window
-            end_time = (end+1) * self.analysis_window
-            duration = (end - start + 1) * self.analysis_window
-            
-            # notify observers
+        try:
+            self.ads.open()
+            self.tokenizer.tokenize(data_source=self, callback=self._notify_observers, offsets=True)
+        finally:
+            # observers must end even if the stream can not be opened or read (e.g. decoding error)
             for observer in self.observers:
-                observer.notify({"id" : self.count,
-                                 "audio_data" : audio_data,
-                                 "start" : start,
-                                 "end" : end,
-                                 "start_time" : start_time,
-                                 "end_time" : end_time,
-                                 "duration" : duration}
-                                )
-        
-        self.ads.open()
-        self.tokenizer.tokenize(data_source=self, callback=notify_observers)
+                observer.notify(TokenizerWorker.END_OF_PROCESSING)
+    
+    def _notify_observers(self, data, start, end):
+        # data is one contiguous buffer (tokens are delivered as byte ranges),
+        # with Python 2, bytes() returns the representation of a memoryview
+        if isinstance(data, memoryview):
+            audio_data = data.tobytes()
+        else:
+            audio_data = bytes(data) if data is not None else None
+        self.count += 1
+        
+        start_time = start * self.analysis_window
+        end_time = (end+1) * self.analysis_window
+        duration = (end - start + 1) * self.analysis_window
+        
+        # notify observers
         for observer in self.observers:
-            observer.notify(TokenizerWorker.END_OF_PROCESSING)
+            observer.notify({"id" : self.count,
+                             "audio_data" : audio_data,
+                             "start" : start,
+                             "end" : end,
+                             "start_time" : start_time,
+                             "end_time" : end_time,
+                             "duration" : duration}
+                            )
             
     def add_observer(self, observer):
         self.observers.append(observer)
@@ -382,6 +411,41 @@ class TokenizerWorker(Worker):
             return None
         else:
             return self.ads.read()
+
+    def readinto(self, buffer):
+        if self._stop_requested():
+            return 0
+        else:
+            return self.ads.readinto(buffer)
+
+    def get_block_size(self):
+        return self.ads.get_block_size()
+
+    def get_sample_width(self):
+        return self.ads.get_sample_width()
+
+    def get_channels(self):
+        return self.ads.get_channels()
+
+
+class IndexTokenizerWorker(TokenizerWorker):
+    """
+    Tokenize the log energies of an :class:`auditok.util.EnergyIndex` instead of
+    audio data. Observers receive None as audio data.
+    """
+    
+    def __init__(self, index, energy_threshold, tokenizer, analysis_window, observers):
+        TokenizerWorker.__init__(self, None, tokenizer, analysis_window, observers)
+        self.index = index
+        self.energy_threshold = energy_threshold
+    
+    def run(self):
+        try:
+            self.tokenizer.tokenize_mask(self.index.get_mask(self.energy_threshold),
+                                         callback=self._notify_observers)
+        finally:
+            for observer in self.observers:
+                observer.notify(TokenizerWorker.END_OF_PROCESSING)
     
         
 class PlayerWorker(Worker):
@@ -512,7 +576,8 @@ class LogWorker(Worker):
                 start_time = message.pop("start_time", None)
                 end_time = message.pop("end_time", None)
                 duration = message.pop("duration", None)
-                if audio_data is not None and len(audio_data) > 0:
+                # audio_data is None if detections come from an energy index
+                if audio_data is None or len(audio_data) > 0:
                     
                     if self.debug:
                         self.debug_message("[DET ]: Detection {id} (start:{start}, end:{end})".format(id=_id, 
@@ -558,7 +623,8 @@ def main(argv=None):
         group.add_option("-O", "--output-main", dest="output_main", help="Save main stream as. If omitted main stream will not be saved [default: omitted]", type=str, default=None, metavar="FILE")
         group.add_option("-o", "--output-tokens", dest="output_tokens", help="Output file name format for detections. Use {N} and {start} and {end} to build file names, example: 'Det_{N}_{start}-{end}.wav'", type=str, default=None, metavar="STRING")
         group.add_option("-T", "--output-type", dest="output_type", help="Audio type used to save detections and/or main stream. If not supplied will: (1). guess from extension or (2). use wav format", type=str, default=None, metavar="STRING")
-        group.add_option("-u", "--use-channel", dest="use_channel", help="Choose channel to use from a multi-channel audio file (requires pydub). 'left', 'right' and 'mix' are accepted values. [Default: 1 (i.e. 1st or left channel)]", type=str, default="1", metavar="STRING")
+        group.add_option("", "--energy-index", dest="energy_index", help="Directory of energy index files. The log energy of each analysis window of the input file is computed once and saved in this directory, later runs on the same file with the same analysis window and channel options read log energies from the index instead of audio data. Audio data is still read if detections are saved, played, passed to a command or plotted, if the main stream is saved or if -M is used [default: do not use an index]", type=str, default=None, metavar="DIR")
+        group.add_option("-u", "--use-channel", dest="use_channel", help="Choose channel to use from multi-channel audio data. A channel number, 'left', 'right', 'mix' (energy of the mean of channels), 'any', 'all', 'mean' or 'max' (combine the energies of all channels) are accepted values. [Default: 1 (i.e. 1st or left channel)]", type=str, default="1", metavar="STRING")
         parser.add_option_group(group)
         
         
@@ -569,13 +635,14 @@ def main(argv=None):
         group.add_option("-s", "--max-silence", dest="max_silence", help="Max duration of a consecutive silence within a valid audio event in seconds [default: %default]", type=float, default=0.3, metavar="FLOAT")
         group.add_option("-d", "--drop-trailing-silence", dest="drop_trailing_silence", help="Drop trailing silence from a detection [default: keep trailing silence]",  action="store_true", default=False)
         group.add_option("-e", "--energy-threshold", dest="energy_threshold", help="Log energy threshold for detection [default: %default]", type=float, default=50, metavar="FLOAT")
+        group.add_option("", "--auto-threshold", dest="auto_threshold", help="Compute the energy threshold from the histogram of log energies of the input file (Otsu's method) instead of using -e, and print it to STDERR. The input file is read once to compute the histogram (only once in all if --energy-index is used and detections are only printed) [default: use -e]", action="store_true", default=False)
         parser.add_option_group(group)
         
         
-        group = OptionGroup(parser, "[Audio parameters]", "Define audio parameters if data is read from a headerless file (raw or stdin) or you want to use different microphone parameters.")        
-        group.add_option("-r", "--rate", dest="sampling_rate", help="Sampling rate of audio data [default: %default]", type=int, default=16000, metavar="INT")
-        group.add_option("-c", "--channels", dest="channels", help="Number of channels of audio data [default: %default]", type=int, default=1, metavar="INT")
-        group.add_option("-w", "--width", dest="sample_width", help="Number of bytes per audio sample [default: %default]", type=int, default=2, metavar="INT")
+        group = OptionGroup(parser, "[Audio parameters]", "Define audio parameters if data is read from a headerless file (raw or stdin) or you want to use different microphone parameters. Compressed audio files (e.g. mp3, ogg) are decoded to the given parameters if ffmpeg is available, parameters that are not given are those of the file.")        
+        group.add_option("-r", "--rate", dest="sampling_rate", help="Sampling rate of audio data [default: {0} for headerless data and microphone]".format(DEFAULT_SAMPLE_RATE), type=int, default=None, metavar="INT")
+        group.add_option("-c", "--channels", dest="channels", help="Number of channels of audio data [default: {0} for headerless data and microphone]".format(DEFAULT_NB_CHANNELS), type=int, default=None, metavar="INT")
+        group.add_option("-w", "--width", dest="sample_width", help="Number of bytes per audio sample [default: {0} for headerless data and microphone]".format(DEFAULT_SAMPLE_WIDTH), type=int, default=None, metavar="INT")
         parser.add_option_group(group)
         
         group = OptionGroup(parser, "[Do something with detections]", "Use these options to print, play or plot detections.") 
@@ -596,20 +663,29 @@ def main(argv=None):
         # process options
         (opts, args) = parser.parse_args(argv)
         
+        # audio files keep their own format unless audio parameters are given,
+        # headerless data and microphone use default parameters
+        audio_params = dict(sampling_rate=opts.sampling_rate, sample_width=opts.sample_width,
+                            channels=opts.channels)
+        default_params = dict(sampling_rate=DEFAULT_SAMPLE_RATE, sample_width=DEFAULT_SAMPLE_WIDTH,
+                              channels=DEFAULT_NB_CHANNELS)
+        for name, value in default_params.items():
+            if audio_params[name] is not None:
+                default_params[name] = audio_params[name]
+        
         if opts.input == "-":
-            asource = StdinAudioSource(sampling_rate = opts.sampling_rate,
-                                       sample_width = opts.sample_width,
-                                       channels = opts.channels)
+            asource = StdinAudioSource(**default_params)
         #read data from a file
         elif opts.input is not None:
-            asource = file_to_audio_source(filename=opts.input, filetype=opts.input_type, uc=opts.use_channel)
+            input_type = opts.input_type or os.path.splitext(opts.input)[1][1:]
+            if input_type.lower() == "raw":
+                audio_params = default_params
+            asource = file_to_audio_source(filename=opts.input, filetype=opts.input_type, **audio_params)
         
         # read data from microphone via pyaudio
         else:
             try:
-                asource = PyAudioSource(sampling_rate = opts.sampling_rate,
-                                        sample_width = opts.sample_width,
-                                        channels = opts.channels)
+                asource = PyAudioSource(**default_params)
             except Exception:
                 sys.stderr.write("Cannot read data from audio device!\n")
                 sys.stderr.write("You should either install pyaudio or read data from STDIN\n")
@@ -639,7 +715,30 @@ def main(argv=None):
         record = opts.output_main is not None or opts.plot or opts.save_image is not None
                         
         ads = ADSFactory.ads(audio_source = asource, block_dur = opts.analysis_window, max_time = opts.max_time, record = record)
-        validator = AudioEnergyValidator(sample_width=asource.get_sample_width(), energy_threshold=opts.energy_threshold)
+        use_channel = use_channel_from_option(opts.use_channel, asource.get_channels())
+        
+        index = None
+        if opts.auto_threshold:
+            if opts.input is None or opts.input == "-":
+                sys.stderr.write("--auto-threshold requires an input file\n")
+                sys.exit(2)
+            if opts.energy_index is not None:
+                index = EnergyIndex.for_file(opts.input, block_size=ads.get_block_size(),
+                                             use_channel=use_channel, index_dir=opts.energy_index,
+                                             audio_source=asource)
+                histogram = EnergyHistogram()
+                histogram.update(index.get_log_energies())
+            else:
+                histogram = EnergyHistogram.compute(asource, ads.get_block_size(), use_channel)
+            threshold = histogram.otsu_threshold()
+            if threshold is None:
+                sys.stderr.write("Cannot compute an energy threshold, all frames have the same energy\n")
+                sys.exit(2)
+            opts.energy_threshold = threshold
+            sys.stderr.write("Energy threshold: {0:.2f}\n".format(threshold))
+        
+        validator = AudioEnergyValidator(sample_width=asource.get_sample_width(), energy_threshold=opts.energy_threshold,
+                                         channels=asource.get_channels(), use_channel=use_channel)
         
         
         if opts.drop_trailing_silence:
@@ -701,7 +800,20 @@ def main(argv=None):
                                    time_formatter=converter, logger=logger, debug=opts.debug)
             observers.append(log_worker)
         
-        tokenizer_worker = TokenizerWorker(ads, tokenizer, opts.analysis_window, observers)
+        # log energies are enough if detections are only printed
+        use_index = opts.energy_index is not None and opts.input is not None and opts.input != "-" and \
+            opts.output_tokens is None and not opts.echo and not opts.command and \
+            opts.output_main is None and not opts.plot and opts.save_image is None and opts.max_time is None
+        
+        if use_index:
+            if index is None:
+                index = EnergyIndex.for_file(opts.input, block_size=ads.get_block_size(),
+                                             use_channel=use_channel, index_dir=opts.energy_index,
+                                             audio_source=asource)
+            tokenizer_worker = IndexTokenizerWorker(index, opts.energy_threshold, tokenizer,
+                                                    opts.analysis_window, observers)
+        else:
+            tokenizer_worker = TokenizerWorker(ads, tokenizer, opts.analysis_window, observers)
         
         def _save_main_stream():
             # find file type
@@ -724,6 +836,9 @@ def main(argv=None):
             ads.rewind()
             data = ads.get_audio_source().get_data_buffer()
             signal = AudioEnergyValidator._convert(data, asource.get_sample_width())
+            if asource.get_channels() > 1:
+                # plot the mean of channels
+                signal = signal.reshape(-1, asource.get_channels()).mean(axis=1)
             detections = [(det[3] , det[4]) for det in log_worker.detections]
             max_amplitude = 2**(asource.get_sample_width() * 8 - 1) - 1
             energy_as_amp = np.sqrt(np.exp(opts.energy_threshold * np.log(10) / 10)) / max_amplitude
@@ -7,11 +7,76 @@ Class summary
 .. autosummary::
 
         StreamTokenizer
+        MultiStreamTokenizer
+        TokenizerSweep
 """
 
-from auditok.util import DataValidator
+import copy
+from collections import deque
+from itertools import groupby, product
+import multiprocessing
+import numbers
+import wave
+from auditok.util import DataValidator, ADSFactory, AudioEnergyValidator, _log_energy_batches
+from auditok.io import Rewindable, WaveAudioSource, BufferAudioSource, MmapWaveAudioSource, \
+    PrefetchAudioSource, _WITH_MMAP_BUFFERS
 
-__all__ = ["StreamTokenizer"]
+try:
+    import numpy
+    _WITH_NUMPY = True
+except ImportError as e:
+    _WITH_NUMPY = False
+
+__all__ = ["StreamTokenizer", "MultiStreamTokenizer", "TokenizerSweep"]
+
+
+def _run_lengths(mask):
+    """
+    Run-length encode a sequence of validity flags.
+
+    :Returns:
+
+        A list of `(frame_is_valid, length)` tuples, one per run of identical flags.
+    """
+    if _WITH_NUMPY:
+        mask = numpy.asarray(mask, dtype=bool).ravel()
+        if len(mask) == 0:
+            return []
+        starts = numpy.concatenate(([0], numpy.flatnonzero(mask[1:] != mask[:-1]) + 1))
+        lengths = numpy.diff(numpy.concatenate((starts, [len(mask)])))
+        return list(zip(mask[starts].tolist(), lengths.tolist()))
+
+    return [(bool(k), sum(1 for _ in g)) for k, g in groupby(mask, bool)]
+
+
+def _validate_chunk(args):
+    """
+    Validate the frames of one chunk of audio data. Run in worker processes by
+    :func:`StreamTokenizer.tokenize_parallel`.
+
+    :Returns:
+
+        A `bytearray` with one byte (1 for valid, 0 for non valid) per frame.
+    """
+    validator, filename, data, block_size, frame_size, first_frame, nb_frames = args
+    if filename is None:
+        return bytearray(validator.is_valid_batch(data, frame_size))
+
+    if not _WITH_MMAP_BUFFERS:
+        fp = wave.open(filename)
+        fp.setpos(first_frame * block_size)
+        data = fp.readframes(nb_frames * block_size)
+        fp.close()
+        return bytearray(validator.is_valid_batch(data, frame_size))
+
+    audio_source = MmapWaveAudioSource(filename)
+    audio_source.open()
+    audio_source.set_position(first_frame * block_size)
+    data = audio_source.read(nb_frames * block_size)
+    validity = bytearray(validator.is_valid_batch(data, frame_size))
+    del data
+    audio_source.close()
+    return validity
 
 
 class StreamTokenizer():
@@ -172,13 +237,15 @@ class StreamTokenizer():
     # alias
     DROP_TAILING_SILENCE = 4
 
+    # number of frames read and validated at once when the data source allows it
+    BATCH_SIZE = 1000
+
     def __init__(self, validator,
                  min_length, max_length, max_continuous_silence,
                  init_min=0, init_max_silence=0,
                  mode=0):
 
-        if not isinstance(validator, DataValidator):
-            raise TypeError("'validator' must be an instance of 'DataValidator'")
+        self._check_validator(validator)
 
         if max_length <= 0:
             raise ValueError("'max_length' must be > 0 (value={0})".format(max_length))
@@ -205,6 +272,7 @@ class StreamTokenizer():
         self._drop_tailing_silence = (mode & self.DROP_TRAILING_SILENCE) != 0
 
         self._deliver = None
+        self._feeding = False
         self._tokens = None
         self._state = None
         self._data = None
@@ -214,6 +282,16 @@ class StreamTokenizer():
         self._silence_length = 0
         self._start_frame = 0
         self._current_frame = 0
+        self._data_length = 0
+        self._get_run_data = None
+        self._pending = None
+        self._pending_start = 0
+        self._frame_size = None
+
+    @staticmethod
+    def _check_validator(validator):
+        if not isinstance(validator, DataValidator):
+            raise TypeError("'validator' must be an instance of 'DataValidator'")
 
     def set_mode(self, mode):
         """
@@ -262,8 +340,9 @@ class StreamTokenizer():
         self._state = self.SILENCE
         self._current_frame = -1
         self._deliver = self._append_token
+        self._feeding = False
 
-    def tokenize(self, data_source, callback=None):
+    def tokenize(self, data_source, callback=None, offsets=False):
         """
         Read data from `data_source`, one frame a time, and process the read frames in
         order to detect sequences of frames that make up valid tokens.
@@ -278,6 +357,16 @@ class StreamTokenizer():
                If a `callback` function is given, it will be called each time a valid token
                is found.
 
+           `offsets` : *(bool, default=False)*
+               if True, `data_source` must be an audio data source (see
+               :class:`auditok.util.ADSFactory.AudioDataSource`) that does not read
+               overlapping blocks. Instead of a list of frames, the `data` of each token is
+               one contiguous buffer that covers frames `start` to `end`. Only frame indices
+               are tracked during detection so a token costs a constant number of
+               allocations whatever its length. If the data source reads from a
+               :class:`auditok.io.BufferAudioSource` or an :class:`auditok.io.MmapWaveAudioSource`,
+               `data` is a `memoryview` on the source's buffer (no copy), otherwise it is a `bytes` object built from
+               the data of the current token only.
 
         :Returns:
            A list of tokens if `callback` is None. Each token is tuple with the following elements:
@@ -289,6 +378,11 @@ class StreamTokenizer():
            where `data` is a list of read frames, `start`: index of the first frame in the
            original data and `end` : index of the last frame. 
 
+        If `data_source` is an :class:`auditok.util.ADSFactory.AudioDataSource` (or any of
+        the limiter, recorder, overlap or fused audio data sources returned by
+        :func:`auditok.util.ADSFactory.ads`) that reads from a file or a memory buffer,
+        up to `BATCH_SIZE` frames are read at once with `data_source.read_blocks` and
+        validated with a single call to `validator.is_valid_batch`.
         """
 
         self._reinitialize()
@@ -296,23 +390,486 @@ class StreamTokenizer():
         if callback is not None:
             self._deliver = callback
 
-        while True:
-            frame = data_source.read()
-            if frame is None:
-                break
+        if offsets:
+            steps = self._process_offsets(data_source)
+        else:
+            steps = self._process_frames(data_source)
+
+        for _ in steps:
+            pass
+
+        if callback is None:
+            _ret = self._tokens
+            self._tokens = None
+            return _ret
+
+    def iter_tokens(self, data_source, offsets=False):
+        """
+        Generator version of :func:`tokenize`. Read data from `data_source` and yield
+        each token as soon as it is detected, i.e. as soon as the end of detection
+        is decided. At most one token (i.e. `max_length` frames) is held in memory
+        whatever the length of the input, and data is only read from `data_source`
+        when the next token is requested, so the consumer can stop early.
+
+        :Parameters:
+           `data_source` : instance of the :class:`DataSource` class that implements a `read` method.
+
+           `offsets` : *(bool, default=False)*
+               deliver token data as one contiguous buffer (see :func:`tokenize`).
+
+        :Yields:
+           tokens as `(data, start, end)` tuples (see :func:`tokenize`).
+
+        :Example:
+
+        .. code:: python
+
+            for data, start, end in tokenizer.iter_tokens(dsource):
+                if start > 1000:
+                    break
+        """
+
+        self._reinitialize()
+
+        if offsets:
+            steps = self._process_offsets(data_source)
+        else:
+            steps = self._process_frames(data_source)
+
+        for _ in steps:
+            if self._tokens:
+                tokens, self._tokens = self._tokens, []
+                for token in tokens:
+                    yield token
+
+        tokens, self._tokens = self._tokens, None
+        for token in tokens:
+            yield token
+
+    def tokenize_parallel(self, data_source, processes=None, chunk_size=100000,
+                          callback=None, offsets=False):
+        """
+        Tokenize a whole audio file or buffer using several processes.
+
+        The audio stream is split into chunks of `chunk_size` frames that are read and
+        validated (with `validator.is_valid_batch`) in a pool of worker processes. The
+        validity of the frames of each chunk is sent back to the current process where
+        the automaton goes through the chunks in order. Because the automaton itself
+        is sequential and runs over the whole stream, tokens that span chunk boundaries
+        are exactly those :func:`tokenize` would deliver and the result does not depend
+        on `processes` or `chunk_size`.
+
+        `validator` must be picklable.
+
+        :Parameters:
+           `data_source` : a non decorated :class:`auditok.util.ADSFactory.AudioDataSource`
+               that reads from an :class:`auditok.io.BufferAudioSource`, an
+               :class:`auditok.io.WaveAudioSource` or an :class:`auditok.io.MmapWaveAudioSource`.
+               The whole stream is processed from the beginning, whatever the current
+               position of the audio source.
+
+           `processes` : *(int, default=None)*
+               number of worker processes. Default: the number of CPUs. If 1, no
+               worker process is started.
+
+           `chunk_size` : *(int, default=100000)*
+               number of frames validated by a worker at once.
+
+           `callback` : an optional 3-argument function.
+               see :func:`tokenize`.
+
+           `offsets` : *(bool, default=False)*
+               see :func:`tokenize`.
+
+        :Returns:
+           A list of tokens if `callback` is None (see :func:`tokenize`).
+        """
+
+        audio_source = self._get_batch_audio_source(data_source)
+        if not isinstance(audio_source, (BufferAudioSource, WaveAudioSource, MmapWaveAudioSource)):
+            raise ValueError("'data_source' must be an AudioDataSource that reads from a "
+                             "BufferAudioSource, a WaveAudioSource or a MmapWaveAudioSource")
+
+        block_size = data_source.get_block_size()
+        frame_size = block_size * audio_source.get_sample_width() * audio_source.get_channels()
+
+        fp = None
+        if isinstance(audio_source, (BufferAudioSource, MmapWaveAudioSource)):
+            # a memory-mapped file is shared between processes through its filename
+            filename = getattr(audio_source, "_filename", None)
+            buffer = audio_source.get_data_buffer()
+            nb_frames = (len(buffer) + frame_size - 1) // frame_size
+
+            def read_range(start, end):
+                return buffer[start * frame_size: (end + 1) * frame_size]
+
+        else:
+            filename = audio_source._filename
+            fp = wave.open(filename)
+            nb_frames = (fp.getnframes() + block_size - 1) // block_size
+
+            def read_range(start, end):
+                fp.setpos(start * block_size)
+                return fp.readframes((end - start + 1) * block_size)
+
+        if offsets:
+            self._get_run_data = read_range
+        else:
+            def get_run_data(start, end):
+                data = read_range(start, end)
+                return [data[i: i + frame_size] for i in range(0, len(data), frame_size)]
+            self._get_run_data = get_run_data
+
+        nb_chunks = (nb_frames + chunk_size - 1) // chunk_size
+
+        def chunks():
+            # chunk data is sliced when the chunk is submitted, not all at once
+            for first_frame in range(0, nb_frames, chunk_size):
+                nb_chunk_frames = min(chunk_size, nb_frames - first_frame)
+                if filename is None:
+                    data = buffer[first_frame * frame_size: (first_frame + nb_chunk_frames) * frame_size]
+                else:
+                    data = None
+                yield (self.validator, filename, data, block_size, frame_size,
+                       first_frame, nb_chunk_frames)
+
+        self._reinitialize()
+        self._data = None
+        self._data_length = 0
+
+        if callback is not None:
+            self._deliver = callback
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+
+        pool = None
+        try:
+            if processes > 1 and nb_chunks > 1:
+                processes = min(processes, nb_chunks)
+                pool = multiprocessing.Pool(processes)
+                results = self._imap_bounded(pool, _validate_chunk, chunks(), 2 * processes)
+            else:
+                results = (_validate_chunk(chunk) for chunk in chunks())
+
+            for validity in results:
+                for frame_is_valid, length in _run_lengths(validity):
+                    self._process_run(frame_is_valid, length)
+
+            self._post_process_run()
+
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if fp is not None:
+                fp.close()
+            self._get_run_data = None
+
+        if callback is None:
+            _ret = self._tokens
+            self._tokens = None
+            return _ret
+
+    @staticmethod
+    def _imap_bounded(pool, function, iterable, max_pending):
+        # same as pool.imap, but at most 'max_pending' items of 'iterable' are taken
+        # before their result is consumed (pool.imap takes them all at once)
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.apply_async(function, (item,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def feed(self, frames):
+        """
+        Push-mode tokenization: process `frames` and return the tokens completed so far.
+        Unlike :func:`tokenize` that pulls frames from a :class:`DataSource`, this method
+        lets the caller push frames as they arrive (e.g. from a network layer). The
+        automaton state is kept between calls, so a token can span several calls.
+        Frame indices are counted from the first frame fed after the tokenizer was
+        created or last flushed. Call :func:`flush` at the end of the stream.
+
+        Calling :func:`tokenize` (or any other tokenization method) in between
+        resets the automaton and discards the current push session.
+
+        :Parameters:
+           `frames` : an iterable of frames
+               frames to process, in order.
+
+        :Returns:
+           A (possibly empty) list of `(data, start, end)` tokens (see :func:`tokenize`).
+
+        :Example:
+
+        .. code:: python
+
+            for chunk in stream:
+                for data, start, end in tokenizer.feed(chunk):
+                    do_something()
+            for data, start, end in tokenizer.flush():
+                do_something()
+        """
+
+        if not self._feeding:
+            self._reinitialize()
+            self._feeding = True
+
+        for frame in frames:
             self._current_frame += 1
             self._process(frame)
 
+        tokens, self._tokens = self._tokens, []
+        return tokens
+
+    def flush(self):
+        """
+        End the current push session (see :func:`feed`) and return the last
+        token, if any. The next call to :func:`feed` starts a new stream.
+
+        :Returns:
+           A (possibly empty) list of `(data, start, end)` tokens.
+        """
+
+        if not self._feeding:
+            return []
+
         self._post_process()
+        tokens, self._tokens = self._tokens, None
+        self._feeding = False
+        return tokens
+
+    def atokenize(self, data_source):
+        """
+        Asynchronous version of :func:`iter_tokens` (Python >= 3.6). Return an
+        asynchronous generator that awaits `data_source.read()` for each frame and
+        yields each token as soon as it is detected. The automaton works on a copy
+        of this tokenizer, with a copy of its validator (see `copy.deepcopy`), so that
+        one tokenizer can serve many streams concurrently on the same event loop, even
+        with a validator that keeps a state between frames.
+
+        :Parameters:
+           `data_source` : an object with a coroutine `read` method, e.g. an open
+               :class:`auditok.aio.AsyncAudioDataSource`.
+
+        :Yields:
+           tokens as `(data, start, end)` tuples (see :func:`tokenize`).
+
+        :Example:
+
+        .. code:: python
+
+            async for data, start, end in tokenizer.atokenize(async_dsource):
+                do_something()
+        """
+
+        from auditok.aio import _atokenize
+        return _atokenize(self, data_source)
+
+    def tokenize_mask(self, mask, frames=None, callback=None):
+        """
+        Tokenize a whole sequence of precomputed validity flags at once.
+
+        This is the batch counterpart of :func:`tokenize`: instead of calling
+        `validator.is_valid` and stepping the automaton once per frame, `mask` is
+        run-length encoded and the automaton advances over each run of identical
+        flags in a few steps. The resulting tokens are exactly those that
+        :func:`tokenize` would deliver for the same validity sequence, with the
+        same `min_length`, `max_length`, `max_continuous_silence`, `init_min`,
+        `init_max_silence` and mode.
+
+        :Parameters:
+           `mask` : a sequence of booleans (e.g. a list or a NumPy boolean array)
+               validity of each frame, typically computed by a batch-capable validator.
+
+           `frames` : an optional sequence of frames
+               if given, `frames[start:end + 1]` is delivered as token data,
+               otherwise data is None.
+
+           `callback` : an optional 3-argument function.
+               If a `callback` function is given, it will be called each time a valid token
+               is found.
+
+        :Returns:
+           A list of `(data, start, end)` tokens if `callback` is None.
+        """
+
+        self._reinitialize()
+        self._data = None
+        self._data_length = 0
+
+        if frames is not None:
+            self._get_run_data = lambda start, end: frames[start: end + 1]
+        else:
+            self._get_run_data = lambda start, end: None
+
+        if callback is not None:
+            self._deliver = callback
+
+        for frame_is_valid, length in _run_lengths(mask):
+            self._process_run(frame_is_valid, length)
+
+        self._post_process_run()
+        self._get_run_data = None
 
         if callback is None:
             _ret = self._tokens
             self._tokens = None
             return _ret
 
-    def _process(self, frame):
+    @staticmethod
+    def _get_batch_audio_source(data_source):
+        # Only a non decorated AudioDataSource that reads from an offline audio
+        # source can deliver many frames at once without delaying detections
+        if type(data_source) is not ADSFactory.AudioDataSource:
+            return None
+        audio_source = data_source.get_audio_source()
+        if isinstance(audio_source, (Rewindable, WaveAudioSource)):
+            return audio_source
+        return None
+
+    @staticmethod
+    def _can_read_batches(data_source):
+        # Audio data sources of auditok (but not subclasses that may redefine 'read')
+        # that read from an offline audio source can use 'read_blocks'
+        while type(data_source) in (ADSFactory.LimiterADS, ADSFactory.RecorderADS,
+                                    ADSFactory.OverlapADS):
+            data_source = data_source.ads
+        if type(data_source) not in (ADSFactory.AudioDataSource, ADSFactory.FusedADS):
+            return False
+        audio_source = data_source.get_audio_source()
+        if isinstance(audio_source, PrefetchAudioSource):
+            audio_source = audio_source.get_audio_source()
+        return isinstance(audio_source, (Rewindable, WaveAudioSource))
+
+    def _get_batch_sizes(self, data_source):
+        # Return the size in bytes of a frame and the distance between two frames
+        sample_size = data_source.get_sample_width() * data_source.get_channels()
+        block_size, hop_size = data_source._get_block_and_hop_sizes()
+        return block_size * sample_size, hop_size * sample_size
+
+    def _read_batches(self, data_source):
+        # Yield (data, validity) tuples where data holds up to BATCH_SIZE frames
+        frame_size, hop_size = self._get_batch_sizes(data_source)
+        if hop_size == frame_size:
+            hop_size = None
+        while True:
+            result = data_source.read_blocks(self.BATCH_SIZE)
+            if result is None:
+                return
+            data = result[0]
+            yield data, self.validator.is_valid_batch(data, frame_size, hop_size)
+
+    def _process_frames(self, data_source):
+        # Frame by frame processing, yield after each frame
+        if not self._can_read_batches(data_source):
+            while True:
+                frame = data_source.read()
+                if frame is None:
+                    break
+                self._current_frame += 1
+                self._process(frame)
+                yield
 
-        frame_is_valid = self.validator.is_valid(frame)
+        else:
+            frame_size, hop_size = self._get_batch_sizes(data_source)
+            for data, validity in self._read_batches(data_source):
+                for i, frame_is_valid in enumerate(validity):
+                    self._current_frame += 1
+                    self._process(data[i * hop_size: i * hop_size + frame_size], frame_is_valid)
+                    yield
+
+        self._post_process()
+
+    def _process_offsets(self, data_source):
+        # Run-level processing of an audio data source where tokens are
+        # delivered as byte ranges, yield after each chunk of frames
+        if getattr(data_source, "hop_size", None) is not None:
+            raise ValueError("Offset tokens are not available for data sources with overlapping blocks")
+
+        block_size = data_source.get_block_size()
+        frame_size = block_size * data_source.get_sample_width() * data_source.get_channels()
+        self._data = None
+        self._data_length = 0
+        audio_source = self._get_batch_audio_source(data_source)
+
+        if isinstance(audio_source, (BufferAudioSource, MmapWaveAudioSource)):
+            # frame 0 is at the current position of the audio source
+            buffer = audio_source.get_data_buffer()
+            try:
+                buffer = memoryview(buffer)
+            except TypeError:
+                pass
+            offset = int(audio_source.get_position() * audio_source.get_sample_width() *
+                         audio_source.get_channels())
+            self._get_run_data = lambda start, end: buffer[offset + start * frame_size:
+                                                           offset + (end + 1) * frame_size]
+
+            for _, validity in self._read_batches(data_source):
+                for frame_is_valid, length in _run_lengths(validity):
+                    self._process_run(frame_is_valid, length)
+                yield
+
+        else:
+            # only keep data from the first frame of the current token
+            self._pending = bytearray()
+            self._pending_start = 0
+            self._frame_size = frame_size
+            self._get_run_data = self._get_pending_data
+
+            if self._can_read_batches(data_source):
+                for data, validity in self._read_batches(data_source):
+                    self._pending.extend(data)
+                    for frame_is_valid, length in _run_lengths(validity):
+                        self._process_run(frame_is_valid, length)
+                    self._trim_pending()
+                    yield
+            elif getattr(data_source, "readinto", None) is not None:
+                # frames are only used until they are copied to pending data,
+                # read all of them into the same buffer
+                frame = bytearray(frame_size)
+                frame_view = memoryview(frame)
+                while True:
+                    nb_bytes = data_source.readinto(frame)
+                    if nb_bytes == 0:
+                        break
+                    data = frame_view if nb_bytes == frame_size else frame_view[:nb_bytes]
+                    self._pending.extend(data)
+                    self._process_run(self.validator.is_valid(data), 1)
+                    self._trim_pending()
+                    yield
+            else:
+                while True:
+                    frame = data_source.read()
+                    if frame is None:
+                        break
+                    self._pending.extend(frame)
+                    self._process_run(self.validator.is_valid(frame), 1)
+                    self._trim_pending()
+                    yield
+
+        self._post_process_run()
+        self._get_run_data = None
+        self._pending = None
+
+    def _trim_pending(self):
+        if self._data_length > 0:
+            keep_from = self._start_frame
+        else:
+            keep_from = self._current_frame + 1
+        del self._pending[:(keep_from - self._pending_start) * self._frame_size]
+        self._pending_start = keep_from
+
+    def _get_pending_data(self, start, end):
+        first = (start - self._pending_start) * self._frame_size
+        return bytes(self._pending[first: first + (end - start + 1) * self._frame_size])
+
+    def _process(self, frame, frame_is_valid=None):
+
+        if frame_is_valid is None:
+            frame_is_valid = self.validator.is_valid(frame)
 
         if self._state == self.SILENCE:
 
@@ -433,5 +990,688 @@ class StreamTokenizer():
 
         self._data = []
 
+    def _process_run(self, frame_is_valid, length):
+        # Equivalent to `length` calls of `_process` with frames of the same
+        # validity. Only the number of gathered frames is tracked and each
+        # iteration jumps straight to the next frame where a decision is taken.
+
+        while length > 0:
+
+            if self._state == self.SILENCE:
+
+                if not frame_is_valid:
+                    self._current_frame += length
+                    return
+
+                self._current_frame += 1
+                length -= 1
+                self._init_count = 1
+                self._silence_length = 0
+                self._start_frame = self._current_frame
+                self._data_length = 1
+
+                if self._init_count >= self.init_min:
+                    self._state = self.NOISE
+                    if self._data_length >= self.max_length:
+                        self._process_end_of_run(True)
+                else:
+                    self._state = self.POSSIBLE_NOISE
+
+            elif self._state == self.POSSIBLE_NOISE:
+
+                if frame_is_valid:
+                    # valid frames needed to reach init_min
+                    step = min(length, max(1, self.init_min - self._init_count))
+                    self._current_frame += step
+                    length -= step
+                    self._silence_length = 0
+                    self._init_count += step
+                    self._data_length += step
+                    if self._init_count >= self.init_min:
+                        self._state = self.NOISE
+                        if self._data_length >= self.max_length:
+                            self._process_end_of_run(True)
+
+                else:
+                    # index (within run) of the frame that reaches either
+                    # init_max_silent or max_length
+                    step = max(1, min(self.init_max_silent - self._silence_length + 1,
+                                      self.max_length - self._data_length))
+                    if step <= length:
+                        self._current_frame += step
+                        length -= step
+                        self._silence_length += step
+                        self._data_length = 0
+                        self._state = self.SILENCE
+                    else:
+                        self._current_frame += length
+                        self._silence_length += length
+                        self._data_length += length
+                        return
+
+            elif self._state == self.NOISE:
+
+                if frame_is_valid:
+                    step = min(length, max(1, self.max_length - self._data_length))
+                    self._current_frame += step
+                    length -= step
+                    self._data_length += step
+                    if self._data_length >= self.max_length:
+                        self._process_end_of_run(True)
+
+                else:
+                    self._current_frame += 1
+                    length -= 1
+                    if self.max_continuous_silence <= 0:
+                        self._process_end_of_run()
+                        self._state = self.SILENCE
+                    else:
+                        self._silence_length = 1
+                        self._data_length += 1
+                        self._state = self.POSSIBLE_SILENCE
+                        if self._data_length == self.max_length:
+                            self._process_end_of_run(True)
+
+            else:  # POSSIBLE_SILENCE
+
+                if frame_is_valid:
+                    self._current_frame += 1
+                    length -= 1
+                    self._data_length += 1
+                    self._silence_length = 0
+                    self._state = self.NOISE
+                    if self._data_length >= self.max_length:
+                        self._process_end_of_run(True)
+
+                elif self._silence_length >= self.max_continuous_silence:
+                    self._current_frame += 1
+                    length -= 1
+                    if self._silence_length < self._data_length:
+                        self._process_end_of_run()
+                    else:
+                        self._data_length = 0
+                    self._state = self.SILENCE
+                    self._silence_length = 0
+
+                else:
+                    step = min(length,
+                               self.max_continuous_silence - self._silence_length,
+                               max(1, self.max_length - self._data_length))
+                    self._current_frame += step
+                    length -= step
+                    self._data_length += step
+                    self._silence_length += step
+                    if self._data_length >= self.max_length:
+                        self._process_end_of_run(True)
+
+    def _post_process_run(self):
+        if self._state == self.NOISE or self._state == self.POSSIBLE_SILENCE:
+            if self._data_length > 0 and self._data_length > self._silence_length:
+                self._process_end_of_run()
+
+    def _process_end_of_run(self, truncated=False):
+
+        length = self._data_length
+        if not truncated and self._drop_tailing_silence and self._silence_length > 0:
+            length = max(0, length - self._silence_length)
+
+        if (length >= self.min_length) or \
+           (length > 0 and not self._strict_min_length and self._contiguous_token):
+
+            _end_frame = self._start_frame + length - 1
+            self._deliver(self._get_run_data(self._start_frame, _end_frame),
+                          self._start_frame, _end_frame)
+
+            if truncated:
+                self._start_frame = self._current_frame + 1
+                self._contiguous_token = True
+            else:
+                self._contiguous_token = False
+        else:
+            self._contiguous_token = False
+
+        self._data_length = 0
+
     def _append_token(self, data, start, end):
         self._tokens.append((data, start, end))
+
+
+class _StreamAutomaton(StreamTokenizer):
+    """
+    Automaton of one stream of a :class:`MultiStreamTokenizer`. It is advanced
+    with validity flags only and, unlike :class:`StreamTokenizer`, accepts None
+    as validator.
+    """
+
+    @staticmethod
+    def _check_validator(validator):
+        if validator is not None:
+            StreamTokenizer._check_validator(validator)
+
+
+class MultiStreamTokenizer():
+    """
+    Tokenizer for many independent streams (e.g. the channels of a call center),
+    advanced all at once one frame at a time. It implements the same automaton as
+    :class:`StreamTokenizer` (with the same parameters) but, if numpy is available,
+    the automaton state of all streams is stored in arrays (state, silence length,
+    start frame, init count, etc.) and each step updates all streams with a few
+    vectorized operations instead of one Python call per stream.
+
+    Tokens are delivered as `(stream_id, start, end)` tuples where `stream_id` is
+    the index of the stream (between 0 and `nb_streams` - 1) and `start` and `end`
+    are the indices of the first and last frames of the token in that stream. Token
+    data is not kept, it is up to the caller to buffer the audio of each stream if needed.
+
+    :Parameters:
+
+        `validator` :
+            instance of `DataValidator` that implements `is_valid_batch`, used by :func:`feed`.
+            None if validity flags are always given by the caller (see :func:`feed_mask`).
+
+        `nb_streams` : *(int)*
+            Number of streams.
+
+        `min_length`, `max_length`, `max_continuous_silence` :
+            see :class:`StreamTokenizer`. Each of them is either an int used for all streams
+            or a sequence of `nb_streams` ints, one per stream (e.g. to run many configurations
+            on the same stream, see :class:`TokenizerSweep`).
+
+        `init_min`, `init_max_silence`, `mode` :
+            see :class:`StreamTokenizer`, used for all streams.
+
+    :Example:
+
+    .. code:: python
+
+        tokenizer = MultiStreamTokenizer(AudioEnergyValidator(sample_width=2, energy_threshold=50),
+                                         nb_streams=2000, min_length=20, max_length=400,
+                                         max_continuous_silence=30)
+
+        while True:
+            # one frame (i.e. block_size samples) of each stream
+            frames = read_next_frame_of_each_stream()
+            for stream_id, start, end in tokenizer.feed(frames):
+                do_something(stream_id, start, end)
+    """
+
+    def __init__(self, validator, nb_streams,
+                 min_length, max_length, max_continuous_silence,
+                 init_min=0, init_max_silence=0,
+                 mode=0):
+
+        if nb_streams <= 0:
+            raise ValueError("'nb_streams' must be > 0 (value={0})".format(nb_streams))
+
+        parameters = list(zip(self._per_stream(min_length, nb_streams, "min_length"),
+                              self._per_stream(max_length, nb_streams, "max_length"),
+                              self._per_stream(max_continuous_silence, nb_streams,
+                                               "max_continuous_silence")))
+        # checks each distinct combination of parameters once
+        tokenizers = dict((p, _StreamAutomaton(validator, p[0], p[1], p[2], init_min, init_max_silence, mode))
+                          for p in set(parameters))
+        # holds the automaton parameters shared by all streams
+        self._tokenizer = tokenizers[parameters[0]]
+        self.validator = validator
+        self.nb_streams = nb_streams
+        self._tokens = None
+
+        if _WITH_NUMPY:
+            self._min_length, self._max_length, self._max_continuous_silence = \
+                [numpy.array(values, dtype=numpy.int64) for values in zip(*parameters)]
+            self._no_silence = self._max_continuous_silence <= 0
+            self._state = numpy.zeros(nb_streams, dtype=numpy.int8)
+            self._current_frame = numpy.zeros(nb_streams, dtype=numpy.int64)
+            self._start_frame = numpy.zeros(nb_streams, dtype=numpy.int64)
+            self._data_length = numpy.zeros(nb_streams, dtype=numpy.int64)
+            self._silence_length = numpy.zeros(nb_streams, dtype=numpy.int64)
+            self._init_count = numpy.zeros(nb_streams, dtype=numpy.int64)
+            self._contiguous_token = numpy.zeros(nb_streams, dtype=bool)
+        else:
+            # one (run-based) automaton per stream
+            self._tokenizers = [copy.copy(tokenizers[p]) for p in parameters]
+
+        self.reset()
+
+    @staticmethod
+    def _per_stream(value, nb_streams, name):
+        if isinstance(value, numbers.Integral):
+            return [value] * nb_streams
+        value = list(value)
+        if len(value) != nb_streams:
+            raise ValueError("'{0}' must be an int or a sequence of {1} values (length={2})"
+                             .format(name, nb_streams, len(value)))
+        return value
+
+    def reset(self, stream_ids=None):
+        """
+        Reset the automaton of the given streams, previous frames are forgotten and
+        frame indices of these streams start again from 0.
+
+        :Parameters:
+
+            `stream_ids` : a sequence of stream indices. Default: all streams.
+        """
+
+        if stream_ids is None:
+            stream_ids = range(self.nb_streams)
+
+        if _WITH_NUMPY:
+            stream_ids = numpy.asarray(stream_ids, dtype=numpy.intp)
+            self._state[stream_ids] = StreamTokenizer.SILENCE
+            self._current_frame[stream_ids] = -1
+            self._start_frame[stream_ids] = 0
+            self._data_length[stream_ids] = 0
+            self._silence_length[stream_ids] = 0
+            self._init_count[stream_ids] = 0
+            self._contiguous_token[stream_ids] = False
+            return
+
+        for i in stream_ids:
+            tokenizer = self._tokenizers[i]
+            tokenizer._reinitialize()
+            tokenizer._data = None
+            tokenizer._data_length = 0
+            tokenizer._silence_length = 0
+            tokenizer._get_run_data = lambda start, end: None
+            tokenizer._deliver = lambda data, start, end, i=i: self._tokens.append((i, start, end))
+
+    def feed(self, frames):
+        """
+        Validate one frame of each stream with `validator.is_valid_batch` and
+        advance all streams by one frame.
+
+        :Parameters:
+
+            `frames` :
+                `nb_streams` frames of the same size, one per stream and in stream
+                order, either as one buffer (e.g. `bytes`) or, if numpy is available,
+                as an array of shape `(nb_streams, block_size)` of audio samples.
+
+        :Returns:
+            A (possibly empty) list of `(stream_id, start, end)` tokens.
+        """
+
+        if self.validator is None:
+            raise ValueError("No validator, use feed_mask to advance streams")
+
+        if _WITH_NUMPY and isinstance(frames, numpy.ndarray):
+            frames = numpy.ascontiguousarray(frames).view(numpy.uint8).ravel()
+
+        if len(frames) % self.nb_streams != 0:
+            raise ValueError("Data length ({0}) must be a multiple of the number of streams ({1})"
+                             .format(len(frames), self.nb_streams))
+
+        mask = self.validator.is_valid_batch(frames, len(frames) // self.nb_streams)
+        return self.feed_mask(mask)
+
+    def feed_mask(self, mask):
+        """
+        Advance all streams using precomputed validity flags.
+
+        :Parameters:
+
+            `mask` : a sequence of `nb_streams` booleans, or a 2-D array of shape `(nb_streams, k)`
+                validity of the next frame of each stream (e.g. `energies >= threshold`). With
+                a 2-D array, all streams are advanced by `k` frames.
+
+        :Returns:
+            A (possibly empty) list of `(stream_id, start, end)` tokens, in order of
+            detection then of stream index.
+        """
+
+        self._tokens = []
+
+        if _WITH_NUMPY:
+            mask = numpy.asarray(mask, dtype=bool)
+            if mask.shape[0] != self.nb_streams:
+                raise ValueError("Expected validity flags for {0} streams, got {1}"
+                                 .format(self.nb_streams, mask.shape[0]))
+            if mask.ndim == 1:
+                self._step(mask)
+            else:
+                for column in mask.T:
+                    self._step(column)
+        else:
+            if len(mask) != self.nb_streams:
+                raise ValueError("Expected validity flags for {0} streams, got {1}"
+                                 .format(self.nb_streams, len(mask)))
+            rows = [flags if isinstance(flags, (list, tuple)) else (flags,) for flags in mask]
+            for column in zip(*rows):
+                for tokenizer, frame_is_valid in zip(self._tokenizers, column):
+                    tokenizer._process_run(bool(frame_is_valid), 1)
+
+        tokens, self._tokens = self._tokens, None
+        return tokens
+
+    def flush(self, stream_ids=None):
+        """
+        End the given streams (e.g. calls that were hung up), return their last
+        tokens, if any, and reset their automaton (see :func:`reset`).
+
+        :Parameters:
+
+            `stream_ids` : a sequence of stream indices. Default: all streams.
+
+        :Returns:
+            A (possibly empty) list of `(stream_id, start, end)` tokens.
+        """
+
+        if stream_ids is None:
+            stream_ids = range(self.nb_streams)
+
+        self._tokens = []
+
+        if _WITH_NUMPY:
+            stream_ids = numpy.asarray(stream_ids, dtype=numpy.intp)
+            ending = numpy.zeros(self.nb_streams, dtype=bool)
+            ending[stream_ids] = True
+            ending &= (self._state == StreamTokenizer.NOISE) | \
+                      (self._state == StreamTokenizer.POSSIBLE_SILENCE)
+            ending &= (self._data_length > 0) & (self._data_length > self._silence_length)
+            self._end_of_detection(ending, False)
+        else:
+            for i in sorted(stream_ids):
+                self._tokenizers[i]._post_process_run()
+
+        self.reset(stream_ids)
+        tokens, self._tokens = self._tokens, None
+        return tokens
+
+    def _step(self, valid):
+        # Vectorized equivalent of StreamTokenizer._process for all streams at once.
+        # Masks are computed from the state before the step, so each stream takes
+        # exactly one branch of the automaton.
+
+        tokenizer = self._tokenizer
+        state = self._state
+        previous_state = state.copy()
+        length = self._data_length
+        silence = self._silence_length
+        init_count = self._init_count
+        invalid = ~valid
+
+        self._current_frame += 1
+        # streams that reach max_length (truncated token) or end of detection
+        truncated = numpy.zeros(self.nb_streams, dtype=bool)
+        ended = numpy.zeros(self.nb_streams, dtype=bool)
+
+        # SILENCE: a valid frame starts a new token
+        starting = (previous_state == StreamTokenizer.SILENCE) & valid
+        init_count[starting] = 1
+        silence[starting] = 0
+        self._start_frame[starting] = self._current_frame[starting]
+        length[starting] = 1
+        if tokenizer.init_min <= 1:
+            state[starting] = StreamTokenizer.NOISE
+            truncated |= starting & (length >= self._max_length)
+        else:
+            state[starting] = StreamTokenizer.POSSIBLE_NOISE
+
+        # POSSIBLE_NOISE
+        possible_noise = previous_state == StreamTokenizer.POSSIBLE_NOISE
+        m = possible_noise & valid
+        silence[m] = 0
+        init_count[m] += 1
+        length[m] += 1
+        m &= init_count >= tokenizer.init_min
+        state[m] = StreamTokenizer.NOISE
+        truncated |= m & (length >= self._max_length)
+
+        m = possible_noise & invalid
+        silence[m] += 1
+        # either init_max_silent or max_length is reached before init_min, back to silence
+        back = m & ((silence > tokenizer.init_max_silent) | (length + 1 >= self._max_length))
+        length[back] = 0
+        state[back] = StreamTokenizer.SILENCE
+        length[m & ~back] += 1
+
+        # NOISE
+        noise = previous_state == StreamTokenizer.NOISE
+        m = noise & valid
+        length[m] += 1
+        truncated |= m & (length >= self._max_length)
+
+        m = noise & invalid
+        # without tolerated silence, a non-valid frame ends the token
+        ending = m & self._no_silence
+        ended |= ending
+        state[ending] = StreamTokenizer.SILENCE
+        m &= ~ending
+        silence[m] = 1
+        length[m] += 1
+        state[m] = StreamTokenizer.POSSIBLE_SILENCE
+        truncated |= m & (length == self._max_length)
+
+        # POSSIBLE_SILENCE
+        possible_silence = previous_state == StreamTokenizer.POSSIBLE_SILENCE
+        m = possible_silence & valid
+        length[m] += 1
+        silence[m] = 0
+        state[m] = StreamTokenizer.NOISE
+        truncated |= m & (length >= self._max_length)
+
+        m = possible_silence & invalid
+        stopping = m & (silence >= self._max_continuous_silence)
+        # deliver only if gathered frames aren't all silent
+        ended |= stopping & (silence < length)
+        length[stopping & ~ended] = 0
+        state[stopping] = StreamTokenizer.SILENCE
+        m &= ~stopping
+        length[m] += 1
+        silence[m] += 1
+        truncated |= m & (length >= self._max_length)
+
+        if truncated.any() or ended.any():
+            nb_tokens = len(self._tokens)
+            self._end_of_detection(truncated, True)
+            self._end_of_detection(ended, False)
+            self._tokens[nb_tokens:] = sorted(self._tokens[nb_tokens:])
+
+        # silence length is needed by _end_of_detection to drop trailing silence
+        silence[stopping] = 0
+
+    def _end_of_detection(self, streams, truncated):
+        # Vectorized equivalent of StreamTokenizer._process_end_of_run for `streams`
+
+        if not streams.any():
+            return
+
+        tokenizer = self._tokenizer
+        ids = numpy.flatnonzero(streams)
+        length = self._data_length[ids]
+        if not truncated and tokenizer._drop_tailing_silence:
+            length = numpy.maximum(0, length - self._silence_length[ids])
+
+        deliver = length >= self._min_length[ids]
+        if not tokenizer._strict_min_length:
+            deliver |= (length > 0) & self._contiguous_token[ids]
+
+        delivered = ids[deliver]
+        start = self._start_frame[delivered]
+        end = start + length[deliver] - 1
+        self._tokens.extend(zip(delivered.tolist(), start.tolist(), end.tolist()))
+
+        if truncated:
+            # next token (if any) will start at next frame and is contiguous with this one
+            self._start_frame[delivered] = self._current_frame[delivered] + 1
+            self._contiguous_token[delivered] = True
+            self._contiguous_token[ids[~deliver]] = False
+        else:
+            self._contiguous_token[ids] = False
+
+        self._data_length[ids] = 0
+
+
+class TokenizerSweep():
+    """
+    Run a grid of tokenizer configurations on the same audio data in one pass, e.g. to
+    tune `energy_threshold`, `min_length`, `max_length` and `max_continuous_silence`.
+    The log energy of each frame is computed only once and then compared to the
+    threshold of every configuration. All configurations are advanced in lockstep by
+    a :class:`MultiStreamTokenizer` with one stream per configuration, so the cost of
+    a configuration is that of a few vectorized automaton steps (if numpy is available)
+    instead of reading and validating audio data again.
+
+    Configurations are all the combinations of the given values (in the order of
+    `itertools.product`), except those that are not valid for :class:`StreamTokenizer`
+    (e.g. `min_length` > `max_length`). They are available in `configurations` as
+    `(energy_threshold, min_length, max_length, max_continuous_silence)` tuples.
+
+    :Parameters:
+
+        `energy_thresholds` : sequence of floats
+            log energy thresholds, see :class:`auditok.util.AudioEnergyValidator`.
+
+        `min_lengths`, `max_lengths`, `max_continuous_silences` : sequences of ints
+            see :class:`StreamTokenizer`.
+
+        `init_min`, `init_max_silence`, `mode` :
+            see :class:`StreamTokenizer`, used for all configurations.
+
+        `keep_tokens` : *(bool)*
+            if False, only the statistics of each configuration are kept (see
+            :func:`get_statistics`), memory then does not depend on the number of tokens.
+            Default: True.
+
+    :Example:
+
+    .. code:: python
+
+        sweep = TokenizerSweep(energy_thresholds=[45, 50, 55, 60], min_lengths=[10, 20],
+                               max_lengths=[500, 1000], max_continuous_silences=[20, 30, 50])
+        sweep.run(WaveAudioSource("recording.wav"), block_size=160)
+        for configuration, (nb_tokens, nb_frames) in zip(sweep.configurations,
+                                                         sweep.get_statistics()):
+            print(configuration, nb_tokens, nb_frames)
+
+    Log energies can also be taken from an :class:`auditok.util.EnergyIndex`:
+
+    .. code:: python
+
+        sweep.feed(index.get_log_energies())
+        sweep.flush()
+        tokens = sweep.get_tokens()
+    """
+
+    def __init__(self, energy_thresholds, min_lengths, max_lengths, max_continuous_silences,
+                 init_min=0, init_max_silence=0, mode=0, keep_tokens=True):
+
+        self.configurations = [(energy_threshold, min_length, max_length, max_continuous_silence)
+                               for energy_threshold, min_length, max_length, max_continuous_silence
+                               in product(energy_thresholds, min_lengths, max_lengths,
+                                          max_continuous_silences)
+                               if 0 < min_length <= max_length and max_continuous_silence < max_length
+                               and init_min < max_length]
+        if len(self.configurations) == 0:
+            raise ValueError("No valid combination of tokenizer parameters")
+
+        thresholds, min_lengths, max_lengths, max_continuous_silences = zip(*self.configurations)
+        # frames are validated by comparing log energies to thresholds (see feed)
+        self._tokenizer = MultiStreamTokenizer(None, len(self.configurations),
+                                               min_lengths, max_lengths, max_continuous_silences,
+                                               init_min, init_max_silence, mode)
+        if _WITH_NUMPY:
+            self._thresholds = numpy.array(thresholds, dtype=numpy.float64)[:, None]
+        else:
+            self._thresholds = thresholds
+        self.keep_tokens = keep_tokens
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all previous frames, tokens and statistics.
+        """
+        self._tokenizer.reset()
+        nb_configurations = len(self.configurations)
+        self._tokens = [[] for _ in range(nb_configurations)] if self.keep_tokens else None
+        self._nb_tokens = [0] * nb_configurations
+        self._nb_frames = [0] * nb_configurations
+
+    def feed(self, log_energies):
+        """
+        Advance all configurations by `len(log_energies)` frames.
+
+        :Parameters:
+
+            `log_energies` : sequence of floats
+                log energies of the next frames, e.g. returned by
+                :func:`auditok.util.AudioEnergyValidator.log_energy_batch`.
+        """
+        if _WITH_NUMPY:
+            log_energies = numpy.asarray(log_energies, dtype=numpy.float64)
+            mask = log_energies[None, :] >= self._thresholds
+        else:
+            log_energies = list(log_energies)
+            mask = [[log_energy >= threshold for log_energy in log_energies]
+                    for threshold in self._thresholds]
+        self._add_tokens(self._tokenizer.feed_mask(mask))
+
+    def flush(self):
+        """
+        End the audio stream, the last tokens of each configuration, if any, are
+        added to the results and the frame counter is reset.
+        """
+        self._add_tokens(self._tokenizer.flush())
+
+    def _add_tokens(self, tokens):
+        for i, start, end in tokens:
+            self._nb_tokens[i] += 1
+            self._nb_frames[i] += end - start + 1
+            if self.keep_tokens:
+                self._tokens[i].append((start, end))
+
+    def get_tokens(self):
+        """
+        :Returns:
+
+        A list with, for each configuration (in the order of `configurations`), the
+        list of `(start, end)` frame indices of its tokens.
+        """
+        if not self.keep_tokens:
+            raise ValueError("Tokens are not kept, use keep_tokens=True")
+        return self._tokens
+
+    def get_statistics(self):
+        """
+        :Returns:
+
+        A list with, for each configuration (in the order of `configurations`), a
+        `(nb_tokens, nb_frames)` tuple where `nb_frames` is the total length of
+        tokens in frames (multiply by the frame duration to get a duration in seconds).
+        """
+        return list(zip(self._nb_tokens, self._nb_frames))
+
+    def run(self, audio_source, block_size, use_channel="any", batch_size=1000):
+        """
+        Reset the sweep, then read all data from `audio_source` and run all
+        configurations on it.
+
+        :Parameters:
+
+            `audio_source` : :class:`auditok.io.AudioSource`
+                audio source to read data from, it is opened if needed and read until
+                its end.
+
+            `block_size` : *(int)*
+                number of samples of a frame
+
+            `use_channel` : *(int or str)*
+                see :class:`auditok.util.AudioEnergyValidator`
+
+            `batch_size` : *(int)*
+                number of frames read and validated at once
+
+        :Returns:
+
+        The statistics of each configuration, see :func:`get_statistics`.
+        """
+        validator = AudioEnergyValidator(sample_width=audio_source.get_sample_width(),
+                                         channels=audio_source.get_channels(),
+                                         use_channel=use_channel)
+        self.reset()
+        for log_energies in _log_energy_batches(audio_source, validator, block_size, batch_size):
+            self.feed(log_energies)
+        self.flush()
+
+        return self.get_statistics()
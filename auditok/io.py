@@ -10,8 +10,11 @@ Class summary
         Rewindable
         BufferAudioSource
         WaveAudioSource
+        MmapWaveAudioSource
         PyAudioSource
         StdinAudioSource
+        FFmpegAudioSource
+        PrefetchAudioSource
         PyAudioPlayer
         
 
@@ -26,15 +29,31 @@ Function summary
 
 from abc import ABCMeta, abstractmethod
 import wave
+import mmap
+import struct
+import subprocess
 import sys
+import tempfile
+import threading
 
-__all__ = ["AudioSource", "Rewindable", "BufferAudioSource", "WaveAudioSource",
-           "PyAudioSource", "StdinAudioSource", "PyAudioPlayer", "from_file", "player_for"]
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+__all__ = ["AudioSource", "Rewindable", "BufferAudioSource", "WaveAudioSource", "MmapWaveAudioSource",
+           "PyAudioSource", "StdinAudioSource", "FFmpegAudioSource", "PrefetchAudioSource",
+           "PyAudioPlayer", "from_file", "player_for"]
 
 DEFAULT_SAMPLE_RATE = 16000
 DEFAULT_SAMPLE_WIDTH = 2
 DEFAULT_NB_CHANNELS = 1
 
+_PCM_FORMATS = (1, 0xFFFE)  # WAVE_FORMAT_PCM and WAVE_FORMAT_EXTENSIBLE
+
+# a memoryview can only be created on an mmap object with Python 3
+_WITH_MMAP_BUFFERS = sys.version_info >= (3, 0)
+
 
 class AudioSource():
     """ 
@@ -53,8 +72,9 @@ class AudioSource():
             Default = 2.
 
         `channels` : int
-            Number of channels of audio stream. The current version supports
-            only mono audio streams (i.e. one channel).
+            Number of channels of audio stream. Samples of multi-channel audio
+            streams are interleaved and each read block holds all channels.
+            Default = 1.
     """
 
     __metaclass__ = ABCMeta
@@ -66,8 +86,8 @@ class AudioSource():
         if not sample_width in (1, 2, 4):
             raise ValueError("Sample width must be one of: 1, 2 or 4 (bytes)")
 
-        if channels != 1:
-            raise ValueError("Only mono audio is currently handled")
+        if channels < 1:
+            raise ValueError("Number of channels must be >= 1")
 
         self._sampling_rate = sampling_rate
         self._sample_width = sample_width
@@ -104,6 +124,35 @@ class AudioSource():
             - 'left_samples' if `size` > 'left_samples' 
         """
 
+    def readinto(self, buffer, size):
+        """
+        Read `size` audio samples at most and write them into `buffer` rather
+        than returning a new buffer, so that the same memory can be used for
+        every read. This default implementation copies data returned by
+        :func:`read`, subclasses should write data directly into `buffer` when possible.
+
+        :Parameters:
+
+            `buffer` : a writable bytes-like object (e.g. `bytearray`)
+                buffer of at least `size` * 'sample_width' * 'channels' bytes.
+
+            `size` : int
+                the number of samples to read.
+
+        :Returns:
+
+            The number of bytes written into `buffer`, 0 if there is no more data.
+        """
+        data = self.read(size)
+        if data is None:
+            return 0
+        memoryview(buffer)[:len(data)] = data
+        return len(data)
+
+    def _check_readinto_buffer(self, buffer, size):
+        if len(buffer) < size * self.sample_width * self.channels:
+            raise ValueError("buffer is too small to read {0} samples".format(size))
+
     def get_sampling_rate(self):
         """ Return the number of samples per second of audio stream """
         return self.sampling_rate
@@ -203,10 +252,11 @@ class BufferAudioSource(AudioSource, Rewindable):
                  sample_width=DEFAULT_SAMPLE_WIDTH,
                  channels=DEFAULT_NB_CHANNELS):
 
+        AudioSource.__init__(self, sampling_rate, sample_width, channels)
+
         if len(data_buffer) % (sample_width * channels) != 0:
             raise ValueError("length of data_buffer must be a multiple of (sample_width * channels)")
 
-        AudioSource.__init__(self, sampling_rate, sample_width, channels)
         self._buffer = data_buffer
         self._index = 0
         self._left = 0 if self._buffer is None else len(self._buffer)
@@ -240,6 +290,20 @@ class BufferAudioSource(AudioSource, Rewindable):
 
         return None
 
+    def readinto(self, buffer, size):
+        if not self._is_open:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        if self._left <= 0:
+            return 0
+
+        to_read = min(size * self.sample_width * self.channels, self._left)
+        memoryview(buffer)[:to_read] = memoryview(self._buffer)[self._index: self._index + to_read]
+        self._index += to_read
+        self._left -= to_read
+        return to_read
+
     def get_data_buffer(self):
         """ Return all audio data as one string buffer. """
         return self._buffer
@@ -277,10 +341,10 @@ class BufferAudioSource(AudioSource, Rewindable):
         self.set_position(0)
 
     def get_position(self):
-        return self._index / self.sample_width
+        return self._index // (self.sample_width * self.channels)
 
     def get_time_position(self):
-        return float(self._index) / (self.sample_width * self.sampling_rate)
+        return float(self._index) / (self.sample_width * self.channels * self.sampling_rate)
 
     def set_position(self, position):
         if position < 0:
@@ -291,7 +355,7 @@ class BufferAudioSource(AudioSource, Rewindable):
             self._left = 0
             return
 
-        position *= self.sample_width
+        position *= self.sample_width * self.channels
         self._index = position if position < len(self._buffer) else len(self._buffer)
         self._left = len(self._buffer) - self._index
 
@@ -314,6 +378,9 @@ class WaveAudioSource(AudioSource):
 
         self._filename = filename
         self._audio_stream = None
+        # raw file and offset of audio data for readinto
+        self._fp = None
+        self._data_offset = None
 
         stream = wave.open(self._filename)
         AudioSource.__init__(self, stream.getframerate(),
@@ -332,6 +399,9 @@ class WaveAudioSource(AudioSource):
         if self._audio_stream is not None:
             self._audio_stream.close()
             self._audio_stream = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
 
     def read(self, size):
         if self._audio_stream is None:
@@ -342,6 +412,188 @@ class WaveAudioSource(AudioSource):
                 return None
             return data
 
+    def readinto(self, buffer, size):
+        if self._audio_stream is None:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        if self._fp is None:
+            # the wave module can only return new buffers, read audio data
+            # directly from the file at the position of the wave stream
+            if self._data_offset is None:
+                self._data_offset = _read_wave_header(self._filename)[3]
+            self._fp = open(self._filename, "rb")
+
+        position = self._audio_stream.tell()
+        size = min(size, self._audio_stream.getnframes() - position)
+        if size <= 0:
+            return 0
+        frame_size = self.sample_width * self.channels
+        self._fp.seek(self._data_offset + position * frame_size)
+        nb_bytes = self._fp.readinto(memoryview(buffer)[:size * frame_size])
+        self._audio_stream.setpos(position + nb_bytes // frame_size)
+        return nb_bytes
+
+
+def _read_wave_header(filename):
+    """
+    Parse the header of a wave file.
+
+    :Returns:
+
+        a tuple (sampling_rate, sample_width, channels, data_offset, data_size) where
+        `data_offset` is the position of audio data in the file and `data_size`
+        its size in bytes.
+    """
+    with open(filename, "rb") as fp:
+        fp.seek(0, 2)
+        file_size = fp.tell()
+        fp.seek(0)
+
+        riff, _, wave_id = struct.unpack("<4sI4s", fp.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError("'{0}' is not a wave file".format(filename))
+
+        fmt = None
+        while True:
+            header = fp.read(8)
+            if len(header) < 8:
+                raise ValueError("No data chunk in wave file '{0}'".format(filename))
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", fp.read(16))
+                fp.seek(chunk_size - 16 + chunk_size % 2, 1)
+
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("No fmt chunk before data in wave file '{0}'".format(filename))
+                data_offset = fp.tell()
+                # size may be wrong for files written by streaming tools
+                data_size = min(chunk_size, file_size - data_offset)
+                break
+
+            else:
+                # chunks are word aligned
+                fp.seek(chunk_size + chunk_size % 2, 1)
+
+    audio_format, channels, sampling_rate, _, _, bits_per_sample = fmt
+    if audio_format not in _PCM_FORMATS:
+        raise ValueError("Only PCM wave files are supported (format: {0})".format(audio_format))
+
+    return sampling_rate, bits_per_sample // 8, channels, data_offset, data_size
+
+
+class MmapWaveAudioSource(AudioSource, Rewindable):
+    """
+    A class for an :class:`AudioSource` that reads data from a memory-mapped wave file.
+    The RIFF header is parsed once and the data chunk is mapped into memory, :func:`read`
+    then returns `memoryview` slices of the mapped data without any system call or copy.
+    Moving to an absolute position is an O(1) operation, so huge files can be processed
+    without loading them into memory.
+
+    Note that the returned `memoryview` objects are only valid as long as the file is
+    mapped. The file is unmapped when the source is closed and no slice is in use
+    anymore.
+
+    This class requires Python 3, use a :class:`WaveAudioSource` with Python 2.
+
+    :Parameters:
+
+        `filename` :
+            path to a valid wave file (uncompressed PCM data)
+    """
+
+    def __init__(self, filename):
+
+        if not _WITH_MMAP_BUFFERS:
+            raise ValueError("MmapWaveAudioSource requires Python 3 (memoryview on mmap objects)")
+
+        self._filename = filename
+        self._mmap = None
+        self._data = None
+        self._index = 0
+
+        sampling_rate, sample_width, channels, self._data_offset, self._data_size = \
+            _read_wave_header(filename)
+        AudioSource.__init__(self, sampling_rate, sample_width, channels)
+        self._frame_size = self.sample_width * self.channels
+        # ignore an incomplete last sample
+        self._data_size -= self._data_size % self._frame_size
+
+    def is_open(self):
+        return self._data is not None
+
+    def _map(self):
+        with open(self._filename, "rb") as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return mm, memoryview(mm)[self._data_offset: self._data_offset + self._data_size]
+
+    def open(self):
+        if self._data is None:
+            self._mmap, self._data = self._map()
+            self._index = 0
+
+    def close(self):
+        if self._data is not None:
+            self._data = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                # some slices are still in use, the file will be
+                # unmapped when they are garbage collected
+                pass
+            self._mmap = None
+
+    def read(self, size):
+        if self._data is None:
+            raise IOError("Stream is not open")
+
+        if self._index >= self._data_size:
+            return None
+
+        end = self._index + size * self._frame_size
+        data = self._data[self._index: end]
+        self._index = min(end, self._data_size)
+        return data
+
+    def readinto(self, buffer, size):
+        if self._data is None:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        to_read = min(size * self._frame_size, self._data_size - self._index)
+        if to_read <= 0:
+            return 0
+        memoryview(buffer)[:to_read] = self._data[self._index: self._index + to_read]
+        self._index += to_read
+        return to_read
+
+    def get_data_buffer(self):
+        """ Return all audio data as a `memoryview` on the mapped file. """
+        if self._data is None:
+            # the mapping lives as long as the returned view
+            return self._map()[1]
+        return self._data
+
+    def rewind(self):
+        self.set_position(0)
+
+    def get_position(self):
+        return self._index // self._frame_size
+
+    def get_time_position(self):
+        return float(self.get_position()) / self.sampling_rate
+
+    def set_position(self, position):
+        if position < 0:
+            raise ValueError("position must be >= 0")
+        self._index = min(position * self._frame_size, self._data_size)
+
+    def set_time_position(self, time_position):  # time in seconds
+        position = int(self.sampling_rate * time_position)
+        self.set_position(position)
+
 
 class PyAudioSource(AudioSource):
     """
@@ -427,6 +679,347 @@ class StdinAudioSource(AudioSource):
 
         return data
 
+    def readinto(self, buffer, size):
+        if sys.version_info < (3, 0):
+            return AudioSource.readinto(self, buffer, size)
+
+        if not self._is_open:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        to_read = size * self.sample_width * self.channels
+        nb_bytes = sys.stdin.buffer.readinto(memoryview(buffer)[:to_read])
+        return nb_bytes or 0
+
+
+class FFmpegAudioSource(AudioSource):
+    """
+    An :class:`AudioSource` that reads data from an audio file of any format `ffmpeg`
+    can decode (e.g. mp3, ogg, flv). The file is decoded by a subprocess that writes
+    raw audio data to its standard output, data is read from the pipe as it is decoded.
+    Thus, reading can start as soon as the decoder is started and memory usage does not
+    depend on the duration of the file: the decoder waits whenever the (bounded) pipe
+    buffer is full.
+
+    :Parameters:
+
+        `filename` :
+            path to an audio file
+
+        `sampling_rate`, `sample_width`, `channels` :
+            format of decoded audio data. The decoder resamples data and mixes channels
+            if the audio file has a different format. If `sampling_rate` or `channels`
+            is None (default), that of the audio file is kept (it is read with `prober`).
+            Default `sample_width`: 2.
+
+        `decoder` : str
+            path to the `ffmpeg` executable. Any program that takes the same arguments and
+            writes raw audio data to its standard output can be used. Default: 'ffmpeg'.
+
+        `prober` : str
+            path to the `ffprobe` executable, only used if `sampling_rate` or `channels`
+            is None. Default: 'ffprobe'.
+    """
+
+    _formats = {1: "s8", 2: "s16le", 4: "s32le"}
+
+    def __init__(self, filename, sampling_rate=None,
+                 sample_width=DEFAULT_SAMPLE_WIDTH,
+                 channels=None,
+                 decoder="ffmpeg", prober="ffprobe"):
+
+        if sampling_rate is None or channels is None:
+            file_sampling_rate, file_channels = FFmpegAudioSource._probe(filename, prober)
+            if sampling_rate is None:
+                sampling_rate = file_sampling_rate
+            if channels is None:
+                channels = file_channels
+
+        AudioSource.__init__(self, sampling_rate, sample_width, channels)
+        self._filename = filename
+        self._decoder = decoder
+        self._process = None
+        self._stderr = None
+
+    @staticmethod
+    def _probe(filename, prober):
+        # return the sampling rate and the number of channels of the first audio stream
+        command = [prober, "-v", "error", "-select_streams", "a:0",
+                   "-show_entries", "stream=sample_rate,channels",
+                   "-of", "default=noprint_wrappers=1", filename]
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise IOError("Cannot probe '{0}' with '{1}': {2}".format(filename, prober, e))
+        output, errors = process.communicate()
+
+        values = {}
+        for line in output.decode("utf-8", "replace").splitlines():
+            name, _, value = line.strip().partition("=")
+            values[name] = value
+        try:
+            return int(values["sample_rate"]), int(values["channels"])
+        except (KeyError, ValueError):
+            message = errors.decode("utf-8", "replace").strip()
+            raise IOError("Cannot probe '{0}', no audio stream found: {1}".format(filename, message))
+
+    def _get_command(self):
+        # the format is always given so that decoded data has the announced format,
+        # even if it is that of the audio file
+        data_format = self._formats[self.sample_width]
+        return [self._decoder, "-nostdin", "-loglevel", "error", "-i", self._filename, "-vn",
+                "-f", data_format, "-acodec", "pcm_" + data_format,
+                "-ar", str(self.sampling_rate), "-ac", str(self.channels), "-"]
+
+    def is_open(self):
+        return self._process is not None
+
+    def open(self):
+        if self._process is None:
+            # error messages are kept in a file to be reported if decoding fails,
+            # a pipe that is never read could block the decoder
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(self._get_command(), stdout=subprocess.PIPE,
+                                             stderr=self._stderr)
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            if self._process.poll() is None:
+                # data has not been entirely read, stop decoding
+                self._process.terminate()
+            self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    def read(self, size):
+        if self._process is None:
+            raise IOError("Stream is not open")
+
+        data = self._process.stdout.read(size * self.sample_width * self.channels)
+        if data is None or len(data) < 1:
+            self._check_decoder()
+            return None
+        return data
+
+    def readinto(self, buffer, size):
+        if sys.version_info < (3, 0):
+            return AudioSource.readinto(self, buffer, size)
+
+        if self._process is None:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        to_read = size * self.sample_width * self.channels
+        nb_bytes = self._process.stdout.readinto(memoryview(buffer)[:to_read])
+        if not nb_bytes:
+            self._check_decoder()
+            return 0
+        return nb_bytes
+
+    def _check_decoder(self):
+        # no more data, make sure this is not because decoding failed
+        status = self._process.wait()
+        if status != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode("utf-8", "replace").strip()
+            raise IOError("Cannot decode '{0}', decoder exited with status {1}: {2}".format(self._filename,
+                                                                                          status, message))
+
+
+class PrefetchAudioSource(AudioSource):
+    """
+    An :class:`AudioSource` that reads data from another audio source in a background
+    thread, so that waiting for data (e.g. from a file, a pipe or standard input)
+    overlaps with the processing of data already read. Data is read by chunks into a
+    fixed number of preallocated buffers: the background thread fills free buffers
+    and :func:`read` returns data from filled ones.
+
+    :Parameters:
+
+        `audio_source` : :class:`AudioSource`
+            the audio source to read data from
+
+        `chunk_size` : int
+            number of samples read at once by the background thread. Default: half a
+            second of data.
+
+        `nb_buffers` : int
+            number of buffers (i.e. maximum number of chunks read in advance). Default: 4.
+
+    Use :attr:`fill_level`, :attr:`read_stalls` and :attr:`prefetch_stalls` to know
+    whether reading data or processing it is the bottleneck.
+    """
+
+    def __init__(self, audio_source, chunk_size=None, nb_buffers=4):
+
+        AudioSource.__init__(self, audio_source.get_sampling_rate(),
+                             audio_source.get_sample_width(),
+                             audio_source.get_channels())
+        if chunk_size is None:
+            chunk_size = self.sampling_rate // 2
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be > 0")
+        if nb_buffers <= 0:
+            raise ValueError("nb_buffers must be > 0")
+
+        self._audio_source = audio_source
+        self._chunk_size = chunk_size
+        self._nb_buffers = nb_buffers
+        self._thread = None
+        self._read_stalls = 0
+        self._prefetch_stalls = 0
+        self._reset()
+
+    def _reset(self):
+        self._free = None
+        self._filled = None
+        self._stop = False
+        # current chunk
+        self._buffer = None
+        self._view = None
+        self._start = 0
+        self._end = 0
+        self._end_of_data = False
+
+    def get_audio_source(self):
+        """ Return the audio source data is read from """
+        return self._audio_source
+
+    @property
+    def fill_level(self):
+        """ Number of chunks read in advance and not yet returned by :func:`read` """
+        filled = self._filled
+        return 0 if filled is None else filled.qsize()
+
+    @property
+    def read_stalls(self):
+        """
+        Number of times :func:`read` had to wait for the background thread.
+        If this is high, reading data is the bottleneck (I/O-bound).
+        """
+        return self._read_stalls
+
+    @property
+    def prefetch_stalls(self):
+        """
+        Number of times the background thread had to wait for a free buffer.
+        If this is high, processing data is the bottleneck (CPU-bound).
+        """
+        return self._prefetch_stalls
+
+    def is_open(self):
+        return self._thread is not None
+
+    def open(self):
+        if self._thread is not None:
+            return
+        self._audio_source.open()
+        chunk_bytes = self._chunk_size * self.sample_width * self.channels
+        self._free = Queue()
+        self._filled = Queue()
+        for _ in range(self._nb_buffers):
+            self._free.put(bytearray(chunk_bytes))
+        self._thread = threading.Thread(target=self._prefetch)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._stop = True
+            # wake up the background thread if it waits for a free buffer
+            self._free.put(None)
+            self._thread.join()
+            self._thread = None
+            self._audio_source.close()
+            self._reset()
+
+    def _prefetch(self):
+        # background thread
+        free = self._free
+        filled = self._filled
+        try:
+            while True:
+                try:
+                    buffer = free.get_nowait()
+                except Empty:
+                    self._prefetch_stalls += 1
+                    buffer = free.get()
+                if self._stop:
+                    break
+                nb_bytes = self._audio_source.readinto(buffer, self._chunk_size)
+                filled.put((buffer, nb_bytes))
+                if nb_bytes == 0:
+                    break
+        except Exception as e:
+            # raised again by read
+            filled.put((None, e))
+
+    def _next_chunk(self):
+        # Give the current buffer back to the background thread and get the next
+        # filled buffer. Return False if there is no more data.
+        if self._end_of_data:
+            return False
+        if self._buffer is not None:
+            self._free.put(self._buffer)
+            self._buffer = self._view = None
+        try:
+            buffer, nb_bytes = self._filled.get_nowait()
+        except Empty:
+            self._read_stalls += 1
+            buffer, nb_bytes = self._filled.get()
+        if buffer is None:
+            self._end_of_data = True
+            raise nb_bytes
+        if nb_bytes == 0:
+            self._free.put(buffer)
+            self._end_of_data = True
+            return False
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._start = 0
+        self._end = nb_bytes
+        return True
+
+    def read(self, size):
+        if self._thread is None:
+            raise IOError("Stream is not open")
+
+        to_read = size * self.sample_width * self.channels
+        blocks = []
+        while to_read > 0:
+            if self._start >= self._end and not self._next_chunk():
+                break
+            end = min(self._start + to_read, self._end)
+            blocks.append(self._view[self._start: end].tobytes())
+            to_read -= end - self._start
+            self._start = end
+
+        if len(blocks) == 0:
+            return None
+        if len(blocks) == 1:
+            return blocks[0]
+        return b"".join(blocks)
+
+    def readinto(self, buffer, size):
+        if self._thread is None:
+            raise IOError("Stream is not open")
+        self._check_readinto_buffer(buffer, size)
+
+        to_read = size * self.sample_width * self.channels
+        out = memoryview(buffer)
+        nb_bytes = 0
+        while nb_bytes < to_read:
+            if self._start >= self._end and not self._next_chunk():
+                break
+            end = min(self._start + to_read - nb_bytes, self._end)
+            out[nb_bytes: nb_bytes + end - self._start] = self._view[self._start: end]
+            nb_bytes += end - self._start
+            self._start = end
+        return nb_bytes
+
 
 class PyAudioPlayer():
     """
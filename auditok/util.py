@@ -12,15 +12,30 @@ Class summary
         ADSFactory.OverlapADS
         ADSFactory.LimiterADS
         ADSFactory.RecorderADS
+        ADSFactory.FusedADS
         DataValidator
         AudioEnergyValidator
+        SlidingEnergyValidator
+        AdaptiveEnergyValidator
+        SpectralBandEnergyValidator
+        ZeroCrossingEnergyValidator
+        EnergyIndex
+        EnergyHistogram
 
 """
 
 from abc import ABCMeta, abstractmethod
+import binascii
+import hashlib
 import math
+import mmap
+import operator
+import os
+import struct
+import tempfile
 from array import array
-from .io import Rewindable, from_file, BufferAudioSource, PyAudioSource
+from collections import deque
+from .io import Rewindable, from_file, BufferAudioSource, PyAudioSource, _WITH_MMAP_BUFFERS
 from .exceptions import DuplicateArgument
 import sys
 
@@ -37,7 +52,9 @@ except ImportError as e:
     if sys.version_info >= (3, 0):
         basestring = str
 
-__all__ = ["DataSource", "DataValidator", "StringDataSource", "ADSFactory", "AudioEnergyValidator"]
+__all__ = ["DataSource", "DataValidator", "StringDataSource", "ADSFactory", "AudioEnergyValidator",
+           "SlidingEnergyValidator", "AdaptiveEnergyValidator", "SpectralBandEnergyValidator",
+           "ZeroCrossingEnergyValidator", "EnergyIndex", "EnergyHistogram"]
 
 
 class DataSource():
@@ -69,6 +86,79 @@ class DataValidator():
         Check whether `data` is valid
         """
 
+    def is_valid_batch(self, data, frame_size, hop_size=None):
+        """
+        Check the validity of each of the consecutive frames of `data`.
+        The default implementation calls :func:`is_valid` on every frame,
+        subclasses can override it to validate all frames in one go.
+
+        :Parameters:
+
+            `data` :
+                a buffer that holds several frames, one after the other.
+
+            `frame_size` : *(int)*
+                length of one frame in `data` (i.e. number of bytes for audio data).
+                The last frame may be shorter.
+
+            `hop_size` : *(int)*
+                distance between the start of two consecutive frames, if frames
+                overlap (see :class:`ADSFactory.OverlapADS`). Default: `frame_size`.
+
+        :Returns:
+
+            A sequence of booleans, one per frame.
+        """
+        if hop_size is None:
+            hop_size = frame_size
+        nb_frames = _nb_blocks(len(data), frame_size, hop_size)
+        return [self.is_valid(data[i * hop_size: i * hop_size + frame_size]) for i in range(nb_frames)]
+
+
+def _nb_blocks(length, block_size, hop_size):
+    """
+    Return the number of blocks of `block_size` bytes whose starts are `hop_size`
+    bytes apart in a buffer of `length` bytes. The last block may be shorter
+    (this is the number of blocks :class:`ADSFactory.OverlapADS` would read).
+    """
+    if length <= 0:
+        return 0
+    if length <= block_size:
+        return 1
+    return 1 + (length - block_size + hop_size - 1) // hop_size
+
+
+def _read_blocks_one_by_one(read, n, overlap=0, first_block=None):
+    """
+    Call `read` until `n` blocks are read and return a tuple (data, nb_blocks) with
+    the concatenation of blocks or None if there is no block at all. Used for data
+    sources that cannot read several blocks at once (e.g. non-audio data).
+    If blocks overlap, the first `overlap` items of each block but the first are
+    already in data and are not copied again. `first_block` is a block that has
+    already been read, if any.
+    """
+    blocks = [] if first_block is None else [first_block]
+    while len(blocks) < n:
+        block = read()
+        if block is None:
+            break
+        blocks.append(block[overlap:] if blocks else block)
+    if not blocks:
+        return None
+    return blocks[0][:0].join(blocks), len(blocks)
+
+
+def _join_block_and_hops(block, hops):
+    """
+    Return the concatenation of `block` and `hops` as bytes. With Python 2,
+    bytes.join does not accept memoryview objects.
+    """
+    if isinstance(block, memoryview):
+        block = block.tobytes()
+    if isinstance(hops, memoryview):
+        hops = hops.tobytes()
+    return b''.join((block, hops))
+
 
 class StringDataSource(DataSource):
     """
@@ -119,6 +209,122 @@ class StringDataSource(DataSource):
         self._current = 0
 
 
+class _AudioRecording():
+    """
+    Storage for audio data recorded by :class:`ADSFactory.RecorderADS` and
+    :class:`ADSFactory.FusedADS`.
+
+    Data is appended to a growable `bytearray`. Past `max_memory` bytes, data is
+    written to a temporary file instead. If `ring_size` is given, only the last
+    `ring_size` bytes are kept in a preallocated circular buffer.
+    """
+
+    def __init__(self, max_memory=None, ring_size=None):
+        self.max_memory = max_memory
+        self.ring_size = ring_size
+        self._cache = bytearray()
+        self._cache_list = None
+        self._spill_file = None
+        # allocated with the first recorded block
+        self._ring = None
+        self._ring_pos = 0
+        self._ring_full = False
+
+    def append(self, block):
+        if self.ring_size is not None:
+            self._append_ring(block)
+
+        elif self._spill_file is not None:
+            self._spill_file.write(block)
+
+        elif self._cache_list is not None:
+            self._cache_list.append(block)
+
+        else:
+            if self.max_memory is not None and len(self._cache) + len(block) > self.max_memory:
+                # write memory data and data to come to a file
+                self._spill_file = tempfile.TemporaryFile()
+                self._spill_file.write(self._cache)
+                self._spill_file.write(block)
+                self._cache = None
+                return
+            try:
+                self._cache += block
+            except TypeError:
+                if len(self._cache) > 0:
+                    raise
+                # Not a bytes-like object (e.g. 'str' in python 3)
+                self._cache_list = [block]
+
+    def _append_ring(self, block):
+        if self._ring is None:
+            self._ring = bytearray(self.ring_size)
+        ring = self._ring
+        size = self.ring_size
+        block = memoryview(block)
+        if len(block) >= size:
+            ring[:] = block[len(block) - size:]
+            self._ring_pos = 0
+            self._ring_full = True
+            return
+
+        pos = self._ring_pos
+        first = min(len(block), size - pos)
+        ring[pos: pos + first] = block[:first]
+        if first < len(block):
+            ring[:len(block) - first] = block[first:]
+        if pos + len(block) >= size:
+            self._ring_full = True
+        self._ring_pos = (pos + len(block)) % size
+
+    def get_data(self):
+        """
+        Return recorded data as one buffer. This should be called once, when recording
+        is over.
+        """
+        data = self._get_data()
+        if not _WITH_MMAP_BUFFERS and isinstance(data, bytearray):
+            # with python 2, most consumers of audio data (e.g. array, str.join)
+            # expect a 'str' object
+            return bytes(data)
+        return data
+
+    def _get_data(self):
+        if self.ring_size is not None:
+            if self._ring is None:
+                return b''
+            pos = self._ring_pos
+            if self._ring_full:
+                return self._ring[pos:] + self._ring[:pos]
+            return self._ring[:pos]
+
+        if self._spill_file is not None:
+            self._spill_file.flush()
+            if not _WITH_MMAP_BUFFERS:
+                # a memoryview cannot be created on an mmap object with python 2
+                self._spill_file.seek(0)
+                data = self._spill_file.read()
+                self._spill_file.close()
+                return data
+            data = memoryview(mmap.mmap(self._spill_file.fileno(), 0,
+                                        access=mmap.ACCESS_READ))
+            # the file is deleted when closed, the mapping remains valid
+            self._spill_file.close()
+            return data
+
+        if self._cache_list is not None:
+            try:
+                # should always work for python 2
+                # work for python 3 ONLY if data is a list (or an iterator)
+                # whose each element is a 'bytes' objects
+                return b''.join(self._cache_list)
+            except TypeError:
+                # work for 'str' in python 2 and python 3
+                return ''.join(self._cache_list)
+
+        return self._cache
+
+
 class ADSFactory:
     """
     Factory class that makes it easy to create an :class:`ADSFactory.AudioDataSource` object that implements
@@ -142,6 +348,7 @@ class ADSFactory:
 
         for k in kwargs:
             if not k in ["block_dur", "hop_dur", "block_size", "hop_size", "max_time", "record",
+                         "record_max_memory", "record_ring_dur",
                          "audio_source", "filename", "data_buffer", "frames_per_buffer", "sampling_rate",
                          "sample_width", "channels", "sr", "sw", "ch", "asrc", "fn", "fpb", "db", "mt",
                          "rec", "bd", "hd", "bs", "hs"]:
@@ -236,7 +443,7 @@ class ADSFactory:
             number of bytes per sample (must be in (1, 2, 4)). Default = 2
 
         `channels`, `ch` : *(int)*
-            number of audio channels. Default = 1 (only this value is currently accepted)  
+            number of audio channels. Default = 1  
 
         `frames_per_buffer`, `fpb` : *(int)*
             number of samples of PyAudio buffer. Default = 1024.
@@ -260,6 +467,14 @@ class ADSFactory:
             save all read data in cache. Provide a navigable object which boasts a `rewind` method.
             Default = False.
 
+        `record_max_memory` : *(int)*
+            maximum size in bytes of recorded data to keep in memory. Further data is written
+            to a temporary file which is memory-mapped on `rewind`. Implies `record` = True.
+            Default: no limit.
+
+        `record_ring_dur` : *(float)*
+            only record the last `record_ring_dur` seconds of read data. Implies `record` = True.
+
         `block_dur`, `bd` : *(float)*
             processing block duration in seconds. This represents the quantity of audio data to return 
             each time the :func:`read` method is invoked. If `block_dur` is 0.025 (i.e. 25 ms) and the sampling
@@ -436,6 +651,8 @@ class ADSFactory:
         filename = kwargs.pop("fn")
         data_buffer = kwargs.pop("db")
         record = kwargs.pop("rec")
+        record_max_memory = kwargs.pop("record_max_memory", None)
+        record_ring_dur = kwargs.pop("record_ring_dur", None)
 
         # Case 1: an audio source is supplied
         if audio_source is not None:
@@ -467,6 +684,27 @@ class ADSFactory:
             # Set default block_size to 10 ms
             block_size = int(audio_source.get_sampling_rate() / 100)
 
+        if hop_dur is not None:
+            if hop_size is not None:
+                raise DuplicateArgument("Either 'hop_dur' or 'hop_size' can be specified, not both")
+            else:
+                hop_size = int(audio_source.get_sampling_rate() * hop_dur)
+
+        if hop_size is not None:
+            if hop_size <= 0 or hop_size > block_size:
+                raise ValueError("hop_size must be > 0 and <= block_size")
+            if hop_size == block_size:
+                hop_size = None
+
+        record = record or record_max_memory is not None or record_ring_dur is not None
+
+        # Use one object that implements all features rather than a chain of decorators
+        if [max_time is not None, record, hop_size is not None].count(True) > 1:
+            return ADSFactory.FusedADS(audio_source=audio_source, block_size=block_size,
+                                       hop_size=hop_size, max_time=max_time, record=record,
+                                       record_max_memory=record_max_memory,
+                                       record_ring_dur=record_ring_dur)
+
         # Instantiate base AudioDataSource
         ads = ADSFactory.AudioDataSource(audio_source=audio_source, block_size=block_size)
 
@@ -476,20 +714,12 @@ class ADSFactory:
 
         # Record, rewind and reuse data
         if record:
-            ads = ADSFactory.RecorderADS(ads=ads)
+            ads = ADSFactory.RecorderADS(ads=ads, max_memory=record_max_memory,
+                                         ring_dur=record_ring_dur)
 
         # Read overlapping blocks of data
-        if hop_dur is not None:
-            if hop_size is not None:
-                raise DuplicateArgument("Either 'hop_dur' or 'hop_size' can be specified, not both")
-            else:
-                hop_size = int(audio_source.get_sampling_rate() * hop_dur)
-
         if hop_size is not None:
-            if hop_size <= 0 or hop_size > block_size:
-                raise ValueError("hop_size must be > 0 and <= block_size")
-            if hop_size < block_size:
-                ads = ADSFactory.OverlapADS(ads=ads, hop_size=hop_size)
+            ads = ADSFactory.OverlapADS(ads=ads, hop_size=hop_size)
 
         return ads
 
@@ -546,6 +776,78 @@ class ADSFactory:
         def read(self):
             return self.audio_source.read(self.block_size)
 
+        def read_blocks(self, n, as_array=False):
+            """
+            Read `n` blocks at most in one call, so that many blocks can be processed
+            at once (e.g. with :func:`DataValidator.is_valid_batch`).
+
+            :Parameters:
+
+                `n` : *(int)*
+                    maximum number of blocks to read.
+
+                `as_array` : *(bool)*
+                    if True, return a 2-D numpy array of samples (requires numpy) rather
+                    than a buffer. Array rows are views on the data of each (complete)
+                    block. If blocks overlap, rows share their common samples.
+
+            :Returns:
+
+                A tuple (data, nb_blocks) or None if there is no more data. `data` is one
+                contiguous buffer that holds the `nb_blocks` blocks :func:`read`
+                would have returned. If blocks overlap, block *i* starts at `i * hop_size`
+                (in samples). The last block may be shorter than `block_size`, in
+                which case it is not part of the array returned if `as_array` is True.
+            """
+            result = self._read_blocks(n)
+            if result is None or not as_array:
+                return result
+
+            if not _WITH_NUMPY:
+                raise ValueError("as_array=True requires numpy")
+
+            data, nb_blocks = result
+            block_size, hop_size = self._get_block_and_hop_sizes()
+            block_size *= self.get_channels()
+            hop_size *= self.get_channels()
+            signal = AudioEnergyValidator._convert(data, self.get_sample_width())
+            if len(signal) < block_size:
+                nb_rows = 0
+            else:
+                nb_rows = (len(signal) - block_size) // hop_size + 1
+            itemsize = signal.itemsize
+            frames = numpy.lib.stride_tricks.as_strided(signal, shape=(nb_rows, block_size),
+                                                        strides=(hop_size * itemsize, itemsize),
+                                                        writeable=False)
+            return frames, nb_blocks
+
+        def _read_blocks(self, n):
+            data = self.audio_source.read(n * self.block_size)
+            if data is None:
+                return None
+            block_size = self.block_size * self.get_sample_width() * self.get_channels()
+            return data, _nb_blocks(len(data), block_size, block_size)
+
+        def _get_block_and_hop_sizes(self):
+            # Size of blocks returned by read and the distance between their starts
+            return self.block_size, self.block_size
+
+        def readinto(self, buffer):
+            """
+            Read one block and write it into `buffer` instead of returning a new buffer
+            (see :func:`auditok.io.AudioSource.readinto`).
+
+            :Parameters:
+
+                `buffer` : a writable bytes-like object (e.g. `bytearray`)
+                    buffer of at least `block_size` * 'sample_width' * 'channels' bytes.
+
+            :Returns:
+
+                The number of bytes written into `buffer`, 0 if there is no more data.
+            """
+            return self.audio_source.readinto(buffer, self.block_size)
+
     class ADSDecorator(AudioDataSource):
         """
         Base decorator class for AudioDataSource objects.
@@ -581,6 +883,21 @@ class ADSFactory:
                 self.ads.open()
                 self._reinit()
 
+        def readinto(self, buffer):
+            # copy data returned by read, decorators that can should write
+            # data directly into buffer
+            block = self.read()
+            if block is None:
+                return 0
+            memoryview(buffer)[:len(block)] = block
+            return len(block)
+
+        def _read_blocks(self, n):
+            return self.ads._read_blocks(n)
+
+        def _get_block_and_hop_sizes(self):
+            return self.ads._get_block_and_hop_sizes()
+
         @abstractmethod
         def _reinit(self):
             pass
@@ -588,9 +905,17 @@ class ADSFactory:
     class OverlapADS(ADSDecorator):
         """
         A class for AudioDataSource objects that can read and return overlapping
-        audio frames
+        audio frames.
+
+        Audio data is kept in a preallocated buffer: each call to :func:`read` only
+        reads `hop_size` new samples and copies them once into the buffer. The
+        overlapping part of the previous block is moved to the beginning of the buffer
+        once every few reads (the buffer is large enough for many blocks).
         """
 
+        # size of the internal buffer as a number of blocks
+        BUFFER_BLOCKS = 8
+
         def __init__(self, ads, hop_size):
             ADSFactory.ADSDecorator.__init__(self, ads)
 
@@ -604,22 +929,132 @@ class ADSFactory:
             def _get_block_size():
                 return self._actual_block_size
 
+        def read_view(self):
+            """
+            Read one block and return it as a `memoryview` on the internal buffer.
+            This avoids copying data but the returned view is only valid until the
+            next call to :func:`read` or :func:`read_view`.
+
+            :Returns:
+
+                A `memoryview` of `block_size` samples at most or None if there is
+                no more data.
+            """
+            if self._buffer is None:
+                if self._start is not None:
+                    # blocks are not bytes-like objects (e.g. 'str' in python 3)
+                    raise TypeError("read_view is not available for this data source")
+                block = self.ads.read()
+                if block is None:
+                    return None
+                return self._init_buffer(block)
+
+            end = self._end
+            if end - self._start < self._block_size_bytes:
+                # last block was incomplete
+                return None
+
+            block = self.ads.read()
+            if block is None:
+                return None
+
+            view = self._view
+            start = self._start + self._hop_size_bytes
+            new_end = end + len(block)
+            if new_end > len(view):
+                # move overlapping data to the beginning of the buffer
+                end -= start
+                view[:end] = view[start: start + end]
+                start = 0
+                new_end = end + len(block)
+
+            view[end: new_end] = block
+            self._start = start
+            self._end = new_end
+            return view[start: new_end]
+
         def _read_first_block(self):
             # For the first call, we need an entire block of size 'block_size'
             block = self.ads.read()
             if block is None:
                 return None
 
-            # Keep a slice of data in cache and append it in the next call
-            if len(block) > self._hop_size_bytes:
-                self._cache = block[self._hop_size_bytes:]
-
-            # Up from the next call, we will use '_read_next_blocks'
-            # and we only read 'hop_size'
+            try:
+                memoryview(block)
+            except TypeError:
+                # Not a bytes-like object, concatenate blocks
+                if len(block) > self._hop_size_bytes:
+                    self._cache = block[self._hop_size_bytes:]
+                self._start = 0
+
+                # Up from the next call, we will use '_read_next_blocks'
+                # and we only read 'hop_size'
+                self.ads.set_block_size(self.hop_size)
+                self.read = self._read_next_blocks
+                return block
+
+            return self._init_buffer(block).tobytes()
+
+        def _init_buffer(self, block):
+            # Copy the first block into a new buffer, up from the next call,
+            # we will use '_read_buffered' and we only read 'hop_size'
+            self._buffer = bytearray(self._block_size_bytes * self.BUFFER_BLOCKS)
+            self._view = memoryview(self._buffer)
+            self._start = 0
+            self._end = len(block)
+            self._view[:self._end] = block
             self.ads.set_block_size(self.hop_size)
-            self.read = self._read_next_blocks
+            self.read = self._read_buffered
+            return self._view[:self._end]
 
-            return block
+        def _read_buffered(self):
+            block = self.read_view()
+            if block is None:
+                return None
+            return block.tobytes()
+
+        def readinto(self, buffer):
+            block = self.read_view()
+            if block is None:
+                return 0
+            memoryview(buffer)[:len(block)] = block
+            return len(block)
+
+        def _read_blocks(self, n):
+            if self._buffer is None:
+                # first block, or blocks that are not bytes-like objects
+                block = self.read()
+                if block is None:
+                    return None
+                if self._buffer is None:
+                    return _read_blocks_one_by_one(self.read, n,
+                                                   self._block_size_bytes - self._hop_size_bytes,
+                                                   block)
+                block = memoryview(block)
+            else:
+                block = self.read_view()
+                if block is None:
+                    return None
+
+            if n == 1 or len(block) < self._block_size_bytes:
+                return block.tobytes(), 1
+
+            # read 'hop_size' samples per block from the underlying data source
+            result = self.ads._read_blocks(n - 1)
+            if result is None:
+                return block.tobytes(), 1
+            hops, nb_hops = result
+            data = _join_block_and_hops(block, hops)
+
+            # keep the last block in buffer for next reads
+            last_block = memoryview(data)[nb_hops * self._hop_size_bytes:]
+            self._view[:len(last_block)] = last_block
+            self._start = 0
+            self._end = len(last_block)
+            return data, nb_hops + 1
+
+        def _get_block_and_hop_sizes(self):
+            return self._actual_block_size, self.hop_size
 
         def _read_next_blocks(self):
             block = self.ads.read()
@@ -642,6 +1077,10 @@ class ADSFactory:
 
         def _reinit(self):
             self._cache = None
+            self._buffer = None
+            self._view = None
+            self._start = None
+            self._end = None
             self.ads.set_block_size(self._actual_block_size)
             self._hop_size_bytes = self.hop_size * \
                 self.get_sample_width() * \
@@ -676,6 +1115,34 @@ class ADSFactory:
 
             return block
 
+        def _read_blocks(self, n):
+            if self._total_read_bytes >= self._max_read_bytes:
+                return None
+
+            # blocks are read as long as the limit is not reached
+            block_size = self.get_block_size() * self.get_sample_width() * self.get_channels()
+            left = self._max_read_bytes - self._total_read_bytes
+            result = self.ads._read_blocks(min(n, (left + block_size - 1) // block_size))
+            if result is None:
+                return None
+            self._total_read_bytes += len(result[0])
+
+            if self._total_read_bytes >= self._max_read_bytes:
+                self.close()
+
+            return result
+
+        def readinto(self, buffer):
+            if self._total_read_bytes >= self._max_read_bytes:
+                return 0
+            nb_bytes = self.ads.readinto(buffer)
+            self._total_read_bytes += nb_bytes
+
+            if self._total_read_bytes >= self._max_read_bytes:
+                self.close()
+
+            return nb_bytes
+
         def _reinit(self):
             self._max_read_bytes = int(self.max_time  * self.get_sampling_rate()) * \
                 self.get_sample_width() * \
@@ -686,11 +1153,34 @@ class ADSFactory:
         """
         A class for AudioDataSource objects that can record all audio data they read,
         with a rewind facility.
+
+        Recorded data is appended to a growable `bytearray`. If `max_memory` is given,
+        data is written to a temporary file once the recording exceeds `max_memory`
+        bytes. That file is memory-mapped on :func:`rewind`. If `ring_dur` is given,
+        only the last `ring_dur` seconds of audio are kept in a preallocated circular
+        buffer.
+
+        :Parameters:
+
+            `ads` : :class:`ADSFactory.AudioDataSource`
+                the audio data source to record
+
+            `max_memory` : *(int)*
+                maximum size in bytes of the data kept in memory. Default: no limit.
+
+            `ring_dur` : *(float)*
+                if given, only keep the last `ring_dur` seconds of read data.
         """
 
-        def __init__(self, ads):
+        def __init__(self, ads, max_memory=None, ring_dur=None):
             ADSFactory.ADSDecorator.__init__(self, ads)
 
+            if max_memory is not None and max_memory < 0:
+                raise ValueError("max_memory must be >= 0")
+            if ring_dur is not None and int(ring_dur * self.get_sampling_rate()) <= 0:
+                raise ValueError("ring_dur must represent at least one sample")
+            self.max_memory = max_memory
+            self.ring_dur = ring_dur
             self._reinit()
 
         def read(self):
@@ -700,7 +1190,7 @@ class ADSFactory:
             # Read and save read data
             block = self.ads.read()
             if block is not None:
-                self._cache.append(block)
+                self._recording.append(block)
 
             return block
 
@@ -708,18 +1198,30 @@ class ADSFactory:
             # Read without recording
             return self.ads.read()
 
+        def readinto(self, buffer):
+            nb_bytes = self.ads.readinto(buffer)
+            if nb_bytes > 0 and self._record:
+                self._recording.append(memoryview(buffer)[:nb_bytes])
+            return nb_bytes
+
+        def _read_blocks(self, n):
+            result = self.ads._read_blocks(n)
+            if result is not None and self._record:
+                self._recording.append(result[0])
+            return result
+
         def rewind(self):
             if self._record:
                 # If has been recording, create a new BufferAudioSource
                 # from recorded data
-                dbuffer = self._concatenate(self._cache)
+                dbuffer = self._recording.get_data()
                 asource = BufferAudioSource(dbuffer, self.get_sampling_rate(),
                                             self.get_sample_width(),
                                             self.get_channels())
 
                 self.set_audio_source(asource)
                 self.open()
-                self._cache = []
+                self._recording = None
                 self._record = False
                 self.read = self._read_simple
 
@@ -734,18 +1236,283 @@ class ADSFactory:
         def _reinit(self):
             # when audio_source is replaced, start recording again
             self._record = True
-            self._cache = []
+            self._recording = ADSFactory._new_recording(self, self.max_memory, self.ring_dur)
             self.read = self._read_and_rec
 
-        def _concatenate(self, data):
+    class FusedADS(AudioDataSource):
+        """
+        An AudioDataSource that can read a limited amount of data, record read data and
+        return overlapping blocks, i.e. the features of :class:`ADSFactory.LimiterADS`,
+        :class:`ADSFactory.RecorderADS` and :class:`ADSFactory.OverlapADS` combined
+        in one object. Data is read, counted, recorded and copied into overlapping
+        blocks in one :func:`read` call, without going through a chain of decorators.
+        :func:`ADSFactory.ads` returns an object of this class if more than one of
+        these features is requested.
+
+        :Parameters:
+
+            `audio_source` : :class:`auditok.io.AudioSource`
+                the audio source to read data from
+
+            `block_size` : *(int)*
+                number of samples of each block
+
+            `hop_size` : *(int)*
+                number of samples between the start of two consecutive blocks, None
+                (or `block_size`) for no overlap
+
+            `max_time` : *(float)*
+                maximum time (in seconds) to read, None for no limit
+
+            `record` : *(bool)*
+                record read data so that it can be read again after :func:`rewind`
+
+            `record_max_memory`, `record_ring_dur` :
+                see :class:`ADSFactory.RecorderADS`
+        """
+
+        # size of the overlap buffer as a number of blocks
+        BUFFER_BLOCKS = 8
+
+        def __init__(self, audio_source, block_size, hop_size=None, max_time=None, record=False,
+                     record_max_memory=None, record_ring_dur=None):
+
+            ADSFactory.AudioDataSource.__init__(self, audio_source, block_size)
+
+            if hop_size == block_size:
+                hop_size = None
+            if hop_size is not None and (hop_size <= 0 or hop_size > block_size):
+                raise ValueError("hop_size must be either 'None' or \
+                 between 1 and block_size (both inclusive)")
+            if record_max_memory is not None and record_max_memory < 0:
+                raise ValueError("record_max_memory must be >= 0")
+            if record_ring_dur is not None and int(record_ring_dur * self.get_sampling_rate()) <= 0:
+                raise ValueError("record_ring_dur must represent at least one sample")
+
+            self.hop_size = hop_size
+            self.max_time = max_time
+            self.record = record or record_max_memory is not None or record_ring_dur is not None
+            self.record_max_memory = record_max_memory
+            self.record_ring_dur = record_ring_dur
+            self._record = self.record
+            self._recording = None
+            self._reinit()
+
+        def set_block_size(self, size):
+            ADSFactory.AudioDataSource.set_block_size(self, size)
+            self._reinit()
+
+        def set_audio_source(self, audio_source):
+            ADSFactory.AudioDataSource.set_audio_source(self, audio_source)
+            # start recording again
+            self._record = self.record
+            self._reinit()
+
+        def is_rewindable(self):
+            return self.record or isinstance(self.audio_source, Rewindable)
+
+        def rewind(self):
+            if self._record:
+                # If has been recording, read recorded data from now on
+                dbuffer = self._recording.get_data()
+                self.audio_source = BufferAudioSource(dbuffer, self.get_sampling_rate(),
+                                                      self.get_sample_width(),
+                                                      self.get_channels())
+                self.audio_source.open()
+                self._record = False
+            else:
+                ADSFactory.AudioDataSource.rewind(self)
+                if self.record and not self.is_open():
+                    self.open()
+            self._reinit()
+
+        def read(self):
+            if self._overlap and self._end - self._start < self._block_size_bytes:
+                # last block was incomplete
+                return None
+
+            if self._max_read_bytes is not None and self._total_read_bytes >= self._max_read_bytes:
+                return None
+
+            block = self.audio_source.read(self._read_size)
+            if block is None:
+                return None
+
+            if self._max_read_bytes is not None:
+                self._total_read_bytes += len(block)
+                if self._total_read_bytes >= self._max_read_bytes:
+                    self.close()
+
+            if self._record:
+                self._recording.append(block)
+
+            if not self._overlap:
+                return block
+
+            view = self._view
+            if view is None:
+                if self._cache is not None:
+                    return self._concatenate(block)
+                return self._read_first_block(block)
+
+            end = self._end
+            start = self._start + self._hop_size_bytes
+            new_end = end + len(block)
+            if new_end > len(view):
+                # move overlapping data to the beginning of the buffer
+                end -= start
+                view[:end] = view[start: start + end]
+                start = 0
+                new_end = end + len(block)
+
+            view[end: new_end] = block
+            self._start = start
+            self._end = new_end
+            return view[start: new_end].tobytes()
+
+        def readinto(self, buffer):
+            if self._overlap:
+                # overlapping blocks are built in the internal buffer, copy them
+                block = self.read()
+                if block is None:
+                    return 0
+                memoryview(buffer)[:len(block)] = block
+                return len(block)
+
+            if self._max_read_bytes is not None and self._total_read_bytes >= self._max_read_bytes:
+                return 0
+
+            nb_bytes = self.audio_source.readinto(buffer, self._read_size)
+
+            if self._max_read_bytes is not None:
+                self._total_read_bytes += nb_bytes
+                if self._total_read_bytes >= self._max_read_bytes:
+                    self.close()
+
+            if nb_bytes > 0 and self._record:
+                self._recording.append(memoryview(buffer)[:nb_bytes])
+
+            return nb_bytes
+
+        def _read_blocks(self, n):
+            if not self._overlap:
+                return self._read_raw_blocks(n)
+
+            block = self.read()
+            if block is None:
+                return None
+            if self._view is None:
+                # blocks are not bytes-like objects
+                return _read_blocks_one_by_one(self.read, n,
+                                               self._block_size_bytes - self._hop_size_bytes,
+                                               block)
+
+            if n == 1 or len(block) < self._block_size_bytes:
+                return block, 1
+
+            # read 'hop_size' samples per block
+            result = self._read_raw_blocks(n - 1)
+            if result is None:
+                return block, 1
+            hops, nb_hops = result
+            data = _join_block_and_hops(block, hops)
+
+            # keep the last block in buffer for next reads
+            last_block = memoryview(data)[nb_hops * self._hop_size_bytes:]
+            self._view[:len(last_block)] = last_block
+            self._start = 0
+            self._end = len(last_block)
+            return data, nb_hops + 1
+
+        def _read_raw_blocks(self, n):
+            # read (and count and record) at most 'n' blocks of '_read_size' samples
+            read_size_bytes = self._read_size * self.get_sample_width() * self.get_channels()
+            if self._max_read_bytes is not None:
+                left = self._max_read_bytes - self._total_read_bytes
+                if left <= 0:
+                    return None
+                n = min(n, (left + read_size_bytes - 1) // read_size_bytes)
+
+            data = self.audio_source.read(n * self._read_size)
+            if data is None:
+                return None
+
+            if self._max_read_bytes is not None:
+                self._total_read_bytes += len(data)
+                if self._total_read_bytes >= self._max_read_bytes:
+                    self.close()
+
+            if self._record:
+                self._recording.append(data)
+
+            return data, _nb_blocks(len(data), read_size_bytes, read_size_bytes)
+
+        def _get_block_and_hop_sizes(self):
+            return self.block_size, self.hop_size or self.block_size
+
+        def _read_first_block(self, block):
+            # Up from the next call, we only read 'hop_size'
+            self._read_size = self.hop_size
+            self._start = 0
+            self._end = len(block)
             try:
-                # should always work for python 2
-                # work for python 3 ONLY if data is a list (or an iterator)
-                # whose each element is a 'bytes' objects
-                return b''.join(data)
+                self._buffer = bytearray(self._block_size_bytes * self.BUFFER_BLOCKS)
+                self._view = memoryview(self._buffer)
+                self._view[:len(block)] = block
             except TypeError:
-                # work for 'str' in python 2 and python 3
-                return ''.join(data)
+                # Not a bytes-like object, concatenate blocks
+                self._buffer = self._view = None
+                if len(block) > self._hop_size_bytes:
+                    self._cache = block[self._hop_size_bytes:]
+                else:
+                    self._end = 0
+                return block
+
+            return self._view[:self._end].tobytes()
+
+        def _concatenate(self, block):
+            block = self._cache + block
+            # Keep a slice of data in cache only if we have a full length block
+            # if we don't that means that this is the last block
+            if len(block) == self._block_size_bytes:
+                self._cache = block[self._hop_size_bytes:]
+            else:
+                self._cache = None
+                self._end = 0
+            return block
+
+        def _reinit(self):
+            sample_size = self.get_sample_width() * self.get_channels()
+            if self.max_time is not None:
+                self._max_read_bytes = int(self.max_time * self.get_sampling_rate()) * sample_size
+            else:
+                self._max_read_bytes = None
+            self._total_read_bytes = 0
+
+            if self._record:
+                self._recording = ADSFactory._new_recording(self, self.record_max_memory,
+                                                            self.record_ring_dur)
+            else:
+                self._recording = None
+
+            self._overlap = self.hop_size is not None
+            self._read_size = self.block_size
+            self._block_size_bytes = self.block_size * sample_size
+            self._hop_size_bytes = (self.hop_size or self.block_size) * sample_size
+            self._buffer = None
+            self._view = None
+            self._cache = None
+            self._start = 0
+            self._end = self._block_size_bytes
+
+    @staticmethod
+    def _new_recording(ads, max_memory, ring_dur):
+        ring_size = None
+        if ring_dur is not None:
+            ring_size = int(ring_dur * ads.get_sampling_rate()) * \
+                ads.get_sample_width() * \
+                ads.get_channels()
+        return _AudioRecording(max_memory, ring_size)
 
 
 class AudioEnergyValidator(DataValidator):
@@ -759,23 +1526,58 @@ class AudioEnergyValidator(DataValidator):
 
     `sample_width` : *(int)*
         Number of bytes of one audio sample. This is used to convert data from `basestring` or `Bytes` to
-        an array of floats.
+        an array of signed integers.
 
     `energy_threshold` : *(float)*
         A threshold used to check whether an input data buffer is valid.
+
+    `channels` : *(int)*
+        Number of channels of audio data. Samples of multi-channel data are interleaved,
+        the energy of each channel is computed separately. Default: 1.
+
+    `use_channel` : *(int or str)*
+        How to check multi-channel data:
+
+        - an integer: only use the channel with this index (0 is the first channel)
+
+        - 'left', 'right': same as 0 and 1
+
+        - 'any' (default): data is valid if the energy of one channel at least is >= `energy_threshold`
+
+        - 'all': data is valid if the energy of all channels is >= `energy_threshold`
+
+        - 'mean': use the mean of channel energies
+
+        - 'max': use the maximum of channel energies (the same as 'any')
+
+        - 'mix': use the energy of the mean of channels, i.e. of a mono signal
     """
 
+    _channel_reductions = ("any", "all", "mean", "max", "mix")
+
     if _WITH_NUMPY:
         _formats = {1: numpy.int8, 2: numpy.int16, 4: numpy.int32}
 
         @staticmethod
         def _convert(signal, sample_width):
-            return numpy.array(numpy.frombuffer(signal, dtype=AudioEnergyValidator._formats[sample_width]),
-                               dtype=numpy.float64)
+            # a read-only view on data, no copy
+            return numpy.frombuffer(signal, dtype=AudioEnergyValidator._formats[sample_width])
+
+        @staticmethod
+        def _sum_of_squares(signal):
+            # Return the sum of squared samples (of each row for a 2-D array of
+            # frames). Products are accumulated by BLAS in float64 which is exact
+            # for 8 and 16 bit samples (as long as the sum is < 2 ** 53) and is
+            # faster than numpy's integer reductions.
+            if signal.dtype != numpy.float64:
+                signal = signal.astype(numpy.float64)
+            if signal.ndim == 1:
+                return float(numpy.dot(signal, signal))
+            return numpy.einsum("ij,ij->i", signal, signal)
 
         @staticmethod
         def _signal_energy(signal):
-            return float(numpy.dot(signal, signal)) / len(signal)
+            return float(AudioEnergyValidator._sum_of_squares(signal)) / len(signal)
 
         @staticmethod
         def _signal_log_energy(signal):
@@ -784,19 +1586,87 @@ class AudioEnergyValidator(DataValidator):
                 return -200
             return 10. * numpy.log10(energy)
 
+        def _channel_sums_of_squares(self, frames):
+            # 'frames' holds the interleaved samples of one frame per row. A channel is
+            # a strided view on samples, samples are not de-interleaved. Return one sum
+            # of squares per frame, or per frame and channel for 'any' and 'all'.
+            frames = frames.reshape(frames.shape[0], frames.shape[1] // self.channels, self.channels)
+            use_channel = self.use_channel
+
+            if use_channel == "mix":
+                sums_of_squares = AudioEnergyValidator._sum_of_squares(frames.mean(axis=2))
+            elif isinstance(use_channel, int):
+                sums_of_squares = AudioEnergyValidator._sum_of_squares(frames[:, :, use_channel])
+            else:
+                frames = frames.astype(numpy.float64)
+                sums_of_squares = numpy.einsum("ijk,ijk->ik", frames, frames)
+                if use_channel == "mean":
+                    sums_of_squares = sums_of_squares.mean(axis=1)
+                elif use_channel == "max":
+                    sums_of_squares = sums_of_squares.max(axis=1)
+            return sums_of_squares
+
+        def _is_valid_channels(self, frames):
+            frame_length = frames.shape[1] // self.channels
+            sums_of_squares = self._channel_sums_of_squares(frames)
+            valid = sums_of_squares >= self._linear_threshold * frame_length
+            if self._silence_is_valid:
+                valid |= sums_of_squares <= 0
+            if valid.ndim == 2:
+                valid = valid.all(axis=1) if self.use_channel == "all" else valid.any(axis=1)
+            return valid
+
+        def _log_energies(self, frames):
+            # log energy of each frame (row), the energy of multi-channel data
+            # is reduced so that log_energy >= energy_threshold <=> is_valid
+            if self.channels > 1:
+                sums_of_squares = self._channel_sums_of_squares(frames)
+                if sums_of_squares.ndim == 2:
+                    if self.use_channel == "all":
+                        sums_of_squares = sums_of_squares.min(axis=1)
+                    else:
+                        sums_of_squares = sums_of_squares.max(axis=1)
+            else:
+                sums_of_squares = AudioEnergyValidator._sum_of_squares(frames)
+            energies = sums_of_squares / (frames.shape[1] // self.channels)
+            log_energies = numpy.full(len(energies), -200.)
+            positive = energies > 0
+            log_energies[positive] = 10. * numpy.log10(energies[positive])
+            return log_energies
+
+        def _is_valid_frame_channels(self, signal):
+            return bool(self._is_valid_channels(signal.reshape(1, -1))[0])
+
+        def _is_valid_frames(self, frames):
+            # validity of each frame (row) of a 2-D array of frames
+            if self.channels > 1:
+                return self._is_valid_channels(frames)
+            sums_of_squares = AudioEnergyValidator._sum_of_squares(frames)
+            valid = sums_of_squares >= self._linear_threshold * frames.shape[1]
+            if self._silence_is_valid:
+                valid |= sums_of_squares <= 0
+            return valid
+
     else:
         _formats = {1: 'b', 2: 'h', 4: 'i'}
 
         @staticmethod
         def _convert(signal, sample_width):
-            return array("d", array(AudioEnergyValidator._formats[sample_width], signal))
+            if isinstance(signal, memoryview):
+                # array would otherwise be initialized with one value per byte
+                signal = signal.tobytes()
+            elif isinstance(signal, bytearray) and sys.version_info < (3, 0):
+                # same as above, python 2 only
+                signal = bytes(signal)
+            return array(AudioEnergyValidator._formats[sample_width], signal)
+
+        @staticmethod
+        def _sum_of_squares(signal):
+            return sum(map(operator.mul, signal, signal))
 
         @staticmethod
         def _signal_energy(signal):
-            energy = 0.
-            for a in signal:
-                energy += a * a
-            return energy / len(signal)
+            return float(AudioEnergyValidator._sum_of_squares(signal)) / len(signal)
 
         @staticmethod
         def _signal_log_energy(signal):
@@ -805,9 +1675,57 @@ class AudioEnergyValidator(DataValidator):
                 return -200
             return 10. * math.log10(energy)
 
-    def __init__(self, sample_width, energy_threshold=45):
+        def _channel_sums_of_squares(self, signal):
+            channels = self.channels
+            use_channel = self.use_channel
+            sum_of_squares = AudioEnergyValidator._sum_of_squares
+
+            if use_channel == "mix":
+                mix = [float(sum(signal[i: i + channels])) / channels for i in range(0, len(signal), channels)]
+                sums_of_squares = [sum_of_squares(mix)]
+            elif isinstance(use_channel, int):
+                sums_of_squares = [sum_of_squares(signal[use_channel::channels])]
+            else:
+                sums_of_squares = [sum_of_squares(signal[i::channels]) for i in range(channels)]
+                if use_channel == "mean":
+                    sums_of_squares = [float(sum(sums_of_squares)) / channels]
+                elif use_channel == "max":
+                    sums_of_squares = [max(sums_of_squares)]
+            return sums_of_squares
+
+        def _is_valid_frame_channels(self, signal):
+            frame_length = len(signal) // self.channels
+            valid = [s >= self._linear_threshold * frame_length or (self._silence_is_valid and s <= 0)
+                     for s in self._channel_sums_of_squares(signal)]
+            return all(valid) if self.use_channel == "all" else any(valid)
+
+        def _log_energies(self, frames):
+            log_energies = []
+            for signal in frames:
+                if self.channels > 1:
+                    sums_of_squares = self._channel_sums_of_squares(signal)
+                    sum_of_squares = min(sums_of_squares) if self.use_channel == "all" else max(sums_of_squares)
+                else:
+                    sum_of_squares = AudioEnergyValidator._sum_of_squares(signal)
+                energy = float(sum_of_squares) / (len(signal) // self.channels)
+                log_energies.append(10. * math.log10(energy) if energy > 0 else -200.)
+            return log_energies
+
+    def __init__(self, sample_width, energy_threshold=45, channels=1, use_channel="any"):
+        if channels < 1:
+            raise ValueError("channels must be >= 1")
+        use_channel = {"left": 0, "right": 1}.get(use_channel, use_channel)
+        if isinstance(use_channel, int):
+            if use_channel < 0 or use_channel >= channels:
+                raise ValueError("Can not use channel '{0}', data has only {1} channels".format(use_channel, channels))
+        elif use_channel not in self._channel_reductions:
+            raise ValueError("use_channel must be an integer or one of: 'left', 'right', {0}".format(
+                ", ".join("'{0}'".format(r) for r in self._channel_reductions)))
+
         self.sample_width = sample_width
-        self._energy_threshold = energy_threshold
+        self.channels = channels
+        self.use_channel = use_channel
+        self.set_energy_threshold(energy_threshold)
 
     def is_valid(self, data):
         """
@@ -821,6 +1739,8 @@ class AudioEnergyValidator(DataValidator):
             energy = float(numpy.dot(arr, arr)) / len(arr)
             log_energy = 10. * numpy.log10(energy)
 
+        To avoid a call to `log10` per frame, the energy is actually compared to
+        the threshold in the linear domain (i.e. to `10 ** (energy_threshold / 10)`).
 
         :Parameters:
 
@@ -834,10 +1754,1167 @@ class AudioEnergyValidator(DataValidator):
         """
 
         signal = AudioEnergyValidator._convert(data, self.sample_width)
-        return AudioEnergyValidator._signal_log_energy(signal) >= self._energy_threshold
+        if self.channels > 1:
+            return self._is_valid_frame_channels(signal)
+        sum_of_squares = AudioEnergyValidator._sum_of_squares(signal)
+        if sum_of_squares <= 0:
+            return self._silence_is_valid
+        return sum_of_squares >= self._linear_threshold * len(signal)
+
+    def is_valid_batch(self, data, frame_size, hop_size=None):
+        """
+        Check the validity of each of the consecutive audio frames of `data`.
+        If numpy is available, `data` is viewed as a 2-D array of frames and the
+        energies of all frames are computed in one vectorized pass.
+
+        :Parameters:
+
+        `data` : either a *string* or a *Bytes* buffer
+            audio data that holds several frames.
+
+        `frame_size` : *(int)*
+            size of one frame in bytes. If the length of `data` is not a multiple
+            of `frame_size`, the last (shorter) frame is validated on its own.
+
+        `hop_size` : *(int)*
+            distance in bytes between the start of two consecutive (overlapping)
+            frames. Default: `frame_size`.
+
+        :Returns:
+
+        A list of booleans, one per frame.
+        """
+
+        if not _WITH_NUMPY:
+            return DataValidator.is_valid_batch(self, data, frame_size, hop_size)
+
+        if hop_size is None:
+            hop_size = frame_size
+        if len(data) < frame_size:
+            nb_frames = 0
+        else:
+            nb_frames = (len(data) - frame_size) // hop_size + 1
+        full_size = (nb_frames - 1) * hop_size + frame_size if nb_frames else 0
+        frame_length = frame_size // self.sample_width
+        frames = AudioEnergyValidator._convert(data[:full_size], self.sample_width)
+        if hop_size == frame_size:
+            frames = frames.reshape(nb_frames, frame_length)
+        else:
+            # frames overlap, a strided view avoids copying samples
+            frames = numpy.lib.stride_tricks.as_strided(frames, shape=(nb_frames, frame_length),
+                                                        strides=(hop_size, self.sample_width),
+                                                        writeable=False)
+
+        result = self._is_valid_frames(frames).tolist()
+
+        if full_size < len(data):
+            result.append(self.is_valid(data[nb_frames * hop_size:]))
+        return result
+
+    def log_energy_batch(self, data, frame_size):
+        """
+        Compute the log energy of each of the consecutive audio frames of `data`.
+        A frame is valid if and only if its log energy is >= `energy_threshold`
+        (for multi-channel data, the energies of channels are reduced according to
+        `use_channel`, e.g. the highest energy is used for 'any'). The log energy of
+        a silent frame is -200.
+
+        :Parameters:
+
+        `data` : either a *string* or a *Bytes* buffer
+            audio data that holds several frames.
+
+        `frame_size` : *(int)*
+            size of one frame in bytes. If the length of `data` is not a multiple
+            of `frame_size`, the last (shorter) frame is computed on its own.
+
+        :Returns:
+
+        A sequence of floats (a numpy array if numpy is available), one per frame.
+        """
+
+        nb_frames = len(data) // frame_size
+        full_size = nb_frames * frame_size
+        signal = AudioEnergyValidator._convert(data[:full_size], self.sample_width)
+        last_signal = None
+        if full_size < len(data):
+            last_signal = AudioEnergyValidator._convert(data[full_size:], self.sample_width)
+
+        if _WITH_NUMPY:
+            log_energies = self._log_energies(signal.reshape(nb_frames, frame_size // self.sample_width))
+            if last_signal is not None:
+                log_energies = numpy.concatenate((log_energies, self._log_energies(last_signal.reshape(1, -1))))
+            return log_energies
+
+        frame_length = frame_size // self.sample_width
+        frames = [signal[i: i + frame_length] for i in range(0, len(signal), frame_length)]
+        if last_signal is not None:
+            frames.append(last_signal)
+        return self._log_energies(frames)
 
     def get_energy_threshold(self):
         return self._energy_threshold
 
     def set_energy_threshold(self, threshold):
         self._energy_threshold = threshold
+        try:
+            self._linear_threshold = 10. ** (threshold / 10.)
+        except OverflowError:
+            self._linear_threshold = float("inf")
+        # the log energy of a silent frame is taken as -200
+        self._silence_is_valid = threshold <= -200
+
+
+class SlidingEnergyValidator(AudioEnergyValidator):
+    """
+    An :class:`AudioEnergyValidator` for overlapping frames (e.g. read by an
+    :class:`ADSFactory.OverlapADS`). Instead of computing the sum of squared samples
+    of each frame from scratch, i.e. `block_size / hop_size` times for each sample,
+    the energy of a frame is computed from that of the previous frame:
+
+    - :func:`is_valid_batch` computes the cumulative sum of squared samples of `data`
+      once, the sum of squares of each frame is then the difference of two prefix sums.
+
+    - if numpy is not available and `hop_size` is given, :func:`is_valid` keeps the
+      sum of squares of the last frame. If the new frame starts `hop_size` samples after
+      the last one, its sum of squares is updated with the first `hop_size` samples of the
+      last frame and the last `hop_size` samples of the new frame only. With numpy, the
+      sum of squares of one frame is computed by a single BLAS call, which is faster.
+
+    Results are the same as those of :class:`AudioEnergyValidator`. With numpy, prefix
+    sums are exact 64 bit integers for 8 and 16 bit samples. They would overflow (or lose
+    precision as floats) for 32 bit samples, the sum of squares of each frame is then computed
+    on its own. Multi-channel data is checked the same way as :class:`AudioEnergyValidator` does.
+
+    :Parameters:
+
+    `sample_width`, `energy_threshold`, `channels`, `use_channel` :
+        see :class:`AudioEnergyValidator`.
+
+    `hop_size` : *(int)*
+        number of samples between the start of two consecutive frames checked
+        with :func:`is_valid`, i.e. `hop_size` of the audio data source. Default: None,
+        :func:`is_valid` checks each frame on its own. Not used if numpy is available.
+
+    :Example:
+
+    .. code:: python
+
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise,
+                             block_size=320, hop_size=80)
+        validator = SlidingEnergyValidator(sample_width=ads.get_sample_width(),
+                                           energy_threshold=50, hop_size=80)
+    """
+
+    def __init__(self, sample_width, energy_threshold=45, channels=1, use_channel="any", hop_size=None):
+        if hop_size is not None and hop_size <= 0:
+            raise ValueError("hop_size must be > 0")
+        AudioEnergyValidator.__init__(self, sample_width, energy_threshold, channels, use_channel)
+        self.hop_size = hop_size
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the last frame checked with :func:`is_valid`.
+        """
+        self._last_frame = None
+        self._last_sum_of_squares = 0
+
+    def is_valid(self, data):
+        """
+        Check if data is valid (see :func:`AudioEnergyValidator.is_valid`).
+        """
+
+        if _WITH_NUMPY or self.hop_size is None or self.channels > 1:
+            return AudioEnergyValidator.is_valid(self, data)
+
+        sample_width = self.sample_width
+        hop_size = self.hop_size * sample_width
+        length = len(data)
+        last_frame = self._last_frame
+        _convert = AudioEnergyValidator._convert
+        _sum_of_squares = AudioEnergyValidator._sum_of_squares
+
+        if last_frame is not None and length == len(last_frame) and hop_size < length and \
+                data[:length - hop_size] == last_frame[hop_size:]:
+            # frame overlaps with the last one, sums of (integer) squares are exact
+            sum_of_squares = self._last_sum_of_squares - \
+                _sum_of_squares(_convert(last_frame[:hop_size], sample_width)) + \
+                _sum_of_squares(_convert(data[length - hop_size:], sample_width))
+        else:
+            sum_of_squares = _sum_of_squares(_convert(data, sample_width))
+
+        # data may be a view on a buffer that will be overwritten
+        self._last_frame = data if isinstance(data, bytes) else bytes(data)
+        self._last_sum_of_squares = sum_of_squares
+
+        if sum_of_squares <= 0:
+            return self._silence_is_valid
+        return sum_of_squares >= self._linear_threshold * (length // sample_width)
+
+    def is_valid_batch(self, data, frame_size, hop_size=None):
+        """
+        Check the validity of each of the (overlapping) audio frames of `data`
+        (see :func:`AudioEnergyValidator.is_valid_batch`).
+        """
+
+        if hop_size is None or hop_size >= frame_size or self.channels > 1 or \
+                (_WITH_NUMPY and self.sample_width == 4):
+            return AudioEnergyValidator.is_valid_batch(self, data, frame_size, hop_size)
+
+        sample_width = self.sample_width
+        if len(data) < frame_size:
+            nb_frames = 0
+        else:
+            nb_frames = (len(data) - frame_size) // hop_size + 1
+        full_size = (nb_frames - 1) * hop_size + frame_size if nb_frames else 0
+        frame_length = frame_size // sample_width
+        hop_length = hop_size // sample_width
+        signal = AudioEnergyValidator._convert(data[:full_size], sample_width)
+
+        if _WITH_NUMPY:
+            # squares of 8 and 16 bit samples are < 2 ** 30, prefix sums are exact
+            signal = signal.astype(numpy.int64)
+            prefix_sums = numpy.empty(len(signal) + 1, dtype=numpy.int64)
+            prefix_sums[0] = 0
+            numpy.cumsum(signal * signal, out=prefix_sums[1:])
+            starts = numpy.arange(nb_frames) * hop_length
+            sums_of_squares = prefix_sums[starts + frame_length] - prefix_sums[starts]
+            valid = sums_of_squares >= self._linear_threshold * frame_length
+            if self._silence_is_valid:
+                valid |= sums_of_squares <= 0
+            result = valid.tolist()
+        else:
+            # sums of (integer) squares are exact
+            squares = list(map(operator.mul, signal, signal))
+            threshold = self._linear_threshold * frame_length
+            silence_is_valid = self._silence_is_valid
+            result = []
+            sum_of_squares = sum(squares[:frame_length - hop_length])
+            for start in range(0, nb_frames * hop_length, hop_length):
+                end = start + frame_length
+                sum_of_squares += sum(squares[end - hop_length: end])
+                result.append(sum_of_squares >= threshold or (silence_is_valid and sum_of_squares <= 0))
+                sum_of_squares -= sum(squares[start: start + hop_length])
+
+        if full_size < len(data):
+            result.append(AudioEnergyValidator.is_valid(self, data[nb_frames * hop_size:]))
+        return result
+
+
+class AdaptiveEnergyValidator(AudioEnergyValidator):
+    """
+    An audio frame validator whose energy threshold follows the noise floor of
+    the signal. The noise floor is tracked online as the minimum log energy of the
+    last `window` frames (minimum statistics): the window is split into
+    `nb_subwindows` sub-windows and only the minimum of each sub-window is kept, so
+    memory and time per frame do not depend on the length of the stream. A frame is
+    valid if its log energy is >= noise floor + `margin` (and >= `energy_threshold`
+    if given).
+
+    The validator is stateful: frames must be checked in order, one stream per
+    validator (it can not be used with :func:`auditok.core.StreamTokenizer.tokenize_parallel`).
+    Until `window` frames have been seen, the noise floor is the minimum of frames
+    seen so far. Silent frames (i.e. all samples are 0) are never valid and are not
+    used to estimate the noise floor.
+
+    :Parameters:
+
+    `sample_width`, `channels`, `use_channel` :
+        see :class:`AudioEnergyValidator`.
+
+    `margin` : *(float)*
+        number of decibels above the noise floor for a frame to be valid. Default: 10.
+
+    `window` : *(int)*
+        number of frames over which the minimum log energy is tracked. Default: 1000
+        (i.e. 10 seconds with 10 ms frames).
+
+    `nb_subwindows` : *(int)*
+        number of sub-windows of `window`. The noise floor can rise every
+        `window / nb_subwindows` frames. Default: 10.
+
+    `energy_threshold` : *(float)*
+        optional minimum log energy of a valid frame, e.g. to ignore a very
+        low noise floor. Default: None.
+
+    :Example:
+
+    .. code:: python
+
+        validator = AdaptiveEnergyValidator(sample_width=2, margin=12)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+        print(validator.get_noise_floor())
+    """
+
+    def __init__(self, sample_width, margin=10, window=1000, nb_subwindows=10,
+                 energy_threshold=None, channels=1, use_channel="any"):
+
+        if nb_subwindows < 1 or window < nb_subwindows:
+            raise ValueError("'nb_subwindows' must be >= 1 and <= 'window'")
+        AudioEnergyValidator.__init__(self, sample_width, -200 if energy_threshold is None else energy_threshold,
+                                      channels, use_channel)
+        self.margin = margin
+        self.window = window
+        self.nb_subwindows = nb_subwindows
+        self._subwindow_size = window // nb_subwindows
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the noise floor estimated so far.
+        """
+        self._minima = deque(maxlen=self.nb_subwindows)
+        self._past_minimum = float("inf")
+        self._subwindow_minimum = float("inf")
+        self._subwindow_count = 0
+        self._noise_floor = None
+
+    def get_noise_floor(self):
+        """
+        Return the current estimate of the noise floor (in dB), None if no frame was checked yet.
+        """
+        return self._noise_floor
+
+    def _check(self, log_energy):
+        if log_energy <= -200:
+            return False
+
+        if log_energy < self._subwindow_minimum:
+            self._subwindow_minimum = log_energy
+        noise_floor = min(self._past_minimum, self._subwindow_minimum)
+
+        self._subwindow_count += 1
+        if self._subwindow_count == self._subwindow_size:
+            # oldest sub-window, if any, leaves the window
+            self._minima.append(self._subwindow_minimum)
+            self._past_minimum = min(self._minima)
+            self._subwindow_minimum = float("inf")
+            self._subwindow_count = 0
+
+        self._noise_floor = noise_floor
+        return log_energy >= noise_floor + self.margin and log_energy >= self._energy_threshold
+
+    def is_valid(self, data):
+        """
+        Check if data is valid and update the noise floor.
+        """
+        return self._check(float(self.log_energy_batch(data, len(data))[0]))
+
+    def is_valid_batch(self, data, frame_size, hop_size=None):
+        """
+        Check the validity of each of the consecutive audio frames of `data` (see
+        :func:`AudioEnergyValidator.is_valid_batch`) and update the noise floor.
+        Log energies are computed at once, only noise floor tracking is done frame by frame.
+        """
+        if hop_size is not None and hop_size != frame_size:
+            return DataValidator.is_valid_batch(self, data, frame_size, hop_size)
+        log_energies = self.log_energy_batch(data, frame_size)
+        if _WITH_NUMPY:
+            log_energies = log_energies.tolist()
+        return [self._check(log_energy) for log_energy in log_energies]
+
+
+class SpectralBandEnergyValidator(AudioEnergyValidator):
+    """
+    An audio frame validator that uses the energy of a frequency band (e.g. the
+    300-3400 Hz band of speech) instead of the energy of the whole signal, so that
+    low frequency noise (e.g. HVAC rumble or fans) does not make frames valid. The
+    band energy of a frame is computed from its (windowed) spectrum:
+
+    .. code:: python
+
+        spectrum = numpy.fft.rfft(window * signal)
+        band_energy = sum(weight * abs(spectrum[band]) ** 2) / (len(signal) * sum(window ** 2))
+
+    where `weight` is 2 for bins that stand for a positive and a negative frequency
+    and 1 for 0 Hz and the Nyquist frequency. It is on the same scale as the energy
+    computed by :class:`AudioEnergyValidator`, which is the band energy of the whole
+    spectrum without window. Spectra of all frames given to :func:`is_valid_batch` are
+    computed by one call to `numpy.fft.rfft` and the window and band weights are
+    computed once per frame length. This validator requires numpy.
+
+    :Parameters:
+
+    `sample_width`, `energy_threshold`, `channels`, `use_channel` :
+        see :class:`AudioEnergyValidator`, the band energy of each channel is used in
+        place of its energy.
+
+    `sampling_rate` : *(int)*
+        sampling rate of audio data.
+
+    `low_freq`, `high_freq` : *(float)*
+        frequency band in Hz. Default: 300 and 3400.
+
+    `window` : *(str)*
+        window applied to each frame before its spectrum is computed: 'hann' (default),
+        'hamming' or None (rectangular window).
+
+    :Example:
+
+    .. code:: python
+
+        validator = SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000,
+                                                low_freq=300, high_freq=3400,
+                                                energy_threshold=45)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+    """
+
+    _window_names = ("hann", "hamming", None)
+
+    def __init__(self, sample_width, sampling_rate, low_freq=300, high_freq=3400,
+                 energy_threshold=45, channels=1, use_channel="any", window="hann"):
+        if not _WITH_NUMPY:
+            raise ValueError("SpectralBandEnergyValidator requires numpy")
+        if low_freq < 0 or high_freq <= low_freq:
+            raise ValueError("low_freq must be >= 0 and < high_freq")
+        if window not in self._window_names:
+            raise ValueError("window must be one of: 'hann', 'hamming', None")
+        AudioEnergyValidator.__init__(self, sample_width, energy_threshold, channels, use_channel)
+        self.sampling_rate = sampling_rate
+        self.low_freq = low_freq
+        self.high_freq = high_freq
+        self.window = window
+        # frame length -> (window, first bin, last bin + 1, bin weights)
+        self._bands = {}
+
+    def _get_band(self, frame_length):
+        band = self._bands.get(frame_length)
+        if band is not None:
+            return band
+
+        # periodic windows
+        n = numpy.arange(frame_length)
+        if self.window == "hann":
+            window = 0.5 - 0.5 * numpy.cos(2 * numpy.pi * n / frame_length)
+        elif self.window == "hamming":
+            window = 0.54 - 0.46 * numpy.cos(2 * numpy.pi * n / frame_length)
+        else:
+            window = None
+
+        freqs = numpy.fft.rfftfreq(frame_length, 1. / self.sampling_rate)
+        bins = numpy.flatnonzero((freqs >= self.low_freq) & (freqs <= self.high_freq))
+        first, last = (bins[0], bins[-1] + 1) if len(bins) > 0 else (0, 0)
+        weights = numpy.full(last - first, 2.)
+        # 0 Hz and the Nyquist frequency have no negative frequency counterpart
+        bins = numpy.arange(first, last)
+        weights[(bins == 0) | (2 * bins == frame_length)] = 1.
+        window_power = frame_length if window is None else float(numpy.dot(window, window))
+        weights /= frame_length * window_power
+
+        band = (window, first, last, weights)
+        self._bands[frame_length] = band
+        return band
+
+    def _band_energies(self, signals):
+        # band energy of each row (i.e. last axis) of signals
+        window, first, last, weights = self._get_band(signals.shape[-1])
+        signals = signals.astype(numpy.float64)
+        if window is not None:
+            signals *= window
+        spectrum = numpy.fft.rfft(signals, axis=-1)[..., first:last]
+        return (spectrum.real ** 2 + spectrum.imag ** 2).dot(weights)
+
+    def _energies(self, frames):
+        # band energy of each frame (row), reduced over channels such that
+        # energy >= linear threshold <=> frame is valid
+        if self.channels == 1:
+            return self._band_energies(frames)
+
+        frames = frames.reshape(frames.shape[0], frames.shape[1] // self.channels, self.channels)
+        use_channel = self.use_channel
+        if use_channel == "mix":
+            return self._band_energies(frames.mean(axis=2))
+        if isinstance(use_channel, int):
+            return self._band_energies(frames[:, :, use_channel])
+
+        energies = self._band_energies(frames.transpose(0, 2, 1))
+        if use_channel == "all":
+            return energies.min(axis=1)
+        if use_channel == "mean":
+            return energies.mean(axis=1)
+        return energies.max(axis=1)
+
+    def _is_valid_frames(self, frames):
+        energies = self._energies(frames)
+        valid = energies >= self._linear_threshold
+        if self._silence_is_valid:
+            valid |= energies <= 0
+        return valid
+
+    def _log_energies(self, frames):
+        energies = self._energies(frames)
+        log_energies = numpy.full(len(energies), -200.)
+        positive = energies > 0
+        log_energies[positive] = 10. * numpy.log10(energies[positive])
+        return log_energies
+
+    def is_valid(self, data):
+        """
+        Check if data is valid, i.e. if the band energy of data (see above)
+        is >= `energy_threshold`.
+
+        :Parameters:
+
+        `data` : either a *string* or a *Bytes* buffer
+            `data` is converted into a numerical array using the `sample_width`
+            given in the constructor.
+
+        :Returns:
+
+        True if the log band energy of `data` >= `energy_threshold`, False otherwise.
+        """
+        signal = AudioEnergyValidator._convert(data, self.sample_width)
+        return bool(self._is_valid_frames(signal.reshape(1, -1))[0])
+
+
+class ZeroCrossingEnergyValidator(AudioEnergyValidator):
+    """
+    An audio frame validator that checks both the log energy and the zero-crossing
+    rate (ZCR) of frames, e.g. to tell voiced speech (high energy, low ZCR) from
+    broadband noise (high ZCR). The ZCR of a frame is the proportion of pairs of
+    consecutive samples that have a different sign (0 is taken as positive), i.e. a
+    value between 0 and 1. Data is converted once (with the same formats as
+    :class:`AudioEnergyValidator`) and both features are computed from the same
+    array, for all frames at once in :func:`is_valid_batch` if numpy is available.
+
+    A frame is valid if its log energy is >= `energy_threshold` and (or, if
+    `combine` is 'or') its ZCR is between `min_zcr` and `max_zcr`.
+
+    :Parameters:
+
+    `sample_width`, `energy_threshold`, `channels` :
+        see :class:`AudioEnergyValidator`.
+
+    `min_zcr`, `max_zcr` : *(float)*
+        bounds of the ZCR of a valid frame, None for no bound. Default: None and 0.25.
+
+    `combine` : *(str)*
+        how to combine the energy and ZCR conditions: 'and' (default) or 'or'.
+
+    `use_channel` : *(int or str)*
+        see :class:`AudioEnergyValidator`. Both conditions are checked on the same
+        channel: with 'any' (or 'max') a frame is valid if one channel satisfies them,
+        with 'all' if all channels do. With 'mean', the mean energy and the mean ZCR
+        of channels are used and with 'mix' those of the mean of channels.
+
+    :Example:
+
+    .. code:: python
+
+        # energy >= 50 and zcr <= 0.2
+        validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=50,
+                                                max_zcr=0.2)
+    """
+
+    if _WITH_NUMPY:
+
+        def _is_valid_frames(self, frames):
+            frames = frames.reshape(frames.shape[0], frames.shape[1] // self.channels, self.channels)
+            use_channel = self.use_channel
+            # one row of samples per frame and channel: (frames, channels, samples)
+            if use_channel == "mix":
+                signals = frames.mean(axis=2)[:, None, :]
+            elif isinstance(use_channel, int):
+                signals = frames[:, None, :, use_channel]
+            else:
+                signals = frames.transpose(0, 2, 1)
+
+            frame_length = signals.shape[2]
+            float_signals = signals.astype(numpy.float64)
+            energies = numpy.einsum("ijk,ijk->ij", float_signals, float_signals) / max(frame_length, 1)
+            negative = signals < 0
+            crossings = numpy.count_nonzero(negative[:, :, 1:] != negative[:, :, :-1], axis=2)
+            zcrs = crossings / float(max(frame_length - 1, 1))
+
+            if use_channel == "mean":
+                energies = energies.mean(axis=1)
+                zcrs = zcrs.mean(axis=1)
+                return self._check(energies, zcrs)
+            valid = self._check(energies, zcrs)
+            return valid.all(axis=1) if use_channel == "all" else valid.any(axis=1)
+
+    else:
+
+        @staticmethod
+        def _zero_crossing_rate(signal):
+            if len(signal) < 2:
+                return 0.
+            negative = [sample < 0 for sample in signal]
+            return sum(map(operator.ne, negative[1:], negative[:-1])) / float(len(signal) - 1)
+
+    def __init__(self, sample_width, energy_threshold=45, min_zcr=None, max_zcr=0.25,
+                 combine="and", channels=1, use_channel="any"):
+        if combine not in ("and", "or"):
+            raise ValueError("combine must be one of: 'and', 'or'")
+        if min_zcr is None and max_zcr is None and combine == "or":
+            raise ValueError("min_zcr or max_zcr must be given if combine is 'or'")
+        if min_zcr is not None and max_zcr is not None and min_zcr > max_zcr:
+            raise ValueError("min_zcr must be <= max_zcr")
+        AudioEnergyValidator.__init__(self, sample_width, energy_threshold, channels, use_channel)
+        self.min_zcr = min_zcr
+        self.max_zcr = max_zcr
+        self.combine = combine
+
+    def _check(self, energies, zcrs):
+        # works on floats as well as on numpy arrays
+        valid_energy = (energies >= self._linear_threshold) | (self._silence_is_valid & (energies <= 0))
+        valid_zcr = True
+        if self.min_zcr is not None:
+            valid_zcr = valid_zcr & (zcrs >= self.min_zcr)
+        if self.max_zcr is not None:
+            valid_zcr = valid_zcr & (zcrs <= self.max_zcr)
+        if self.combine == "or":
+            return valid_energy | valid_zcr
+        return valid_energy & valid_zcr
+
+    def is_valid(self, data):
+        """
+        Check if data is valid, i.e. if the log energy and the ZCR of data
+        satisfy the rule given in the constructor.
+
+        :Parameters:
+
+        `data` : either a *string* or a *Bytes* buffer
+            `data` is converted into a numerical array using the `sample_width`
+            given in the constructor.
+
+        :Returns:
+
+        True if data is valid, False otherwise.
+        """
+        signal = AudioEnergyValidator._convert(data, self.sample_width)
+        if _WITH_NUMPY:
+            return bool(self._is_valid_frames(signal.reshape(1, -1))[0])
+
+        channels = self.channels
+        use_channel = self.use_channel
+        if channels == 1:
+            signals = [signal]
+        elif use_channel == "mix":
+            signals = [[float(sum(signal[i: i + channels])) / channels for i in range(0, len(signal), channels)]]
+        elif isinstance(use_channel, int):
+            signals = [signal[use_channel::channels]]
+        else:
+            signals = [signal[i::channels] for i in range(channels)]
+
+        energies = [float(AudioEnergyValidator._sum_of_squares(s)) / max(len(s), 1) for s in signals]
+        zcrs = [ZeroCrossingEnergyValidator._zero_crossing_rate(s) for s in signals]
+        if use_channel == "mean" and channels > 1:
+            energies = [sum(energies) / channels]
+            zcrs = [sum(zcrs) / channels]
+        valid = [bool(self._check(energy, zcr)) for energy, zcr in zip(energies, zcrs)]
+        return all(valid) if use_channel == "all" else any(valid)
+
+
+def _write_file(filename, *chunks):
+    """
+    Write `chunks` (bytes) to `filename`, creating its directory if needed. Data is
+    first written to a temporary file in the same directory, then renamed, so that
+    `filename` is never left truncated (e.g. if the process is interrupted).
+    """
+    dirname = os.path.dirname(os.path.abspath(filename))
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # created in the meantime by another process
+            if not os.path.isdir(dirname):
+                raise
+    # unlike tempfile.mkstemp, permissions of the file follow the umask
+    tmp_filename = "{0}.{1}.tmp".format(filename, binascii.hexlify(os.urandom(4)).decode("ascii"))
+    fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            for chunk in chunks:
+                fp.write(chunk)
+        if hasattr(os, "replace"):
+            os.replace(tmp_filename, filename)
+        else:
+            # python 2, os.rename does not overwrite an existing file on Windows
+            if os.name == "nt" and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def _log_energy_batches(audio_source, validator, block_size, batch_size=1000):
+    """
+    Read all data from `audio_source` (opened if needed and then closed) and yield
+    the log energies of the frames of each batch of `batch_size` frames (see
+    :func:`AudioEnergyValidator.log_energy_batch`).
+    """
+    frame_size = block_size * audio_source.get_sample_width() * audio_source.get_channels()
+    was_open = audio_source.is_open()
+    if not was_open:
+        audio_source.open()
+    try:
+        while True:
+            data = audio_source.read(block_size * batch_size)
+            if data is None or len(data) == 0:
+                break
+            yield validator.log_energy_batch(data, frame_size)
+    finally:
+        if not was_open:
+            audio_source.close()
+
+
+class EnergyIndex():
+    """
+    The log energy of each analysis window (frame) of an audio file, computed once
+    with an :class:`AudioEnergyValidator` and stored as 32 bit floats in an index file.
+    Tokenizing the same file with another energy threshold or other tokenizer
+    parameters does then not require to read audio data again:
+
+    .. code:: python
+
+        index = EnergyIndex.for_file("audio.wav", block_dur=0.01, index_dir="/tmp/index")
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+        tokens = tokenizer.tokenize_mask(index.get_mask(energy_threshold=55))
+
+    A frame is valid if its log energy is >= `energy_threshold`, which gives the same
+    result as :func:`AudioEnergyValidator.is_valid` (up to float32 rounding of log energies).
+
+    :Parameters:
+
+    `log_energies` : sequence of floats
+        log energy of each frame
+
+    `block_size` : *(int)*
+        number of samples of a frame
+
+    `sampling_rate`, `sample_width`, `channels` : *(int)*
+        audio parameters of the file
+
+    `use_channel` : *(int or str)*
+        how the energy of multi-channel data is computed (see :class:`AudioEnergyValidator`)
+
+    `content_hash` : *(str)*
+        SHA-1 hex digest of the content of the file
+    """
+
+    _MAGIC = b"AUDITOKE"
+    _VERSION = 1
+    # magic, version, content hash, block size, sampling rate, sample width, channels,
+    # use_channel, number of frames. Followed by log energies as little endian float32
+    _HEADER = struct.Struct("<8sH40sIIHH8sI")
+
+    def __init__(self, log_energies, block_size, sampling_rate, sample_width, channels,
+                 use_channel="any", content_hash=None):
+
+        use_channel = {"left": 0, "right": 1}.get(use_channel, use_channel)
+        if _WITH_NUMPY:
+            log_energies = numpy.asarray(log_energies, dtype=numpy.float32)
+        else:
+            log_energies = array('f', log_energies)
+
+        self._log_energies = log_energies
+        self.block_size = block_size
+        self.sampling_rate = sampling_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.use_channel = use_channel
+        self.content_hash = content_hash
+
+    def __len__(self):
+        return len(self._log_energies)
+
+    def get_log_energies(self):
+        """ Return the log energy of each frame """
+        return self._log_energies
+
+    def get_mask(self, energy_threshold):
+        """
+        Return the validity of each frame for `energy_threshold`, to be used with
+        :func:`auditok.core.StreamTokenizer.tokenize_mask`.
+
+        :Returns:
+
+        A sequence of booleans (a numpy array if numpy is available).
+        """
+        if _WITH_NUMPY:
+            return self._log_energies.astype(numpy.float64) >= energy_threshold
+        return [log_energy >= energy_threshold for log_energy in self._log_energies]
+
+    def matches(self, block_size, sampling_rate, sample_width, channels, use_channel="any", content_hash=None):
+        """
+        Return True if this index was computed with the given parameters.
+        """
+        use_channel = {"left": 0, "right": 1}.get(use_channel, use_channel)
+        return (self.block_size, self.sampling_rate, self.sample_width, self.channels,
+                self.use_channel, self.content_hash) == \
+            (block_size, sampling_rate, sample_width, channels, use_channel, content_hash)
+
+    @staticmethod
+    def compute(audio_source, block_size, use_channel="any", content_hash=None, batch_size=1000):
+        """
+        Read all data from `audio_source` and compute the log energy of each frame.
+
+        :Parameters:
+
+        `audio_source` : :class:`auditok.io.AudioSource`
+            audio source to read data from, it is opened if needed and read until
+            its end.
+
+        `block_size` : *(int)*
+            number of samples of a frame
+
+        `use_channel` : *(int or str)*
+            see :class:`AudioEnergyValidator`
+
+        `content_hash` : *(str)*
+            SHA-1 hex digest of the content of the file
+
+        `batch_size` : *(int)*
+            number of frames read and computed at once
+
+        :Returns:
+
+        An :class:`EnergyIndex`.
+        """
+
+        validator = AudioEnergyValidator(sample_width=audio_source.get_sample_width(),
+                                         channels=audio_source.get_channels(),
+                                         use_channel=use_channel)
+        log_energies = list(_log_energy_batches(audio_source, validator, block_size, batch_size))
+
+        if _WITH_NUMPY:
+            log_energies = numpy.concatenate(log_energies) if log_energies else []
+        else:
+            log_energies = [log_energy for batch in log_energies for log_energy in batch]
+
+        return EnergyIndex(log_energies, block_size, audio_source.get_sampling_rate(),
+                           audio_source.get_sample_width(), audio_source.get_channels(),
+                           validator.use_channel, content_hash)
+
+    def save(self, filename):
+        """
+        Save index to `filename`. The directory of `filename` is created if needed.
+        """
+        header = EnergyIndex._HEADER.pack(EnergyIndex._MAGIC, EnergyIndex._VERSION,
+                                          (self.content_hash or "").encode("ascii"),
+                                          self.block_size, self.sampling_rate,
+                                          self.sample_width, self.channels,
+                                          str(self.use_channel).encode("ascii"),
+                                          len(self._log_energies))
+        if _WITH_NUMPY:
+            data = self._log_energies.astype("<f4").tobytes()
+        else:
+            log_energies = array('f', self._log_energies)
+            if sys.byteorder == "big":
+                log_energies.byteswap()
+            data = log_energies.tobytes() if hasattr(log_energies, "tobytes") else log_energies.tostring()
+
+        _write_file(filename, header, data)
+
+    @staticmethod
+    def load(filename):
+        """
+        Load an index saved with :func:`save`.
+
+        :Raises:
+
+        `ValueError` if `filename` is not a valid index file.
+        """
+        with open(filename, "rb") as fp:
+            header = fp.read(EnergyIndex._HEADER.size)
+            if len(header) < EnergyIndex._HEADER.size:
+                raise ValueError("'{0}' is not an energy index file".format(filename))
+            magic, version, content_hash, block_size, sampling_rate, sample_width, \
+                channels, use_channel, nb_frames = EnergyIndex._HEADER.unpack(header)
+            if magic != EnergyIndex._MAGIC or version != EnergyIndex._VERSION:
+                raise ValueError("'{0}' is not an energy index file".format(filename))
+            data = fp.read(nb_frames * 4)
+            if len(data) != nb_frames * 4:
+                raise ValueError("Energy index file '{0}' is truncated".format(filename))
+
+        if _WITH_NUMPY:
+            log_energies = numpy.frombuffer(data, dtype="<f4").astype(numpy.float32)
+        else:
+            log_energies = array('f')
+            if hasattr(log_energies, "frombytes"):
+                log_energies.frombytes(data)
+            else:
+                log_energies.fromstring(data)
+            if sys.byteorder == "big":
+                log_energies.byteswap()
+
+        use_channel = use_channel.rstrip(b"\0").decode("ascii")
+        if use_channel.isdigit():
+            use_channel = int(use_channel)
+        content_hash = content_hash.rstrip(b"\0").decode("ascii") or None
+        return EnergyIndex(log_energies, block_size, sampling_rate, sample_width, channels,
+                           use_channel, content_hash)
+
+    @staticmethod
+    def file_hash(filename):
+        """
+        Return the SHA-1 hex digest of the content of `filename`.
+        """
+        sha1 = hashlib.sha1()
+        with open(filename, "rb") as fp:
+            while True:
+                data = fp.read(1 << 20)
+                if not data:
+                    break
+                sha1.update(data)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def cached_file_hash(filename, index_dir):
+        """
+        Return the SHA-1 hex digest of the content of `filename` (see :func:`file_hash`).
+        The digest is kept in a small file of `index_dir` with the size and modification
+        time of `filename` and is only computed again if one of them changes.
+        """
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        key = "{0} {1!r}".format(stat.st_size, stat.st_mtime)
+        path = filename if isinstance(filename, bytes) else filename.encode("utf-8")
+        hash_filename = os.path.join(index_dir, hashlib.sha1(path).hexdigest() + ".sha1")
+
+        try:
+            with open(hash_filename, "rb") as fp:
+                cached_key, _, content_hash = fp.read().decode("ascii").strip().rpartition(" ")
+            if cached_key == key and len(content_hash) == 40:
+                return content_hash
+        except (IOError, OSError, UnicodeDecodeError):
+            # no (valid) cached digest
+            pass
+
+        content_hash = EnergyIndex.file_hash(filename)
+        _write_file(hash_filename, "{0} {1}\n".format(key, content_hash).encode("ascii"))
+        return content_hash
+
+    @staticmethod
+    def index_filename(content_hash, block_size, sampling_rate, sample_width, channels,
+                       use_channel="any", index_dir="."):
+        """
+        Return the name of the index file for the given content hash and parameters.
+        """
+        use_channel = {"left": 0, "right": 1}.get(use_channel, use_channel)
+        key = "{0}:{1}:{2}:{3}:{4}:{5}".format(content_hash, block_size, sampling_rate,
+                                               sample_width, channels, use_channel)
+        return os.path.join(index_dir, hashlib.sha1(key.encode("ascii")).hexdigest() + ".energy")
+
+    @staticmethod
+    def for_file(filename, block_size=None, block_dur=0.01, use_channel="any",
+                 index_dir=None, audio_source=None):
+        """
+        Load the index of `filename` from `index_dir` or, if there is no index for
+        the content of this file and these parameters yet, compute it and save it.
+
+        :Parameters:
+
+        `filename` : *(str)*
+            audio file
+
+        `block_size` : *(int)*
+            number of samples of a frame. Default: as many samples as `block_dur`.
+
+        `block_dur` : *(float)*
+            duration of a frame in seconds, used if `block_size` is None.
+
+        `use_channel` : *(int or str)*
+            see :class:`AudioEnergyValidator`
+
+        `index_dir` : *(str)*
+            directory of index files, created if needed. Default: the directory of `filename`.
+            The SHA-1 digest of the content of `filename` is also kept in this directory
+            (see :func:`cached_file_hash`).
+
+        `audio_source` : :class:`auditok.io.AudioSource`
+            audio source that reads `filename` (e.g. if `filename` is a raw file or
+            a compressed file). Default: the audio source returned by
+            :func:`auditok.io.from_file`. Data is only read if the index is computed.
+
+        :Returns:
+
+        An :class:`EnergyIndex`.
+        """
+
+        if audio_source is None:
+            audio_source = from_file(filename)
+        if block_size is None:
+            block_size = int(audio_source.get_sampling_rate() * block_dur)
+        if index_dir is None:
+            index_dir = os.path.dirname(os.path.abspath(filename))
+
+        params = (block_size, audio_source.get_sampling_rate(), audio_source.get_sample_width(),
+                  audio_source.get_channels(), use_channel)
+        content_hash = EnergyIndex.cached_file_hash(filename, index_dir)
+        index_filename = EnergyIndex.index_filename(content_hash, *params, index_dir=index_dir)
+
+        if os.path.exists(index_filename):
+            try:
+                index = EnergyIndex.load(index_filename)
+                if index.matches(*params, content_hash=content_hash):
+                    return index
+            except ValueError:
+                # not a valid index file, overwrite it
+                pass
+
+        index = EnergyIndex.compute(audio_source, block_size, use_channel, content_hash)
+        index.save(index_filename)
+        return index
+
+
+class EnergyHistogram():
+    """
+    Fixed-bin histogram of frame log energies, used to choose an energy threshold
+    automatically. Memory does not depend on the number of frames, so the histogram
+    of a file of any size can be built while reading it once.
+
+    Silent frames (log energy of -200) are counted apart. Log energies below
+    `min_energy` or above `max_energy` are counted in the first or last bin.
+
+    :Parameters:
+
+    `min_energy`, `max_energy` : *(float)*
+        range of log energies of the histogram. Default: 0 and 200.
+
+    `bin_width` : *(float)*
+        width of a bin in decibels. Default: 0.5.
+
+    :Example:
+
+    .. code:: python
+
+        asource = WaveAudioSource("recording.wav")
+        histogram = EnergyHistogram.compute(asource, block_size=160)
+        validator = AudioEnergyValidator(sample_width=asource.get_sample_width(),
+                                         energy_threshold=histogram.otsu_threshold())
+    """
+
+    def __init__(self, min_energy=0, max_energy=200, bin_width=0.5):
+
+        if bin_width <= 0 or max_energy <= min_energy:
+            raise ValueError("'bin_width' must be > 0 and 'max_energy' > 'min_energy'")
+
+        self.min_energy = min_energy
+        self.max_energy = max_energy
+        self.bin_width = bin_width
+        self._nb_bins = int(math.ceil((max_energy - min_energy) / float(bin_width)))
+        if _WITH_NUMPY:
+            self._counts = numpy.zeros(self._nb_bins, dtype=numpy.int64)
+        else:
+            self._counts = [0] * self._nb_bins
+        self.nb_silent_frames = 0
+
+    def update(self, log_energies):
+        """
+        Add frame log energies to the histogram.
+
+        :Parameters:
+
+        `log_energies` : sequence of floats
+            e.g. returned by :func:`AudioEnergyValidator.log_energy_batch`
+        """
+
+        if _WITH_NUMPY:
+            log_energies = numpy.asarray(log_energies, dtype=numpy.float64)
+            silent = log_energies <= -200
+            self.nb_silent_frames += int(silent.sum())
+            bins = numpy.floor((log_energies[~silent] - self.min_energy) / self.bin_width)
+            bins = numpy.clip(bins, 0, self._nb_bins - 1).astype(numpy.intp)
+            self._counts += numpy.bincount(bins, minlength=self._nb_bins)
+            return
+
+        last_bin = self._nb_bins - 1
+        for log_energy in log_energies:
+            if log_energy <= -200:
+                self.nb_silent_frames += 1
+                continue
+            i = int(math.floor((log_energy - self.min_energy) / self.bin_width))
+            self._counts[min(max(i, 0), last_bin)] += 1
+
+    def get_counts(self):
+        """ Return the number of frames in each bin """
+        return list(self._counts)
+
+    def get_bin_edges(self):
+        """ Return the lower edge of each bin and the upper edge of the last one """
+        return [self.min_energy + i * self.bin_width for i in range(self._nb_bins + 1)]
+
+    def otsu_threshold(self):
+        """
+        Compute an energy threshold that separates frames into two classes
+        (e.g. background noise and audio events) using Otsu's method, i.e. the
+        bin edge that maximizes the between-class variance of log energies.
+        If many edges give the same variance (e.g. empty bins between two
+        modes), the middle one is used.
+
+        :Returns:
+
+        The threshold in decibels, or None if all frames fall into the same bin.
+        """
+
+        counts = [int(count) for count in self._counts]
+        centers = [self.min_energy + (i + 0.5) * self.bin_width for i in range(self._nb_bins)]
+        total = sum(counts)
+        total_sum = sum(count * center for count, center in zip(counts, centers))
+
+        best_variance = 0
+        best_bins = []
+        weight = 0
+        energy_sum = 0.
+        for i in range(1, self._nb_bins):
+            weight += counts[i - 1]
+            energy_sum += counts[i - 1] * centers[i - 1]
+            if weight == 0 or weight == total:
+                continue
+            mean_low = energy_sum / weight
+            mean_high = (total_sum - energy_sum) / (total - weight)
+            variance = float(weight) * (total - weight) * (mean_low - mean_high) ** 2
+            if variance > best_variance:
+                best_variance = variance
+                best_bins = [i]
+            elif variance == best_variance and best_bins and best_bins[-1] == i - 1:
+                best_bins.append(i)
+
+        if not best_bins:
+            return None
+        middle = (best_bins[0] + best_bins[-1]) / 2.
+        return self.min_energy + middle * self.bin_width
+
+    @staticmethod
+    def compute(audio_source, block_size, use_channel="any", batch_size=1000, **kwargs):
+        """
+        Read all data from `audio_source` and build the histogram of frame log energies.
+
+        :Parameters:
+
+        `audio_source` : :class:`auditok.io.AudioSource`
+            audio source to read data from, it is opened if needed and read until
+            its end.
+
+        `block_size` : *(int)*
+            number of samples of a frame
+
+        `use_channel` : *(int or str)*
+            see :class:`AudioEnergyValidator`
+
+        `batch_size` : *(int)*
+            number of frames read and computed at once
+
+        `kwargs` :
+            `min_energy`, `max_energy` and `bin_width` of the histogram
+
+        :Returns:
+
+        An :class:`EnergyHistogram`.
+        """
+
+        histogram = EnergyHistogram(**kwargs)
+        validator = AudioEnergyValidator(sample_width=audio_source.get_sample_width(),
+                                         channels=audio_source.get_channels(),
+                                         use_channel=use_channel)
+        for log_energies in _log_energy_batches(audio_source, validator, block_size, batch_size):
+            histogram.update(log_energies)
+
+        return histogram
@@ -0,0 +1,62 @@
+"""
+Compare the per-block cost of reading from a chain of AudioDataSource decorators
+(LimiterADS, RecorderADS, OverlapADS) and from one FusedADS object.
+
+usage: python benchmarks/ads_overhead.py [DURATION_IN_SECONDS]
+
+Audio data is read from a memory buffer so that the cost of the audio source
+itself is as low as possible.
+"""
+
+from auditok import ADSFactory, BufferAudioSource
+import time
+import sys
+
+
+def decorator_chain(audio_source, block_size, hop_size=None, max_time=None, record=False):
+    ads = ADSFactory.AudioDataSource(audio_source=audio_source, block_size=block_size)
+    if max_time is not None:
+        ads = ADSFactory.LimiterADS(ads=ads, max_time=max_time)
+    if record:
+        ads = ADSFactory.RecorderADS(ads=ads)
+    if hop_size is not None:
+        ads = ADSFactory.OverlapADS(ads=ads, hop_size=hop_size)
+    return ads
+
+
+def read_all(ads):
+    ads.open()
+    start = time.time()
+    nb_blocks = 0
+    while ads.read() is not None:
+        nb_blocks += 1
+    elapsed = time.time() - start
+    ads.close()
+    return elapsed, nb_blocks
+
+
+def best_of(make_ads, repeat=5):
+    return min(read_all(make_ads()) for _ in range(repeat))
+
+
+if __name__ == "__main__":
+
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    sampling_rate = 16000
+    data = b"\x01\x02" * int(sampling_rate * duration)
+
+    configs = [("limit + record", dict(block_size=160, max_time=duration)),
+               ("limit + overlap", dict(block_size=400, hop_size=80, max_time=duration)),
+               ("record + overlap", dict(block_size=400, hop_size=80, record=True)),
+               ("limit + record + overlap", dict(block_size=400, hop_size=80, max_time=duration,
+                                                 record=True))]
+
+    print("{0:26s} {1:>8s} {2:>14s} {3:>14s}".format("features", "blocks", "decorators", "fused"))
+    for name, kwargs in configs:
+        chain_time, nb_blocks = best_of(lambda: decorator_chain(BufferAudioSource(data, sampling_rate, 2, 1),
+                                                                **kwargs))
+        fused_time, _ = best_of(lambda: ADSFactory.FusedADS(BufferAudioSource(data, sampling_rate, 2, 1),
+                                                            **kwargs))
+        print("{0:26s} {1:8d} {2:11.2f} us {3:11.2f} us (x{4:.2f})".format(
+            name, nb_blocks, 1e6 * chain_time / nb_blocks, 1e6 * fused_time / nb_blocks,
+            chain_time / fused_time))
@@ -0,0 +1,70 @@
+"""
+Compare sequential and parallel tokenization of a long wave file.
+
+usage: python benchmarks/parallel_tokenize.py [DURATION_IN_MINUTES]
+
+A long recording is built by repeating one of auditok's test files.
+"""
+
+from auditok import ADSFactory, AudioEnergyValidator, StreamTokenizer, dataset
+import multiprocessing
+import tempfile
+import wave
+import time
+import sys
+import os
+
+
+def make_long_file(minutes):
+    fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise)
+    params = fp.getparams()
+    data = fp.readframes(fp.getnframes())
+    fp.close()
+
+    nb_repeat = int(minutes * 60 * params[2] * params[1] / len(data)) + 1
+    tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    tmp.close()
+    fp = wave.open(tmp.name, "w")
+    fp.setparams(params)
+    for _ in range(nb_repeat):
+        fp.writeframes(data)
+    fp.close()
+    return tmp.name
+
+
+def timeit(func):
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+
+if __name__ == "__main__":
+
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    filename = make_long_file(minutes)
+
+    try:
+        ads = ADSFactory.ads(filename=filename)
+        validator = AudioEnergyValidator(sample_width=ads.get_sample_width(), energy_threshold=50)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400, max_continuous_silence=30)
+
+        def sequential():
+            ads.open()
+            tokens = tokenizer.tokenize(ads, offsets=True)
+            ads.close()
+            return tokens
+
+        seq_time, expected = timeit(sequential)
+        print("{0:.0f} minutes of audio, {1} tokens".format(minutes, len(expected)))
+        print("sequential        : {0:6.2f} s".format(seq_time))
+
+        processes = 1
+        while processes <= multiprocessing.cpu_count():
+            par_time, tokens = timeit(lambda: tokenizer.tokenize_parallel(ads, processes=processes,
+                                                                          offsets=True))
+            assert tokens == expected
+            print("parallel ({0:2d} proc): {1:6.2f} s (x{2:.2f})".format(processes, par_time, seq_time / par_time))
+            processes *= 2
+
+    finally:
+        os.unlink(filename)
@@ -7,7 +7,8 @@ September 2015
 import unittest
 from functools import partial
 import sys
-from auditok import dataset, ADSFactory, BufferAudioSource, WaveAudioSource, DuplicateArgument
+from auditok import dataset, ADSFactory, BufferAudioSource, WaveAudioSource, MmapWaveAudioSource, \
+    DuplicateArgument
 import wave
 
 
@@ -243,6 +244,98 @@ class TestADSFactoryFileAudioSource(unittest.TestCase):
         
         self.assertEqual(ads_data, audio_source_data, "Unexpected data read from RecorderADS")
     
+    def _read_all(self, ads):
+        ads_data = []
+        while True:
+            block = ads.read()
+            if block is None:
+                break
+            ads_data.append(block)
+        return b''.join(ads_data)
+    
+    def _read_wave_data(self, nb_samples):
+        audio_source = WaveAudioSource(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        audio_source.open()
+        audio_source_data = audio_source.read(nb_samples)
+        audio_source.close()
+        return audio_source_data
+    
+    def test_Recorder_Deco_max_memory_rewind_and_read(self):
+        # recorded data exceeds memory limit and is written to a file
+        ads = ADSFactory.ads(audio_source=self.audio_source, record_max_memory=1000, block_size = 320)
+        
+        self.assertIsInstance(ads, ADSFactory.RecorderADS,
+                              msg="wrong type for ads object, expected: 'ADSFactory.RecorderADS', found: {0}".format(type(ads)))
+        ads.open()
+        for i in range(10):
+            ads.read()
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        
+        self.assertEqual(ads_data, self._read_wave_data(320 * 10), "Unexpected data read from RecorderADS")
+        
+        # a second rewind reads the same data again
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        self.assertEqual(ads_data, self._read_wave_data(320 * 10), "Unexpected data read from RecorderADS")
+    
+    def test_Recorder_Deco_max_memory_not_exceeded(self):
+        ads = ADSFactory.ads(audio_source=self.audio_source, record_max_memory=320 * 2 * 10, block_size = 320)
+        
+        ads.open()
+        for i in range(10):
+            ads.read()
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        
+        self.assertEqual(ads_data, self._read_wave_data(320 * 10), "Unexpected data read from RecorderADS")
+    
+    def test_Recorder_Deco_ring_rewind_and_read(self):
+        # keep the last 0.05 seconds (800 samples) of 10 blocks of 320 samples
+        ads = ADSFactory.ads(audio_source=self.audio_source, record_ring_dur=0.05, block_size = 320)
+        
+        ads.open()
+        for i in range(10):
+            ads.read()
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        
+        expected = self._read_wave_data(320 * 10)[-800 * 2:]
+        self.assertEqual(ads_data, expected, "Unexpected data read from RecorderADS in ring mode")
+    
+    def test_Recorder_Deco_ring_not_full(self):
+        ads = ADSFactory.ads(audio_source=self.audio_source, record_ring_dur=1, block_size = 320)
+        
+        ads.open()
+        for i in range(10):
+            ads.read()
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        
+        self.assertEqual(ads_data, self._read_wave_data(320 * 10), "Unexpected data read from RecorderADS in ring mode")
+    
+    def test_Recorder_Deco_ring_block_larger_than_ring(self):
+        ads = ADSFactory.ads(audio_source=self.audio_source, record_ring_dur=0.01, block_size = 320)
+        
+        ads.open()
+        for i in range(3):
+            ads.read()
+        ads.rewind()
+        ads_data = self._read_all(ads)
+        ads.close()
+        
+        expected = self._read_wave_data(320 * 3)[-160 * 2:]
+        self.assertEqual(ads_data, expected, "Unexpected data read from RecorderADS in ring mode")
+    
+    def test_Recorder_Deco_ring_dur_exception(self):
+        func = partial(ADSFactory.ads, audio_source=self.audio_source, record_ring_dur=0)
+        self.assertRaises(ValueError, func)
+    
     def test_Overlap_Deco_type(self):
         # an OverlapADS is obtained if a valid hop_size is given
         ads = ADSFactory.ads(audio_source=self.audio_source, block_size = 256, hop_size = 128)
@@ -292,17 +385,73 @@ class TestADSFactoryFileAudioSource(unittest.TestCase):
         audio_source.close()
     
     
+    
+    def test_Overlap_Deco_read_view(self):
+        
+        # small hop size so that the internal buffer is reused many times
+        block_size = 400
+        hop_size = 80
+        
+        ads = ADSFactory.ads(audio_source=self.audio_source, block_size=block_size, hop_size=hop_size)
+        
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        wave_data = fp.readframes(fp.getnframes())
+        fp.close()
+        audio_source = BufferAudioSource(wave_data, ads.get_sampling_rate(),
+                                         ads.get_sample_width(), ads.get_channels())
+        audio_source.open()
+        
+        ads.open()
+        i = 0
+        while True:
+            block = ads.read_view()
+            if block is None:
+                break
+            self.assertIsInstance(block, memoryview, "read_view should return a memoryview")
+            tmp = audio_source.read(block_size)
+            self.assertEqual(block.tobytes(), tmp, "Unexpected block (N={0}) read from OverlapADS".format(i))
+            i += 1
+            audio_source.set_position(i * hop_size)
+        ads.close()
+        audio_source.close()
+        
+        expected = (len(wave_data) // 2 - block_size + hop_size - 1) // hop_size + 1
+        self.assertEqual(i, expected, "Wrong number of blocks, expected: {0}, found: {1}".format(expected, i))
+    
+    
+    @unittest.skipIf(sys.version_info < (3, 0), "MmapWaveAudioSource requires Python 3")
+    def test_Overlap_Deco_read_memoryview_blocks(self):
+        
+        block_size = 1714
+        hop_size = 313
+        
+        audio_source = MmapWaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        ads = ADSFactory.ads(audio_source=audio_source, block_size=block_size, hop_size=hop_size)
+        ref_ads = ADSFactory.ads(audio_source=self.audio_source, block_size=block_size, hop_size=hop_size)
+        
+        ads.open()
+        ref_ads.open()
+        i = 0
+        while True:
+            block = ads.read()
+            tmp = ref_ads.read()
+            self.assertEqual(block, tmp, "Unexpected block (N={0}) read from OverlapADS".format(i))
+            if tmp is None:
+                break
+            i += 1
+        ads.close()
+        ref_ads.close()
             
             
     def test_Limiter_Overlap_Deco_type(self):
+        # a combination of features is implemented by one FusedADS object
         ads = ADSFactory.ads(audio_source=self.audio_source, max_time=1, block_size = 256, hop_size = 128)
         
-        self.assertIsInstance(ads, ADSFactory.OverlapADS,
-                            msg="wrong type for ads object, expected: 'ADSFactory.OverlapADS', found: {0}".format(type(ads)))
-         
-        
-        self.assertIsInstance(ads.ads, ADSFactory.LimiterADS,
-                              msg="wrong type for ads object, expected: 'ADSFactory.LimiterADS', found: {0}".format(type(ads)))
+        self.assertIsInstance(ads, ADSFactory.FusedADS,
+                            msg="wrong type for ads object, expected: 'ADSFactory.FusedADS', found: {0}".format(type(ads)))
+        self.assertEqual(ads.hop_size, 128, "Wrong hop_size, expected: 128, found: {0}".format(ads.hop_size))
+        self.assertEqual(ads.max_time, 1, "Wrong max_time, expected: 1, found: {0}".format(ads.max_time))
+        self.assertFalse(ads.record, "FusedADS should not record data")
            
         
         
@@ -391,14 +540,14 @@ class TestADSFactoryFileAudioSource(unittest.TestCase):
         
         
     def test_Recorder_Overlap_Deco_type(self):
+        # a combination of features is implemented by one FusedADS object
         ads = ADSFactory.ads(audio_source=self.audio_source, block_size=256, hop_size=128, record=True)
         
-        self.assertIsInstance(ads, ADSFactory.OverlapADS,
-                            msg="wrong type for ads object, expected: 'ADSFactory.OverlapADS', found: {0}".format(type(ads)))
-         
-        
-        self.assertIsInstance(ads.ads, ADSFactory.RecorderADS,
-                              msg="wrong type for ads object, expected: 'ADSFactory.RecorderADS', found: {0}".format(type(ads)))
+        self.assertIsInstance(ads, ADSFactory.FusedADS,
+                            msg="wrong type for ads object, expected: 'ADSFactory.FusedADS', found: {0}".format(type(ads)))
+        self.assertEqual(ads.hop_size, 128, "Wrong hop_size, expected: 128, found: {0}".format(ads.hop_size))
+        self.assertIsNone(ads.max_time, "Wrong max_time, expected: None, found: {0}".format(ads.max_time))
+        self.assertTrue(ads.record, "FusedADS should record data")
                
     
         
@@ -531,6 +680,210 @@ class TestADSFactoryFileAudioSource(unittest.TestCase):
         ads.close()
         self.assertEqual(total_read, expected_size, "Wrong data length read from LimiterADS, expected: {0}, found: {1}".format(expected_size, total_read))
         
+class TestADSFactoryFusedADS(unittest.TestCase):
+    
+    def _decorator_chain(self, audio_source, block_size, hop_size=None, max_time=None, record=False):
+        ads = ADSFactory.AudioDataSource(audio_source=audio_source, block_size=block_size)
+        if max_time is not None:
+            ads = ADSFactory.LimiterADS(ads=ads, max_time=max_time)
+        if record:
+            ads = ADSFactory.RecorderADS(ads=ads)
+        if hop_size is not None:
+            ads = ADSFactory.OverlapADS(ads=ads, hop_size=hop_size)
+        return ads
+    
+    def _read_all(self, ads):
+        blocks = []
+        while True:
+            block = ads.read()
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+    
+    def _check(self, make_audio_source, **kwargs):
+        expected_ads = self._decorator_chain(make_audio_source(), **kwargs)
+        fused_ads = ADSFactory.FusedADS(make_audio_source(), **kwargs)
+        
+        for ads in (expected_ads, fused_ads):
+            ads.open()
+        for i in range(2):
+            # second iteration reads recorded data or rewound data
+            expected = self._read_all(expected_ads)
+            found = self._read_all(fused_ads)
+            self.assertEqual(found, expected, "FusedADS and decorators read different blocks ({0})".format(kwargs))
+            if not kwargs["record"] and (kwargs["max_time"] is not None or not fused_ads.is_rewindable()):
+                # LimiterADS closes the audio source when the limit is reached
+                break
+            expected_ads.rewind()
+            fused_ads.rewind()
+        
+        for ads in (expected_ads, fused_ads):
+            ads.close()
+    
+    def test_same_as_decorators_wave_audio_source(self):
+        make_audio_source = partial(WaveAudioSource, filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        for block_size, hop_size in ((320, None), (320, 160), (1714, 313)):
+            for max_time in (None, 0.5, 1.317):
+                for record in (False, True):
+                    self._check(make_audio_source, block_size=block_size, hop_size=hop_size,
+                                max_time=max_time, record=record)
+    
+    def test_same_as_decorators_str_data(self):
+        make_audio_source = partial(BufferAudioSource, "ABCDEFGHIJKLMNOPQRSTUVWXYZ012345", 16, 2, 1)
+        for block_size, hop_size in ((5, None), (5, 4), (5, 1)):
+            for max_time in (None, 0.80):
+                for record in (False, True):
+                    self._check(make_audio_source, block_size=block_size, hop_size=hop_size,
+                                max_time=max_time, record=record)
+    
+    def test_readinto_same_as_read(self):
+        for kwargs in ({}, {"max_time": 0.5}, {"record": True}, {"block_size": 400, "hop_size": 80},
+                       {"max_time": 0.5, "record": True},
+                       {"max_time": 0.5, "record": True, "block_size": 400, "hop_size": 80}):
+            kwargs.setdefault("block_size", 320)
+            expected_ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, **kwargs)
+            ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, **kwargs)
+            buffer = bytearray(kwargs["block_size"] * 2)
+            
+            expected_ads.open()
+            ads.open()
+            for i in range(2):
+                expected = self._read_all(expected_ads)
+                found = []
+                while True:
+                    nb_bytes = ads.readinto(buffer)
+                    if nb_bytes == 0:
+                        break
+                    found.append(bytes(buffer[:nb_bytes]))
+                self.assertEqual(found, expected, "readinto and read return different data ({0})".format(kwargs))
+                if not kwargs.get("record"):
+                    break
+                # read recorded data
+                expected_ads.rewind()
+                ads.rewind()
+            expected_ads.close()
+            ads.close()
+    
+    def test_fused_record_max_memory(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, block_size=320,
+                             hop_size=160, record_max_memory=1000)
+        self.assertIsInstance(ads, ADSFactory.FusedADS,
+                            msg="wrong type for ads object, expected: 'ADSFactory.FusedADS', found: {0}".format(type(ads)))
+        ads.open()
+        expected = [ads.read() for i in range(10)]
+        ads.rewind()
+        found = [ads.read() for i in range(10)]
+        ads.close()
+        self.assertEqual(found, expected, "Unexpected data read from FusedADS after rewind")
+    
+
+class TestADSFactoryReadBlocks(unittest.TestCase):
+    
+    def _read_all(self, ads):
+        blocks = []
+        while True:
+            block = ads.read()
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+    
+    def _read_all_blocks(self, ads, n, block_size, hop_size):
+        # split data returned by read_blocks into blocks
+        blocks = []
+        while True:
+            result = ads.read_blocks(n)
+            if result is None:
+                break
+            data, nb_blocks = result
+            self.assertGreater(nb_blocks, 0, "read_blocks returned an empty result")
+            self.assertLessEqual(nb_blocks, n, "read_blocks returned too many blocks")
+            for i in range(nb_blocks):
+                blocks.append(data[i * hop_size: i * hop_size + block_size])
+        return blocks
+    
+    def _check(self, make_ads, block_size, hop_size=None, sample_size=2):
+        for n in (1, 3, 100):
+            expected_ads = make_ads()
+            ads = make_ads()
+            expected_ads.open()
+            ads.open()
+            expected = self._read_all(expected_ads)
+            found = self._read_all_blocks(ads, n, block_size * sample_size,
+                                          (hop_size or block_size) * sample_size)
+            self.assertEqual(found, expected, "read_blocks({0}) and read return different data".format(n))
+            expected_ads.close()
+            ads.close()
+    
+    def test_read_blocks(self):
+        for kwargs in ({}, {"max_time": 1.317}, {"record": True}, {"hop_size": 160},
+                       {"max_time": 1.317, "record": True},
+                       {"max_time": 1.317, "record": True, "hop_size": 113}):
+            make_ads = partial(ADSFactory.ads, filename=dataset.one_to_six_arabic_16000_mono_bc_noise,
+                               block_size=320, **kwargs)
+            self._check(make_ads, 320, kwargs.get("hop_size"))
+    
+    def test_read_blocks_decorators(self):
+        def make_ads(hop_size):
+            ads = ADSFactory.AudioDataSource(WaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise), 320)
+            ads = ADSFactory.LimiterADS(ads, max_time=1.317)
+            ads = ADSFactory.RecorderADS(ads)
+            return ADSFactory.OverlapADS(ads, hop_size=hop_size)
+        for hop_size in (1, 100, 320):
+            self._check(partial(make_ads, hop_size), 320, hop_size)
+    
+    def test_read_blocks_after_read(self):
+        for kwargs in ({}, {"hop_size": 160}, {"max_time": 1.317, "record": True, "hop_size": 113}):
+            expected_ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise,
+                                          block_size=320, **kwargs)
+            ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise,
+                                 block_size=320, **kwargs)
+            expected_ads.open()
+            ads.open()
+            expected = self._read_all(expected_ads)
+            found = [ads.read(), ads.read()]
+            found += self._read_all_blocks(ads, 10, 640, kwargs.get("hop_size", 320) * 2)
+            self.assertEqual(found, expected, "read_blocks after read returned wrong data ({0})".format(kwargs))
+    
+    def test_read_blocks_recorded_data(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise,
+                             block_size=320, hop_size=160, max_time=1.317, record=True)
+        ads.open()
+        self._read_all_blocks(ads, 7, 640, 320)
+        ads.rewind()
+        expected = self._read_all(ads)
+        ads.rewind()
+        found = self._read_all_blocks(ads, 7, 640, 320)
+        self.assertEqual(found, expected, "read_blocks recorded wrong data")
+    
+    def test_read_blocks_str_data(self):
+        for kwargs in ({}, {"hop_size": 4}, {"hop_size": 1, "max_time": 0.80, "record": True}):
+            make_ads = partial(ADSFactory.ads, data_buffer="ABCDEFGHIJKLMNOPQRSTUVWXYZ012345",
+                               sampling_rate=16, sample_width=2, channels=1, block_size=5, **kwargs)
+            self._check(make_ads, 5, kwargs.get("hop_size"))
+    
+    def test_read_blocks_as_array(self):
+        try:
+            import numpy
+        except ImportError:
+            return
+        ads = ADSFactory.ads(data_buffer=b"abcdefghijklmnopqrstuvwxyz", sampling_rate=16,
+                             sample_width=2, channels=1, block_size=4, hop_size=2)
+        ads.open()
+        frames, nb_blocks = ads.read_blocks(4, as_array=True)
+        self.assertEqual(nb_blocks, 4, "wrong number of blocks")
+        self.assertEqual(frames.shape, (4, 4), "wrong shape for frames")
+        expected = numpy.frombuffer(b"efghijkl", dtype=numpy.int16)
+        self.assertTrue((frames[1] == expected).all(), "wrong samples in frames")
+        
+        # last block is incomplete and is not in the array
+        frames, nb_blocks = ads.read_blocks(10, as_array=True)
+        self.assertEqual(nb_blocks, 2, "wrong number of blocks")
+        self.assertEqual(frames.shape, (1, 4), "wrong shape for frames")
+        self.assertIsNone(ads.read_blocks(10, as_array=True), "expected None at end of data")
+    
+
 class TestADSFactoryBufferAudioSource(unittest.TestCase):
     
     def setUp(self):
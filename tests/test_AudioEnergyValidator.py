@@ -0,0 +1,693 @@
+import unittest
+import math
+import os
+import random
+import shutil
+import struct
+import tempfile
+import wave
+from auditok import dataset, AudioEnergyValidator, SlidingEnergyValidator, DataValidator, ADSFactory, \
+    StreamTokenizer, EnergyIndex, BufferAudioSource, AdaptiveEnergyValidator, EnergyHistogram, \
+    SpectralBandEnergyValidator, ZeroCrossingEnergyValidator
+
+
+def _read_wave(filename):
+    fp = wave.open(filename, "r")
+    data = fp.readframes(fp.getnframes())
+    sample_width = fp.getsampwidth()
+    fp.close()
+    return data, sample_width
+
+
+class FirstByteValidator(DataValidator):
+    
+    def is_valid(self, data):
+        return data[0:1] == b"A"
+
+
+class TestAudioEnergyValidatorBatch(unittest.TestCase):
+    
+    def setUp(self):
+        self.data, self.sample_width = _read_wave(dataset.one_to_six_arabic_16000_mono_bc_noise)
+    
+    def _per_frame(self, validator, data, frame_size):
+        return [validator.is_valid(data[i: i + frame_size]) for i in range(0, len(data), frame_size)]
+    
+    def test_is_valid_batch(self):
+        
+        validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+        frame_size = 160 * self.sample_width
+        
+        expected = self._per_frame(validator, self.data, frame_size)
+        found = list(validator.is_valid_batch(self.data, frame_size))
+        
+        self.assertEqual(len(found), len(expected), msg="wrong number of frames, expected: {0}, found: {1} ".format(len(expected), len(found)))
+        self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree")
+        self.assertTrue(any(found) and not all(found), msg="expected both valid and non valid frames")
+    
+    def test_is_valid_batch_partial_last_frame(self):
+        
+        validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+        frame_size = 160 * self.sample_width
+        data = self.data[:frame_size * 10 + 40]
+        
+        expected = self._per_frame(validator, data, frame_size)
+        found = list(validator.is_valid_batch(data, frame_size))
+        
+        self.assertEqual(len(found), 11, msg="wrong number of frames, expected: 11, found: {0} ".format(len(found)))
+        self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree")
+    
+    def test_is_valid_batch_overlapping_frames(self):
+        
+        validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+        frame_size = 160 * self.sample_width
+        hop_size = 60 * self.sample_width
+        data = self.data[:frame_size * 10 + 40]
+        
+        expected = [validator.is_valid(data[i: i + frame_size])
+                    for i in range(0, len(data) - frame_size + hop_size, hop_size)]
+        found = list(validator.is_valid_batch(data, frame_size, hop_size))
+        
+        self.assertEqual(len(found), len(expected), msg="wrong number of frames, expected: {0}, found: {1} ".format(len(expected), len(found)))
+        self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree for overlapping frames")
+    
+    def test_is_valid_memoryview(self):
+        
+        validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+        frame_size = 160 * self.sample_width
+        view = memoryview(self.data)
+        
+        expected = self._per_frame(validator, self.data, frame_size)
+        found = self._per_frame(validator, view, frame_size)
+        self.assertEqual(found, expected, msg="wrong validity for memoryview frames")
+        found = list(validator.is_valid_batch(view, frame_size))
+        self.assertEqual(found, expected, msg="wrong batch validity for a memoryview")
+    
+    def test_is_valid_batch_silence(self):
+        
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=-10)
+        found = list(validator.is_valid_batch(b"\0" * 40, 20))
+        self.assertEqual(found, [False, False], msg="wrong validity for silent frames, expected: [False, False], found: {0} ".format(found))
+    
+    def test_default_is_valid_batch(self):
+        
+        validator = FirstByteValidator()
+        found = list(validator.is_valid_batch(b"AxxBxxAxxA", 3))
+        self.assertEqual(found, [True, False, True, True], msg="wrong validity, expected: [True, False, True, True], found: {0} ".format(found))
+
+
+class TestAudioEnergyValidatorThreshold(unittest.TestCase):
+    
+    def setUp(self):
+        self.data, self.sample_width = _read_wave(dataset.one_to_six_arabic_16000_mono_bc_noise)
+    
+    def test_linear_threshold_same_as_log_energy(self):
+        
+        frame_size = 160 * self.sample_width
+        frames = [self.data[i: i + frame_size] for i in range(0, len(self.data), frame_size)]
+        frames.append(b"\0" * frame_size)
+        
+        for threshold in (-250, -200, 0, 20.5, 45, 50, 65, 200):
+            validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=threshold)
+            for i, frame in enumerate(frames):
+                signal = AudioEnergyValidator._convert(frame, self.sample_width)
+                expected = AudioEnergyValidator._signal_log_energy(signal) >= threshold
+                self.assertEqual(validator.is_valid(frame), expected,
+                                 msg="wrong validity for frame {0} with threshold {1}".format(i, threshold))
+    
+    def test_set_energy_threshold(self):
+        
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=100)
+        frame = b"\x00\x10" * 160
+        self.assertFalse(validator.is_valid(frame), msg="frame should not be valid for threshold 100")
+        
+        validator.set_energy_threshold(40)
+        self.assertEqual(validator.get_energy_threshold(), 40, msg="wrong threshold, expected: 40, found: {0}".format(validator.get_energy_threshold()))
+        self.assertTrue(validator.is_valid(frame), msg="frame should be valid for threshold 40")
+
+
+
+def _stereo_frame(left, right, nb_samples=160):
+    # constant amplitudes with alternating signs, log energy is 20 * log10(amplitude)
+    samples = []
+    for i in range(nb_samples):
+        sign = 1 if i % 2 == 0 else -1
+        samples += [sign * left, sign * right]
+    return struct.pack("<{0}h".format(len(samples)), *samples)
+
+
+class TestAudioEnergyValidatorChannels(unittest.TestCase):
+    
+    def test_use_channel(self):
+        
+        # 60 dB left channel, 20 dB right channel
+        frame = _stereo_frame(1000, 10)
+        for use_channel, threshold, expected in ((0, 50, True), (1, 50, False), ("left", 50, True),
+                                                  ("right", 50, False), ("any", 50, True), ("all", 50, False),
+                                                  ("all", 15, True), ("max", 58.5, True), ("mean", 50, True),
+                                                  ("mean", 58.5, False), ("mix", 50, True), ("mix", 58.5, False)):
+            validator = AudioEnergyValidator(sample_width=2, energy_threshold=threshold, channels=2,
+                                             use_channel=use_channel)
+            self.assertEqual(validator.is_valid(frame), expected,
+                             msg="wrong validity for use_channel={0} and threshold {1}".format(use_channel, threshold))
+    
+    def test_mix_opposite_channels(self):
+        
+        frame = _stereo_frame(1000, -1000)
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50, channels=2, use_channel="mix")
+        self.assertFalse(validator.is_valid(frame), msg="mix of opposite channels should be silent")
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50, channels=2, use_channel="all")
+        self.assertTrue(validator.is_valid(frame), msg="both channels should be valid")
+    
+    def test_is_valid_batch(self):
+        
+        frames = [_stereo_frame(1000, 10), _stereo_frame(10, 1000), _stereo_frame(10, 10),
+                  _stereo_frame(1000, 1000), _stereo_frame(1000, 10, 50)]
+        data = b"".join(frames)
+        frame_size = len(frames[0])
+        for use_channel in (0, 1, "any", "all", "mean", "max", "mix"):
+            validator = AudioEnergyValidator(sample_width=2, energy_threshold=50, channels=2,
+                                             use_channel=use_channel)
+            expected = [validator.is_valid(frame) for frame in frames]
+            found = list(validator.is_valid_batch(data, frame_size))
+            self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree for use_channel={0}".format(use_channel))
+            
+            hop_size = frame_size // 4
+            expected = [validator.is_valid(data[i: i + frame_size])
+                        for i in range(0, len(data) - frame_size + hop_size, hop_size)]
+            found = list(validator.is_valid_batch(data, frame_size, hop_size))
+            self.assertEqual(found, expected, msg="wrong validity of overlapping frames for use_channel={0}".format(use_channel))
+    
+    def test_use_channel_exception(self):
+        
+        for channels, use_channel in ((2, 2), (2, -1), (1, "right"), (2, "center")):
+            with self.assertRaises(ValueError):
+                AudioEnergyValidator(sample_width=2, channels=channels, use_channel=use_channel)
+        with self.assertRaises(ValueError):
+            AudioEnergyValidator(sample_width=2, channels=0)
+
+
+class TestSlidingEnergyValidator(unittest.TestCase):
+    
+    def setUp(self):
+        self.data, self.sample_width = _read_wave(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self.reference = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+    
+    def test_is_valid_batch(self):
+        
+        frame_size = 160 * self.sample_width
+        data = self.data[:frame_size * 100 + 40]
+        for hop in (1, 16, 60, 160):
+            hop_size = hop * self.sample_width
+            validator = SlidingEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+            expected = list(self.reference.is_valid_batch(data, frame_size, hop_size))
+            found = list(validator.is_valid_batch(data, frame_size, hop_size))
+            self.assertEqual(found, expected, msg="wrong validity of overlapping frames for hop_size={0}".format(hop_size))
+    
+    def test_is_valid_batch_noise_after_loud_frames(self):
+        
+        # loud samples followed by low level noise, the energy of noise frames
+        # must not be lost in rounding errors of prefix sums of squares
+        for sample_width, fmt, amplitude in ((2, "h", 32767), (4, "i", 2 ** 31 - 1)):
+            frame_size = 32 * sample_width
+            hop_size = 8 * sample_width
+            rand = random.Random(4)
+            data = struct.pack("<{0}{1}".format(32 * 50, fmt),
+                               *[rand.randint(-amplitude, amplitude) for _ in range(32 * 50)])
+            data += struct.pack("<{0}{1}".format(256, fmt), *[rand.randint(-100, 100) for _ in range(256)])
+            reference = AudioEnergyValidator(sample_width=sample_width, energy_threshold=10)
+            validator = SlidingEnergyValidator(sample_width=sample_width, energy_threshold=10)
+            found = validator.is_valid_batch(data, frame_size, hop_size)
+            expected = [reference.is_valid(data[start: start + frame_size])
+                        for start in range(0, len(data) - frame_size + 1, hop_size)]
+            self.assertEqual(list(found), expected,
+                             msg="wrong validity of overlapping frames for sample_width={0}".format(sample_width))
+    
+    def test_energy_same_as_log_energy(self):
+        
+        frame_length = 160
+        hop_length = 40
+        signal = AudioEnergyValidator._convert(self.data[:frame_length * 20 * self.sample_width], self.sample_width)
+        for start in range(0, len(signal) - frame_length + 1, hop_length):
+            log_energy = AudioEnergyValidator._signal_log_energy(signal[start: start + frame_length])
+            frame = self.data[start * self.sample_width: (start + frame_length) * self.sample_width]
+            frames = self.data[(start - hop_length) * self.sample_width: (start + frame_length) * self.sample_width] \
+                if start > 0 else frame
+            # is_valid_batch result for the last frame of 'frames' must flip at log_energy
+            for threshold, expected in ((log_energy - 1e-6, True), (log_energy + 1e-6, False)):
+                validator = SlidingEnergyValidator(sample_width=self.sample_width, energy_threshold=threshold)
+                found = validator.is_valid_batch(frames, frame_length * self.sample_width,
+                                                 hop_length * self.sample_width)[-1]
+                self.assertEqual(found, expected, msg="wrong validity for frame {0} with threshold={1}".format(start, threshold))
+    
+    def test_is_valid_overlap_ads(self):
+        
+        validator = SlidingEnergyValidator(sample_width=self.sample_width, energy_threshold=50, hop_size=40)
+        ads = ADSFactory.ads(data_buffer=self.data, sampling_rate=16000, sample_width=self.sample_width,
+                             channels=1, block_size=160, hop_size=40)
+        ads.open()
+        i = 0
+        while True:
+            frame = ads.read()
+            if frame is None:
+                break
+            self.assertEqual(validator.is_valid(frame), self.reference.is_valid(frame),
+                             msg="wrong validity for frame {0}".format(i))
+            i += 1
+        
+        # frames that do not overlap
+        validator.reset()
+        for data in (b"\0\0" * 160, b"\xff\x7f" * 160, b"\0\0" * 160):
+            self.assertEqual(validator.is_valid(data), self.reference.is_valid(data), msg="wrong validity")
+    
+    def test_tokenize_overlap_ads(self):
+        
+        expected = []
+        found = []
+        for validator, tokens in ((self.reference, expected),
+                                  (SlidingEnergyValidator(sample_width=self.sample_width, energy_threshold=50,
+                                                          hop_size=40), found)):
+            ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, block_size=160, hop_size=40)
+            ads.open()
+            tokenizer = StreamTokenizer(validator, min_length=20, max_length=1000, max_continuous_silence=30)
+            tokens.extend((start, end) for _, start, end in tokenizer.tokenize(ads))
+            ads.close()
+        self.assertEqual(found, expected, msg="wrong tokens, expected: {0}, found: {1} ".format(expected, found))
+    
+    def test_hop_size_exception(self):
+        with self.assertRaises(ValueError):
+            SlidingEnergyValidator(sample_width=2, hop_size=0)
+
+
+class TestEnergyIndex(unittest.TestCase):
+    
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.filename = dataset.one_to_six_arabic_16000_mono_bc_noise
+    
+    def tearDown(self):
+        shutil.rmtree(self.index_dir)
+    
+    def _index_files(self, index_dir=None):
+        index_dir = self.index_dir if index_dir is None else index_dir
+        return sorted(name for name in os.listdir(index_dir) if name.endswith(".energy"))
+    
+    def _tokens(self, validator, **kwargs):
+        ads = ADSFactory.ads(filename=self.filename, block_dur=0.01, **kwargs)
+        ads.open()
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=1000, max_continuous_silence=30)
+        tokens = [(start, end) for _, start, end in tokenizer.tokenize(ads)]
+        ads.close()
+        return tokens
+    
+    def test_log_energy_batch(self):
+        
+        data = _read_wave(self.filename)[0][:320 * 50 + 100]
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        log_energies = list(validator.log_energy_batch(data, 320))
+        self.assertEqual(len(log_energies), 51, msg="wrong number of frames, expected: 51, found: {0} ".format(len(log_energies)))
+        for i, log_energy in enumerate(log_energies):
+            signal = AudioEnergyValidator._convert(data[i * 320: (i + 1) * 320], 2)
+            expected = AudioEnergyValidator._signal_log_energy(signal)
+            self.assertAlmostEqual(log_energy, expected, places=6, msg="wrong log energy for frame {0}".format(i))
+        
+        log_energies = list(validator.log_energy_batch(b"\0" * 40, 20))
+        self.assertEqual(log_energies, [-200, -200], msg="wrong log energy for silent frames, expected: [-200, -200], found: {0} ".format(log_energies))
+    
+    def test_same_as_tokenize(self):
+        
+        index = EnergyIndex.for_file(self.filename, block_dur=0.01, index_dir=self.index_dir)
+        self.assertEqual(len(self._index_files()), 1, msg="index file should be saved")
+        
+        for threshold in (40, 50, 60):
+            validator = AudioEnergyValidator(sample_width=2, energy_threshold=threshold)
+            tokenizer = StreamTokenizer(validator, min_length=20, max_length=1000, max_continuous_silence=30)
+            expected = self._tokens(validator)
+            found = [(start, end) for _, start, end in tokenizer.tokenize_mask(index.get_mask(threshold))]
+            self.assertEqual(found, expected, msg="wrong tokens with threshold={0}, expected: {1}, found: {2} ".format(threshold, expected, found))
+    
+    def test_save_load(self):
+        
+        index = EnergyIndex.for_file(self.filename, block_dur=0.02, index_dir=self.index_dir)
+        index_filename = os.path.join(self.index_dir, self._index_files()[0])
+        loaded = EnergyIndex.load(index_filename)
+        self.assertTrue(loaded.matches(320, 16000, 2, 1, "any", EnergyIndex.file_hash(self.filename)),
+                        msg="wrong parameters of loaded index")
+        self.assertEqual(list(loaded.get_log_energies()), list(index.get_log_energies()),
+                         msg="wrong log energies of loaded index")
+        
+        # loaded from the index file, data is not read
+        audio_source = BufferAudioSource(b"", sampling_rate=16000, sample_width=2, channels=1)
+        index = EnergyIndex.for_file(self.filename, block_dur=0.02, index_dir=self.index_dir,
+                                     audio_source=audio_source)
+        self.assertEqual(list(index.get_log_energies()), list(loaded.get_log_energies()),
+                         msg="index should be loaded from index file")
+        
+        # other parameters, other index file
+        EnergyIndex.for_file(self.filename, block_dur=0.01, index_dir=self.index_dir)
+        self.assertEqual(len(self._index_files()), 2, msg="a new index file should be saved")
+        
+        with open(index_filename, "wb") as fp:
+            fp.write(b"not an index")
+        self.assertRaises(ValueError, EnergyIndex.load, index_filename)
+        index = EnergyIndex.for_file(self.filename, block_dur=0.02, index_dir=self.index_dir)
+        self.assertEqual(list(EnergyIndex.load(index_filename).get_log_energies()), list(index.get_log_energies()),
+                         msg="invalid index file should be overwritten")
+    
+    def test_new_index_dir(self):
+        
+        index_dir = os.path.join(self.index_dir, "new", "index")
+        index = EnergyIndex.for_file(self.filename, block_dur=0.01, index_dir=index_dir)
+        index_files = self._index_files(index_dir)
+        self.assertEqual(len(index_files), 1, msg="index file should be saved in a new directory")
+        loaded = EnergyIndex.load(os.path.join(index_dir, index_files[0]))
+        self.assertEqual(list(loaded.get_log_energies()), list(index.get_log_energies()),
+                         msg="wrong log energies of loaded index")
+        self.assertEqual([name for name in os.listdir(index_dir) if name.endswith(".tmp")], [],
+                         msg="temporary files should be removed")
+    
+    def test_cached_file_hash(self):
+        
+        filename = os.path.join(self.index_dir, "audio.wav")
+        shutil.copy(self.filename, filename)
+        content_hash = EnergyIndex.file_hash(filename)
+        self.assertEqual(EnergyIndex.cached_file_hash(filename, self.index_dir), content_hash,
+                         msg="wrong hash")
+        
+        # the cached hash is used as long as size and modification time do not change
+        hash_files = [name for name in os.listdir(self.index_dir) if name.endswith(".sha1")]
+        self.assertEqual(len(hash_files), 1, msg="hash should be cached")
+        hash_filename = os.path.join(self.index_dir, hash_files[0])
+        with open(hash_filename, "rb") as fp:
+            cached = fp.read()
+        with open(hash_filename, "wb") as fp:
+            fp.write(cached.replace(content_hash.encode("ascii"), b"0" * 40))
+        self.assertEqual(EnergyIndex.cached_file_hash(filename, self.index_dir), "0" * 40,
+                         msg="cached hash should be used")
+        
+        with open(filename, "ab") as fp:
+            fp.write(b"\0\0")
+        self.assertEqual(EnergyIndex.cached_file_hash(filename, self.index_dir), EnergyIndex.file_hash(filename),
+                         msg="hash should be computed again if the file changes")
+    
+    def test_multi_channel(self):
+        
+        data = _read_wave(self.filename)[0]
+        signal = AudioEnergyValidator._convert(data, 2)
+        # right channel is the left one delayed by 1 second
+        right = [0] * 16000 + list(signal[:-16000])
+        stereo = struct.pack("<{0}h".format(2 * len(signal)), *[s for pair in zip(signal, right) for s in pair])
+        filename = os.path.join(self.index_dir, "stereo.raw")
+        with open(filename, "wb") as fp:
+            fp.write(stereo)
+        
+        for use_channel in ("any", "all", "mix", 1):
+            audio_source = BufferAudioSource(stereo, sampling_rate=16000, sample_width=2, channels=2)
+            index = EnergyIndex.for_file(filename, block_dur=0.01, use_channel=use_channel,
+                                         index_dir=self.index_dir, audio_source=audio_source)
+            validator = AudioEnergyValidator(sample_width=2, energy_threshold=50, channels=2, use_channel=use_channel)
+            tokenizer = StreamTokenizer(validator, min_length=20, max_length=1000, max_continuous_silence=30)
+            ads = ADSFactory.ads(data_buffer=stereo, sampling_rate=16000, sample_width=2, channels=2, block_dur=0.01)
+            ads.open()
+            expected = [(start, end) for _, start, end in tokenizer.tokenize(ads)]
+            found = [(start, end) for _, start, end in tokenizer.tokenize_mask(index.get_mask(50))]
+            self.assertEqual(found, expected, msg="wrong tokens with use_channel={0}, expected: {1}, found: {2} ".format(use_channel, expected, found))
+
+
+class TestAdaptiveEnergyValidator(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        # 60 seconds of noise whose level drifts from 30 dB to 50 dB, with
+        # 1 second bursts 20 dB above the noise every 10 seconds (10 ms frames)
+        rand = random.Random(1234)
+        sampling_rate = 8000
+        samples = []
+        for i in range(60 * sampling_rate):
+            level = 30 + 20. * i / (60 * sampling_rate)
+            if i % (10 * sampling_rate) < sampling_rate and i >= 10 * sampling_rate:
+                level += 20
+            samples.append(int(rand.gauss(0, 10 ** (level / 20.))))
+        cls.data = struct.pack("<{0}h".format(len(samples)), *samples)
+        cls.frame_size = 160
+        cls.bursts = [(i * 1000, i * 1000 + 99) for i in range(1, 6)]
+    
+    def _tokens(self, validator):
+        ads = ADSFactory.ads(data_buffer=self.data, sampling_rate=8000, sample_width=2,
+                             channels=1, block_size=self.frame_size // 2)
+        ads.open()
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=500, max_continuous_silence=10)
+        return [(start, end) for _, start, end in tokenizer.tokenize(ads)]
+    
+    def test_drifting_noise(self):
+        
+        found = self._tokens(AdaptiveEnergyValidator(sample_width=2, margin=10, window=500))
+        self.assertEqual(len(found), len(self.bursts), msg="wrong number of tokens, expected: {0}, found: {1} ".format(len(self.bursts), found))
+        for (start, end), (burst_start, burst_end) in zip(found, self.bursts):
+            self.assertTrue(start == burst_start and burst_end <= end <= burst_end + 10,
+                            msg="wrong token, expected: {0}, found: {1} ".format((burst_start, burst_end), (start, end)))
+        
+        # a fixed threshold either misses bursts or detects noise
+        for threshold in (45, 55):
+            found = self._tokens(AudioEnergyValidator(sample_width=2, energy_threshold=threshold))
+            self.assertNotEqual(len(found), len(self.bursts), msg="wrong number of tokens with threshold={0}".format(threshold))
+    
+    def test_batch_same_as_frame_by_frame(self):
+        
+        validator = AdaptiveEnergyValidator(sample_width=2, margin=10, window=500, nb_subwindows=5)
+        expected = [validator.is_valid(self.data[i: i + self.frame_size])
+                    for i in range(0, len(self.data), self.frame_size)]
+        noise_floor = validator.get_noise_floor()
+        
+        validator.reset()
+        self.assertIsNone(validator.get_noise_floor(), msg="noise floor should be reset")
+        found = []
+        for i in range(0, len(self.data), self.frame_size * 700):
+            found.extend(validator.is_valid_batch(self.data[i: i + self.frame_size * 700], self.frame_size))
+        self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree")
+        self.assertEqual(validator.get_noise_floor(), noise_floor, msg="wrong noise floor")
+        self.assertTrue(45 < noise_floor < 50, msg="wrong noise floor: {0}".format(noise_floor))
+        self.assertEqual(len(validator._minima), 5, msg="only the minimum of 5 sub-windows should be kept")
+    
+    def test_silence_and_energy_threshold(self):
+        
+        validator = AdaptiveEnergyValidator(sample_width=2, margin=10, window=10, energy_threshold=40)
+        noise = struct.pack("<4h", 10, -10, 10, -10)
+        loud = struct.pack("<4h", 50, -50, 50, -50)
+        louder = struct.pack("<4h", 1000, -1000, 1000, -1000)
+        found = [validator.is_valid(data) for data in (noise, b"\0" * 8, loud, b"\0" * 8, louder)]
+        # loud is 14 dB above the noise floor but below energy_threshold
+        expected = [False, False, False, False, True]
+        self.assertEqual(found, expected, msg="wrong validity, expected: {0}, found: {1} ".format(expected, found))
+        self.assertEqual(validator.get_noise_floor(), 20, msg="silent frames should not change the noise floor")
+    
+    def test_parameters_exception(self):
+        for window, nb_subwindows in ((10, 0), (5, 10)):
+            with self.assertRaises(ValueError):
+                AdaptiveEnergyValidator(sample_width=2, window=window, nb_subwindows=nb_subwindows)
+
+
+class TestEnergyHistogram(unittest.TestCase):
+    
+    def test_update(self):
+        
+        histogram = EnergyHistogram(min_energy=0, max_energy=10, bin_width=2)
+        histogram.update([-200, -5, 0.5, 3, 3.9, 9.9, 45, -200])
+        
+        counts = histogram.get_counts()
+        self.assertEqual(counts, [2, 2, 0, 0, 2], msg="wrong counts, expected: [2, 2, 0, 0, 2], found: {0} ".format(counts))
+        self.assertEqual(histogram.nb_silent_frames, 2, msg="wrong number of silent frames, expected: 2, found: {0} ".format(histogram.nb_silent_frames))
+        edges = histogram.get_bin_edges()
+        self.assertEqual(edges, [0, 2, 4, 6, 8, 10], msg="wrong bin edges, expected: [0, 2, 4, 6, 8, 10], found: {0} ".format(edges))
+    
+    def test_otsu_threshold(self):
+        
+        histogram = EnergyHistogram(min_energy=0, max_energy=100, bin_width=0.5)
+        histogram.update([10] * 3 + [50] * 2)
+        # all edges between the two modes give the same variance, the middle one is used
+        threshold = histogram.otsu_threshold()
+        self.assertEqual(threshold, 30.25, msg="wrong threshold, expected: 30.25, found: {0} ".format(threshold))
+        
+        histogram = EnergyHistogram()
+        histogram.update([-200, 40, 40.1])
+        threshold = histogram.otsu_threshold()
+        self.assertIsNone(threshold, msg="threshold should be None, found: {0} ".format(threshold))
+    
+    def test_compute(self):
+        
+        filename = dataset.one_to_six_arabic_16000_mono_bc_noise
+        data, sample_width = _read_wave(filename)
+        asource = BufferAudioSource(data, sampling_rate=16000,
+                                    sample_width=sample_width, channels=1)
+        histogram = EnergyHistogram.compute(asource, block_size=160, batch_size=7)
+        self.assertFalse(asource.is_open(), msg="audio source should be closed")
+        
+        validator = AudioEnergyValidator(sample_width=sample_width)
+        expected = EnergyHistogram()
+        expected.update(validator.log_energy_batch(data, 320))
+        self.assertEqual(histogram.get_counts(), expected.get_counts(), msg="wrong histogram counts")
+        
+        threshold = histogram.otsu_threshold()
+        self.assertTrue(50 < threshold < 80, msg="wrong threshold: {0} ".format(threshold))
+    
+    def test_wrong_parameters(self):
+        
+        with self.assertRaises(ValueError):
+            EnergyHistogram(bin_width=0)
+        with self.assertRaises(ValueError):
+            EnergyHistogram(min_energy=50, max_energy=50)
+
+
+class TestSpectralBandEnergyValidator(unittest.TestCase):
+    
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            raise unittest.SkipTest("SpectralBandEnergyValidator requires numpy")
+        self.numpy = numpy
+        self.data, self.sample_width = _read_wave(dataset.one_to_six_arabic_16000_mono_bc_noise)
+    
+    def test_whole_band_same_as_energy(self):
+        
+        validator = AudioEnergyValidator(sample_width=2)
+        for frame_size in (320, 322):
+            expected = validator.log_energy_batch(self.data, frame_size)
+            band_validator = SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000, low_freq=0,
+                                                         high_freq=8000, window=None)
+            found = band_validator.log_energy_batch(self.data, frame_size)
+            self.assertTrue(self.numpy.allclose(found, expected, rtol=0, atol=1e-6),
+                            msg="band energy of the whole spectrum should be the energy of the signal (frame_size={0})".format(frame_size))
+    
+    def test_low_frequency_noise(self):
+        
+        numpy = self.numpy
+        sampling_rate = 16000
+        t = numpy.arange(sampling_rate * 2) / float(sampling_rate)
+        # loud 60 Hz rumble with a 1000 Hz tone between 0.5 s and 1 s
+        signal = 3000 * numpy.sin(2 * numpy.pi * 60 * t)
+        signal[8000:16000] += 500 * numpy.sin(2 * numpy.pi * 1000 * t[8000:16000])
+        data = signal.astype(numpy.int16).tobytes()
+        
+        valid = AudioEnergyValidator(sample_width=2, energy_threshold=45).is_valid_batch(data, 320)
+        self.assertTrue(all(valid), msg="all frames should be valid for AudioEnergyValidator")
+        
+        validator = SpectralBandEnergyValidator(sample_width=2, sampling_rate=sampling_rate,
+                                                energy_threshold=45)
+        valid = validator.is_valid_batch(data, 320)
+        expected = [50 <= i < 100 for i in range(200)]
+        self.assertEqual(valid, expected, msg="only frames of the 1000 Hz tone should be valid")
+    
+    def test_is_valid_batch(self):
+        
+        for window in ("hann", "hamming", None):
+            validator = SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000,
+                                                    energy_threshold=40, window=window)
+            data = self.data + b"\x01\x02" * 7
+            expected = [validator.is_valid(data[i: i + 320]) for i in range(0, len(data), 320)]
+            found = validator.is_valid_batch(data, 320)
+            self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree for window {0}".format(window))
+            
+            expected = [validator.is_valid(data[i: i + 320]) for i in range(0, len(data) - 320 + 1, 80)]
+            found = validator.is_valid_batch(data, 320, 80)[:len(expected)]
+            self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree for overlapping frames")
+        
+        log_energies = validator.log_energy_batch(b"\0" * 640, 320).tolist()
+        self.assertEqual(log_energies, [-200, -200], msg="wrong log energy for silent frames, expected: [-200, -200], found: {0} ".format(log_energies))
+    
+    def test_channels(self):
+        
+        numpy = self.numpy
+        left = numpy.frombuffer(self.data, dtype=numpy.int16)
+        right = numpy.roll(left, 3000) // 4
+        data = numpy.stack((left, right), axis=1).tobytes()
+        mono = SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000)
+        energies = [mono.log_energy_batch(channel.tobytes(), 320) for channel in (left, right)]
+        
+        for use_channel, expected in (("any", numpy.maximum(*energies)), ("all", numpy.minimum(*energies)),
+                                      ("left", energies[0]), ("right", energies[1])):
+            validator = SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000, energy_threshold=45,
+                                                    channels=2, use_channel=use_channel)
+            log_energies = validator.log_energy_batch(data, 640)
+            self.assertTrue(numpy.allclose(log_energies, expected),
+                            msg="wrong log energies for use_channel={0}".format(use_channel))
+            self.assertEqual(validator.is_valid_batch(data, 640), (expected >= 45).tolist(),
+                             msg="wrong validity for use_channel={0}".format(use_channel))
+    
+    def test_wrong_parameters(self):
+        
+        with self.assertRaises(ValueError):
+            SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000, low_freq=3400, high_freq=300)
+        with self.assertRaises(ValueError):
+            SpectralBandEnergyValidator(sample_width=2, sampling_rate=16000, window="blackman")
+
+
+class TestZeroCrossingEnergyValidator(unittest.TestCase):
+    
+    def setUp(self):
+        # 100 samples per frame: a 200 Hz tone (4 zero crossings), alternating
+        # samples (99 zero crossings) and a low level 200 Hz tone
+        tone = [int(round(3000 * math.sin(2 * math.pi * 200 * (i + 0.5) / 8000.))) for i in range(100)]
+        noise = [3000 if i % 2 == 0 else -3000 for i in range(100)]
+        quiet = [sample // 100 for sample in tone]
+        self.frames = [struct.pack("<100h", *samples) for samples in (tone, noise, quiet)]
+    
+    def test_energy_and_zcr(self):
+        
+        validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=50, max_zcr=0.25)
+        found = [validator.is_valid(frame) for frame in self.frames]
+        self.assertEqual(found, [True, False, False], msg="wrong validity, expected: [True, False, False], found: {0} ".format(found))
+        
+        validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=50, max_zcr=None)
+        found = [validator.is_valid(frame) for frame in self.frames]
+        self.assertEqual(found, [True, True, False], msg="wrong validity, expected: [True, True, False], found: {0} ".format(found))
+        
+        # 4 / 99 < zcr < 99 / 99
+        validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=0, min_zcr=0.041, max_zcr=0.99)
+        found = [validator.is_valid(frame) for frame in self.frames]
+        self.assertEqual(found, [False, False, False], msg="wrong validity, expected: [False, False, False], found: {0} ".format(found))
+    
+    def test_or_rule(self):
+        
+        validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=50, min_zcr=0.5,
+                                                max_zcr=None, combine="or")
+        found = [validator.is_valid(frame) for frame in self.frames]
+        self.assertEqual(found, [True, True, False], msg="wrong validity, expected: [True, True, False], found: {0} ".format(found))
+    
+    def test_is_valid_batch(self):
+        
+        data, sample_width = _read_wave(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        data = data[:len(data) // 320 * 320]
+        validator = ZeroCrossingEnergyValidator(sample_width=sample_width, energy_threshold=50, max_zcr=0.2)
+        expected = [validator.is_valid(data[i: i + 320]) for i in range(0, len(data), 320)]
+        expected.append(validator.is_valid(data[:30]))
+        found = validator.is_valid_batch(data + data[:30], 320)
+        self.assertEqual(found, expected, msg="is_valid_batch and is_valid disagree")
+        self.assertTrue(0 < sum(found) < len(found), msg="some frames should be valid and some not")
+    
+    def test_channels(self):
+        
+        # left channel: tone, right channel: alternating samples
+        frames = self.frames
+        left, right = struct.unpack("<100h", frames[0]), struct.unpack("<100h", frames[1])
+        data = struct.pack("<200h", *[sample for pair in zip(left, right) for sample in pair])
+        for use_channel, expected in (("left", True), ("right", False), ("any", True), ("all", False)):
+            validator = ZeroCrossingEnergyValidator(sample_width=2, energy_threshold=50, max_zcr=0.25,
+                                                    channels=2, use_channel=use_channel)
+            found = validator.is_valid(data)
+            self.assertEqual(found, expected, msg="wrong validity for use_channel={0}, expected: {1}, found: {2} ".format(use_channel, expected, found))
+            found = validator.is_valid_batch(data * 3, 400)
+            self.assertEqual(found, [expected] * 3, msg="wrong batch validity for use_channel={0}".format(use_channel))
+    
+    def test_wrong_parameters(self):
+        
+        with self.assertRaises(ValueError):
+            ZeroCrossingEnergyValidator(sample_width=2, combine="xor")
+        with self.assertRaises(ValueError):
+            ZeroCrossingEnergyValidator(sample_width=2, min_zcr=None, max_zcr=None, combine="or")
+        with self.assertRaises(ValueError):
+            ZeroCrossingEnergyValidator(sample_width=2, min_zcr=0.5, max_zcr=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,12 @@ September 2015
 '''
 
 import unittest
-from auditok import StreamTokenizer, StringDataSource, DataValidator
+import random
+import sys
+import wave
+from auditok import StreamTokenizer, MultiStreamTokenizer, TokenizerSweep, StringDataSource, DataValidator, DataSource, \
+     ADSFactory, AudioEnergyValidator, BufferAudioSource, MmapWaveAudioSource, WaveAudioSource, \
+     PrefetchAudioSource, dataset
 
 
 class AValidator(DataValidator):
@@ -495,6 +500,610 @@ class TestStreamTokenizerCallback(unittest.TestCase):
         
 
 
+class TestStreamTokenizerMask(unittest.TestCase):
+    
+    def setUp(self):
+        self.A_validator = AValidator()
+        self.random = random.Random(1234)
+    
+    def _check_equivalence(self, data, **kwargs):
+        
+        tokenizer = StreamTokenizer(self.A_validator, **kwargs)
+        expected = tokenizer.tokenize(StringDataSource(data))
+        
+        mask = [c == "A" for c in data]
+        found = tokenizer.tokenize_mask(mask, frames=data)
+        
+        self.assertEqual(len(found), len(expected),
+                         msg="wrong number of tokens for '{0}' ({1}), expected: {2}, found: {3} ".format(data, kwargs, len(expected), len(found)))
+        for tok_exp, tok_found in zip(expected, found):
+            self.assertEqual((''.join(tok_exp[0]), tok_exp[1], tok_exp[2]), tok_found,
+                             msg="wrong token for '{0}' ({1}), expected: {2}, found: {3} ".format(data, kwargs, tok_exp, tok_found))
+    
+    def test_tokenize_mask_same_as_tokenize(self):
+        
+        modes = [0, StreamTokenizer.STRICT_MIN_LENGTH, StreamTokenizer.DROP_TRAILING_SILENCE,
+                 StreamTokenizer.STRICT_MIN_LENGTH | StreamTokenizer.DROP_TRAILING_SILENCE]
+        
+        for _ in range(3000):
+            max_length = self.random.randint(1, 20)
+            kwargs = dict(min_length=self.random.randint(1, max_length),
+                          max_length=max_length,
+                          max_continuous_silence=self.random.randint(0, max_length - 1),
+                          init_min=self.random.randint(0, max_length - 1),
+                          init_max_silence=self.random.randint(0, 5),
+                          mode=self.random.choice(modes))
+            
+            # alternate long and short runs of valid and non valid frames
+            data = []
+            for _ in range(self.random.randint(0, 15)):
+                data.append(self.random.choice("Aa") * self.random.randint(1, 2 * max_length))
+            self._check_equivalence(''.join(data), **kwargs)
+    
+    def test_tokenize_mask_examples(self):
+        
+        self._check_equivalence("aAaaaAaAaaAaAaaaaaaaAAAAAAAA", min_length=5, max_length=20,
+                                max_continuous_silence=4, init_min=0, init_max_silence=0, mode=0)
+        self._check_equivalence("aaAAAAAAAAAAAAaa", min_length=5, max_length=8,
+                                max_continuous_silence=3, init_min=3, init_max_silence=3,
+                                mode=StreamTokenizer.STRICT_MIN_LENGTH | StreamTokenizer.DROP_TAILING_SILENCE)
+        self._check_equivalence("", min_length=1, max_length=1, max_continuous_silence=0)
+    
+    def test_tokenize_mask_without_frames(self):
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 5, max_length=8,
+                                    max_continuous_silence=3, init_min = 3,
+                                    init_max_silence = 3, mode=0)
+        
+        mask = [c == "A" for c in "aaAAAAAAAAAAAAa"]
+        tokens = tokenizer.tokenize_mask(mask)
+        
+        self.assertEqual(tokens, [(None, 2, 9), (None, 10, 14)],
+                         msg="wrong tokens, expected: [(None, 2, 9), (None, 10, 14)], found: {0} ".format(tokens))
+    
+    def test_tokenize_mask_callback(self):
+        
+        tokens = []
+        
+        def callback(data, start, end):
+            tokens.append((data, start, end))
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 5, max_length=8,
+                                    max_continuous_silence=3, init_min = 3,
+                                    init_max_silence = 3, mode=0)
+        
+        data = "aaAAAAAAAAAAAAa"
+        tokenizer.tokenize_mask([c == "A" for c in data], frames=data, callback=callback)
+        
+        self.assertEqual(len(tokens), 2, msg="wrong number of tokens, expected: 2, found: {0} ".format(len(tokens)))
+
+
+class CountingDataSource(StringDataSource):
+    
+    def __init__(self, data):
+        StringDataSource.__init__(self, data)
+        self.nb_reads = 0
+    
+    def read(self):
+        self.nb_reads += 1
+        return StringDataSource.read(self)
+
+
+class TestStreamTokenizerIterTokens(unittest.TestCase):
+    
+    def setUp(self):
+        self.A_validator = AValidator()
+    
+    def test_iter_tokens_same_as_tokenize(self):
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 4, max_length=5,
+                                     max_continuous_silence=4, init_min = 3,
+                                     init_max_silence = 3, mode=0)
+        
+        data = "aAaaaAaAaaAaAaaaaaAAAAAAAAaaaaaaAAAAAaaaaaAAaaAaa"
+        expected = tokenizer.tokenize(StringDataSource(data))
+        found = list(tokenizer.iter_tokens(StringDataSource(data)))
+        
+        self.assertEqual(found, expected, msg="iter_tokens and tokenize disagree, expected: {0}, found: {1} ".format(expected, found))
+    
+    def test_iter_tokens_is_lazy(self):
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 2, max_length=10,
+                                     max_continuous_silence=1)
+        
+        data_source = CountingDataSource("aAAAaa" + "a" * 100 + "AAAaa")
+        
+        tokens = tokenizer.iter_tokens(data_source)
+        data, start, end = next(tokens)
+        
+        self.assertEqual((''.join(data), start, end), ("AAAa", 1, 4),
+                         msg="wrong first token, expected: ('AAAa', 1, 4), found: {0} ".format((''.join(data), start, end)))
+        self.assertEqual(data_source.nb_reads, 6, msg="wrong number of reads, expected: 6, found: {0} ".format(data_source.nb_reads))
+        
+        data, start, end = next(tokens)
+        self.assertEqual((start, end), (106, 109), msg="wrong second token, expected: (106, 109), found: {0} ".format((start, end)))
+        self.assertRaises(StopIteration, next, tokens)
+
+
+class TestStreamTokenizerFeed(unittest.TestCase):
+    
+    def setUp(self):
+        self.A_validator = AValidator()
+        self.random = random.Random(4321)
+    
+    def test_feed_same_as_tokenize(self):
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 4, max_length=5,
+                                     max_continuous_silence=4, init_min = 3,
+                                     init_max_silence = 3, mode=StreamTokenizer.DROP_TRAILING_SILENCE)
+        
+        data = "aAaaaAaAaaAaAaaaaaAAAAAAAAaaaaaaAAAAAaaaaaAAaaAaaAAAAAAAA"
+        expected = tokenizer.tokenize(StringDataSource(data))
+        
+        for _ in range(20):
+            found = []
+            i = 0
+            while i < len(data):
+                size = self.random.randint(0, 7)
+                found.extend(tokenizer.feed(data[i: i + size]))
+                i += size
+            found.extend(tokenizer.flush())
+            
+            self.assertEqual(found, expected, msg="feed and tokenize disagree, expected: {0}, found: {1} ".format(expected, found))
+    
+    def test_feed_returns_completed_tokens(self):
+        
+        tokenizer = StreamTokenizer(self.A_validator, min_length = 2, max_length=10,
+                                     max_continuous_silence=1)
+        
+        tokens = tokenizer.feed("aAAA")
+        self.assertEqual(tokens, [], msg="wrong tokens, expected: [], found: {0} ".format(tokens))
+        
+        tokens = tokenizer.feed("aaAA")
+        self.assertEqual(tokens, [(['A', 'A', 'A', 'a'], 1, 4)],
+                         msg="wrong tokens, expected: [(['A', 'A', 'A', 'a'], 1, 4)], found: {0} ".format(tokens))
+        
+        tokens = tokenizer.flush()
+        self.assertEqual(tokens, [(['A', 'A'], 6, 7)], msg="wrong tokens, expected: [(['A', 'A'], 6, 7)], found: {0} ".format(tokens))
+        
+        # a new stream starts after flush
+        tokens = tokenizer.feed("AA")
+        tokens.extend(tokenizer.flush())
+        self.assertEqual(tokens, [(['A', 'A'], 0, 1)], msg="wrong tokens, expected: [(['A', 'A'], 0, 1)], found: {0} ".format(tokens))
+        self.assertEqual(tokenizer.flush(), [], msg="flush without feed should return an empty list")
+
+
+class FrameByFrameDataSource(DataSource):
+    
+    def __init__(self, ads):
+        self.ads = ads
+    
+    def read(self):
+        return self.ads.read()
+
+
+class TestStreamTokenizerBatchValidation(unittest.TestCase):
+    
+    def test_batch_same_as_frame_by_frame(self):
+        
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        validator = AudioEnergyValidator(sample_width=ads.get_sample_width(), energy_threshold=50)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+        
+        ads.open()
+        expected = tokenizer.tokenize(FrameByFrameDataSource(ads))
+        ads.close()
+        
+        for batch_size in (1, 7, 1000):
+            tokenizer.BATCH_SIZE = batch_size
+            ads.open()
+            found = tokenizer.tokenize(ads)
+            ads.close()
+            
+            self.assertEqual(len(found), len(expected),
+                             msg="wrong number of tokens, expected: {0}, found: {1} ".format(len(expected), len(found)))
+            for tok_exp, tok_found in zip(expected, found):
+                self.assertEqual(tok_exp, tok_found, msg="tokens differ for batch size {0}".format(batch_size))
+            
+            ads.open()
+            found = list(tokenizer.iter_tokens(ads))
+            ads.close()
+            self.assertEqual(found, expected, msg="iter_tokens differs for batch size {0}".format(batch_size))
+    
+    def test_batch_decorated_data_sources(self):
+        
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+        tokenizer.BATCH_SIZE = 7
+        
+        for kwargs in ({"max_time": 2.1}, {"record": True}, {"hop_size": 80},
+                       {"max_time": 2.1, "record": True, "hop_size": 80}):
+            ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, **kwargs)
+            ads.open()
+            expected = tokenizer.tokenize(FrameByFrameDataSource(ads))
+            ads.close()
+            self.assertTrue(len(expected) > 0, msg="no tokens to compare")
+            
+            ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, **kwargs)
+            ads.open()
+            found = tokenizer.tokenize(ads)
+            ads.close()
+            self.assertEqual(found, expected, msg="tokens differ for data source {0}".format(kwargs))
+
+    
+    def test_batch_prefetch_audio_source(self):
+        
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        tokenizer = StreamTokenizer(validator, min_length=20, max_length=400,
+                                    max_continuous_silence=30)
+        
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        ads.open()
+        expected = tokenizer.tokenize(FrameByFrameDataSource(ads))
+        ads.close()
+        
+        audio_source = PrefetchAudioSource(WaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise),
+                                           chunk_size=1000, nb_buffers=2)
+        ads = ADSFactory.ads(audio_source=audio_source)
+        ads.open()
+        found = tokenizer.tokenize(ads)
+        ads.close()
+        self.assertEqual(found, expected, msg="tokens differ for a PrefetchAudioSource")
+
+
+class AudioFrameByFrameDataSource(FrameByFrameDataSource):
+    
+    def get_block_size(self):
+        return self.ads.get_block_size()
+    
+    def get_sample_width(self):
+        return self.ads.get_sample_width()
+    
+    def get_channels(self):
+        return self.ads.get_channels()
+
+
+class ReadintoDataSource(AudioFrameByFrameDataSource):
+    
+    def read(self):
+        raise AssertionError("readinto should be used instead of read")
+    
+    def readinto(self, buffer):
+        return self.ads.readinto(buffer)
+
+
+def _to_bytes(data):
+    # bytes() returns the representation of a memoryview with Python 2
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return bytes(data)
+
+
+class TestStreamTokenizerOffsets(unittest.TestCase):
+    
+    def setUp(self):
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        self.data = fp.readframes(fp.getnframes())
+        self.sample_width = fp.getsampwidth()
+        fp.close()
+        validator = AudioEnergyValidator(sample_width=self.sample_width, energy_threshold=50)
+        self.tokenizer = StreamTokenizer(validator, min_length=20, max_length=80,
+                                         max_continuous_silence=30,
+                                         mode=StreamTokenizer.DROP_TRAILING_SILENCE)
+        
+    def _expected(self, ads):
+        ads.open()
+        tokens = self.tokenizer.tokenize(FrameByFrameDataSource(ads))
+        ads.close()
+        return [(b''.join(data), start, end) for data, start, end in tokens]
+    
+    def _check(self, ads, data_source=None, expected_type=bytes):
+        expected = self._expected(ads)
+        self.assertTrue(len(expected) > 2, msg="too few tokens to compare")
+        
+        if data_source is None:
+            data_source = ads
+        ads.open()
+        found = self.tokenizer.tokenize(data_source, offsets=True)
+        ads.close()
+        
+        self.assertEqual(len(found), len(expected),
+                         msg="wrong number of tokens, expected: {0}, found: {1} ".format(len(expected), len(found)))
+        for tok_exp, tok_found in zip(expected, found):
+            self.assertIsInstance(tok_found[0], expected_type, msg="wrong type for token data: {0}".format(type(tok_found[0])))
+            self.assertEqual(tok_exp, (_to_bytes(tok_found[0]), tok_found[1], tok_found[2]), msg="tokens differ")
+    
+    def test_offsets_buffer_audio_source(self):
+        ads = ADSFactory.ads(data_buffer=self.data, sr=16000, sw=self.sample_width, ch=1)
+        self._check(ads, expected_type=memoryview)
+    
+    def test_offsets_wave_audio_source(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self._check(ads)
+    
+    @unittest.skipIf(sys.version_info < (3, 0), "MmapWaveAudioSource requires Python 3")
+    def test_offsets_mmap_wave_audio_source(self):
+        audio_source = MmapWaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        ads = ADSFactory.ads(audio_source=audio_source)
+        self._check(ads, expected_type=memoryview)
+    
+    def test_offsets_frame_by_frame(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self._check(ads, data_source=AudioFrameByFrameDataSource(ads))
+    
+    def test_offsets_readinto(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self._check(ads, data_source=ReadintoDataSource(ads))
+    
+    def test_offsets_iter_tokens(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        expected = self._expected(ads)
+        ads.open()
+        found = [(_to_bytes(data), start, end) for data, start, end in self.tokenizer.iter_tokens(ads, offsets=True)]
+        ads.close()
+        self.assertEqual(found, expected, msg="iter_tokens with offsets differs from tokenize")
+    
+    def test_offsets_buffer_audio_source_position(self):
+        asource = BufferAudioSource(self.data, 16000, self.sample_width, 1)
+        ads = ADSFactory.ads(audio_source=asource)
+        asource.open()
+        asource.set_position(16000)
+        expected = self._expected(ads)
+        asource.open()
+        asource.set_position(16000)
+        found = self.tokenizer.tokenize(ads, offsets=True)
+        found = [(_to_bytes(data), start, end) for data, start, end in found]
+        self.assertEqual(found, expected, msg="wrong tokens when audio source is not at position 0")
+    
+    def test_offsets_overlap_exception(self):
+        ads = ADSFactory.ads(data_buffer=self.data, sr=16000, sw=self.sample_width, ch=1,
+                             block_size=320, hop_size=160)
+        ads.open()
+        self.assertRaises(ValueError, self.tokenizer.tokenize, ads, offsets=True)
+
+
+class TestStreamTokenizerParallel(unittest.TestCase):
+    
+    def setUp(self):
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        self.tokenizer = StreamTokenizer(validator, min_length=20, max_length=100,
+                                         max_continuous_silence=30)
+        self.ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self.ads.open()
+        self.expected = self.tokenizer.tokenize(self.ads)
+        self.ads.close()
+    
+    def _check(self, ads, **kwargs):
+        found = self.tokenizer.tokenize_parallel(ads, **kwargs)
+        self.assertEqual(found, self.expected, msg="parallel tokenization differs from tokenize ({0})".format(kwargs))
+    
+    def test_parallel_wave_audio_source(self):
+        for processes in (1, 2):
+            for chunk_size in (1, 37, 100000):
+                self._check(self.ads, processes=processes, chunk_size=chunk_size)
+    
+    def test_parallel_buffer_audio_source(self):
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        data = fp.readframes(fp.getnframes())
+        fp.close()
+        ads = ADSFactory.ads(data_buffer=data, sr=16000, sw=2, ch=1)
+        for processes in (1, 2):
+            for chunk_size in (1, 37, 100000):
+                self._check(ads, processes=processes, chunk_size=chunk_size)
+    
+    @unittest.skipIf(sys.version_info < (3, 0), "MmapWaveAudioSource requires Python 3")
+    def test_parallel_mmap_wave_audio_source(self):
+        audio_source = MmapWaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        ads = ADSFactory.ads(audio_source=audio_source)
+        ads.open()
+        for processes in (1, 2):
+            for chunk_size in (1, 37, 100000):
+                self._check(ads, processes=processes, chunk_size=chunk_size)
+        ads.close()
+    
+    def test_parallel_deterministic(self):
+        results = [self.tokenizer.tokenize_parallel(self.ads, processes=2, chunk_size=50, offsets=True)
+                   for _ in range(3)]
+        for tokens in results[1:]:
+            self.assertEqual(tokens, results[0], msg="parallel tokenization is not deterministic")
+        expected = [(b''.join(data), start, end) for data, start, end in self.expected]
+        self.assertEqual(results[0], expected, msg="wrong tokens with offsets=True")
+    
+    def test_parallel_wrong_data_source(self):
+        ads = ADSFactory.ads(filename=dataset.one_to_six_arabic_16000_mono_bc_noise, max_time=1)
+        self.assertRaises(ValueError, self.tokenizer.tokenize_parallel, ads)
+
+
+class TestMultiStreamTokenizer(unittest.TestCase):
+    
+    def setUp(self):
+        self.A_validator = AValidator()
+        self.random = random.Random(1234)
+    
+    def _stream_tokens(self, data, **kwargs):
+        tokenizer = StreamTokenizer(self.A_validator, **kwargs)
+        return [(start, end) for _, start, end in tokenizer.tokenize(StringDataSource(data))]
+    
+    def test_feed_mask_same_as_tokenize(self):
+        
+        for mode in (0, StreamTokenizer.STRICT_MIN_LENGTH, StreamTokenizer.DROP_TRAILING_SILENCE):
+            for init_min, init_max_silence in ((0, 0), (3, 2)):
+                kwargs = dict(min_length=3, max_length=8, max_continuous_silence=2,
+                              init_min=init_min, init_max_silence=init_max_silence, mode=mode)
+                streams = ["".join(self.random.choice("aAA") for _ in range(60)) for _ in range(10)]
+                tokenizer = MultiStreamTokenizer(self.A_validator, nb_streams=len(streams), **kwargs)
+                
+                tokens = []
+                for i in range(60):
+                    tokens.extend(tokenizer.feed_mask([data[i] == "A" for data in streams]))
+                tokens.extend(tokenizer.flush())
+                
+                for stream_id, data in enumerate(streams):
+                    expected = self._stream_tokens(data, **kwargs)
+                    found = [(start, end) for sid, start, end in tokens if sid == stream_id]
+                    self.assertEqual(found, expected,
+                                     msg="wrong tokens for stream {0} with {1}, expected: {2}, found: {3} ".format(stream_id, kwargs, expected, found))
+    
+    def test_feed_mask_several_frames(self):
+        
+        streams = ["aAAAaaaaAAAAAAAAAAAAa", "AAAAAAAAAAaAAaaaaaaaA"]
+        tokenizer = MultiStreamTokenizer(self.A_validator, nb_streams=2, min_length=3,
+                                         max_length=8, max_continuous_silence=2)
+        tokens = tokenizer.feed_mask([[c == "A" for c in data] for data in streams])
+        tokens.extend(tokenizer.flush())
+        # tokens are sorted by detection time
+        expected = [(0, 1, 5), (1, 0, 7), (0, 8, 15), (1, 8, 14), (0, 16, 20)]
+        self.assertEqual(tokens, expected, msg="wrong tokens, expected: {0}, found: {1} ".format(expected, tokens))
+    
+    def test_no_validator(self):
+        
+        streams = ["aAAAaaaaAAAAAAAAAAAAa", "AAAAAAAAAAaAAaaaaaaaA"]
+        tokenizer = MultiStreamTokenizer(None, nb_streams=2, min_length=3,
+                                         max_length=8, max_continuous_silence=2)
+        tokens = tokenizer.feed_mask([[c == "A" for c in data] for data in streams])
+        tokens.extend(tokenizer.flush())
+        expected = [(0, 1, 5), (1, 0, 7), (0, 8, 15), (1, 8, 14), (0, 16, 20)]
+        self.assertEqual(tokens, expected, msg="wrong tokens, expected: {0}, found: {1} ".format(expected, tokens))
+        self.assertRaises(ValueError, tokenizer.feed, b"aA")
+        self.assertRaises(TypeError, MultiStreamTokenizer, "A", nb_streams=2, min_length=3,
+                          max_length=8, max_continuous_silence=2)
+    
+    def test_flush_some_streams(self):
+        
+        tokenizer = MultiStreamTokenizer(self.A_validator, nb_streams=3, min_length=2,
+                                         max_length=10, max_continuous_silence=1)
+        for _ in range(3):
+            tokenizer.feed_mask([True, True, True])
+        
+        tokens = tokenizer.flush([1])
+        self.assertEqual(tokens, [(1, 0, 2)], msg="wrong tokens, expected: [(1, 0, 2)], found: {0} ".format(tokens))
+        
+        tokens = tokenizer.feed_mask([False, True, False])
+        self.assertEqual(tokens, [], msg="wrong tokens, expected: [], found: {0} ".format(tokens))
+        tokens = tokenizer.feed_mask([False, True, False])
+        expected = [(0, 0, 3), (2, 0, 3)]
+        self.assertEqual(tokens, expected, msg="wrong tokens, expected: {0}, found: {1} ".format(expected, tokens))
+        
+        # stream 1 started again at frame 0
+        tokens = tokenizer.flush()
+        self.assertEqual(tokens, [(1, 0, 1)], msg="wrong tokens, expected: [(1, 0, 1)], found: {0} ".format(tokens))
+    
+    def test_feed_audio_frames(self):
+        
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        data = fp.readframes(fp.getnframes())
+        fp.close()
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        frame_size = 320
+        nb_frames = len(data) // frame_size
+        # second stream is the first one delayed by 100 frames
+        streams = [data[:nb_frames * frame_size], (b"\0" * 100 * frame_size + data)[:nb_frames * frame_size]]
+        tokenizer = MultiStreamTokenizer(validator, nb_streams=2, min_length=20,
+                                         max_length=1000, max_continuous_silence=30)
+        
+        tokens = []
+        for i in range(nb_frames):
+            frames = b"".join(stream[i * frame_size: (i + 1) * frame_size] for stream in streams)
+            tokens.extend(tokenizer.feed(frames))
+        tokens.extend(tokenizer.flush())
+        
+        for stream_id, stream in enumerate(streams):
+            ads = ADSFactory.ads(data_buffer=stream, sampling_rate=16000, sample_width=2,
+                                 channels=1, block_size=frame_size // 2)
+            ads.open()
+            expected = [(start, end) for _, start, end in
+                        StreamTokenizer(validator, 20, 1000, 30).tokenize(ads)]
+            found = [(start, end) for sid, start, end in tokens if sid == stream_id]
+            self.assertEqual(found, expected, msg="wrong tokens for stream {0}, expected: {1}, found: {2} ".format(stream_id, expected, found))
+        
+        self.assertRaises(ValueError, tokenizer.feed, b"\0" * 3)
+        self.assertRaises(ValueError, tokenizer.feed_mask, [True])
+    
+    def test_per_stream_parameters(self):
+        
+        # same stream with a different configuration for each stream
+        data = "".join(self.random.choice("aAA") for _ in range(100))
+        parameters = [(1, 5, 0), (3, 8, 2), (2, 20, 4), (6, 10, 9)]
+        min_lengths, max_lengths, max_continuous_silences = zip(*parameters)
+        tokenizer = MultiStreamTokenizer(self.A_validator, nb_streams=len(parameters),
+                                         min_length=min_lengths, max_length=max_lengths,
+                                         max_continuous_silence=max_continuous_silences)
+        tokens = tokenizer.feed_mask([[c == "A" for c in data]] * len(parameters))
+        tokens.extend(tokenizer.flush())
+        
+        for stream_id, (min_length, max_length, max_continuous_silence) in enumerate(parameters):
+            expected = self._stream_tokens(data, min_length=min_length, max_length=max_length,
+                                           max_continuous_silence=max_continuous_silence)
+            found = [(start, end) for sid, start, end in tokens if sid == stream_id]
+            self.assertEqual(found, expected, msg="wrong tokens for stream {0}, expected: {1}, found: {2} ".format(stream_id, expected, found))
+        
+        # wrong number of values
+        self.assertRaises(ValueError, MultiStreamTokenizer, self.A_validator, nb_streams=2,
+                          min_length=[1, 2, 3], max_length=10, max_continuous_silence=2)
+        # invalid configuration for one stream
+        self.assertRaises(ValueError, MultiStreamTokenizer, self.A_validator, nb_streams=2,
+                          min_length=[1, 20], max_length=10, max_continuous_silence=2)
+
+
+class TestTokenizerSweep(unittest.TestCase):
+    
+    def setUp(self):
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        self.data = fp.readframes(fp.getnframes())
+        fp.close()
+    
+    def _tokens(self, energy_threshold, min_length, max_length, max_continuous_silence, **kwargs):
+        ads = ADSFactory.ads(data_buffer=self.data, sampling_rate=16000, sample_width=2,
+                             channels=1, block_size=160)
+        ads.open()
+        validator = AudioEnergyValidator(sample_width=2, energy_threshold=energy_threshold)
+        tokenizer = StreamTokenizer(validator, min_length, max_length, max_continuous_silence, **kwargs)
+        tokens = [(start, end) for _, start, end in tokenizer.tokenize(ads)]
+        ads.close()
+        return tokens
+    
+    def test_same_as_tokenize(self):
+        
+        for mode, init_min in ((0, 0), (StreamTokenizer.DROP_TRAILING_SILENCE, 3)):
+            sweep = TokenizerSweep(energy_thresholds=[45, 55, 65], min_lengths=[5, 20, 50],
+                                   max_lengths=[40, 1000], max_continuous_silences=[0, 10, 30],
+                                   init_min=init_min, init_max_silence=2, mode=mode)
+            # combinations with min_length > max_length are left out
+            self.assertEqual(len(sweep.configurations), 3 * 3 * 2 * 3 - 3 * 3,
+                             msg="wrong number of configurations: {0}".format(len(sweep.configurations)))
+            
+            asource = BufferAudioSource(self.data, sampling_rate=16000, sample_width=2, channels=1)
+            statistics = sweep.run(asource, block_size=160, batch_size=37)
+            for configuration, tokens, stats in zip(sweep.configurations, sweep.get_tokens(), statistics):
+                expected = self._tokens(*configuration, init_min=init_min, init_max_silence=2, mode=mode)
+                self.assertEqual(tokens, expected, msg="wrong tokens for {0}, expected: {1}, found: {2} ".format(configuration, expected, tokens))
+                expected = (len(expected), sum(end - start + 1 for start, end in expected))
+                self.assertEqual(stats, expected, msg="wrong statistics for {0}, expected: {1}, found: {2} ".format(configuration, expected, stats))
+    
+    def test_feed_log_energies(self):
+        
+        sweep = TokenizerSweep(energy_thresholds=[50, 60], min_lengths=[2], max_lengths=[10],
+                               max_continuous_silences=[1], keep_tokens=False)
+        sweep.feed([70, 55, 55, 40, -200])
+        sweep.feed([65, 65, 40])
+        sweep.flush()
+        statistics = sweep.get_statistics()
+        expected = [(2, 4 + 3), (2, 2 + 3)]
+        self.assertEqual(statistics, expected, msg="wrong statistics, expected: {0}, found: {1} ".format(expected, statistics))
+        self.assertRaises(ValueError, sweep.get_tokens)
+        
+        sweep.reset()
+        self.assertEqual(sweep.get_statistics(), [(0, 0), (0, 0)], msg="statistics should be reset")
+    
+    def test_no_valid_configuration(self):
+        
+        with self.assertRaises(ValueError):
+            TokenizerSweep(energy_thresholds=[50], min_lengths=[20], max_lengths=[10],
+                           max_continuous_silences=[5])
+
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+import struct
+import sys
+import wave
+
+from auditok import StreamTokenizer, AudioEnergyValidator, AdaptiveEnergyValidator, ADSFactory, \
+    WaveAudioSource, dataset
+
+_WITH_ASYNCIO = sys.version_info >= (3, 6)
+if _WITH_ASYNCIO:
+    import asyncio
+    from auditok.aio import AsyncStreamAudioSource, AsyncExecutorAudioSource, AsyncAudioDataSource
+
+_requires_asyncio = unittest.skipIf(not _WITH_ASYNCIO, "auditok.aio requires Python 3.6 or newer")
+
+
+def _collect(loop, agen):
+    tokens = []
+    while True:
+        try:
+            tokens.append(loop.run_until_complete(agen.__anext__()))
+        except StopAsyncIteration:
+            return tokens
+
+
+@_requires_asyncio
+class TestAsyncTokenize(unittest.TestCase):
+
+    def setUp(self):
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise, "r")
+        self.data = fp.readframes(fp.getnframes())
+        fp.close()
+        self.validator = AudioEnergyValidator(sample_width=2, energy_threshold=50)
+        self.tokenizer = StreamTokenizer(self.validator, min_length=20, max_length=1000,
+                                         max_continuous_silence=30)
+        ads = ADSFactory.ads(data_buffer=self.data, sampling_rate=16000, sample_width=2,
+                             channels=1, block_size=160)
+        ads.open()
+        self.expected = self.tokenizer.tokenize(ads)
+        ads.close()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def _stream_data_source(self, data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        dsource = AsyncAudioDataSource(AsyncStreamAudioSource(reader, sampling_rate=16000),
+                                       block_size=160)
+        self.loop.run_until_complete(dsource.open())
+        return dsource
+
+    def _assert_tokens_equal(self, tokens, expected):
+        self.assertEqual(len(tokens), len(expected),
+                         msg="wrong number of tokens, expected: {0}, found: {1} ".format(len(expected), len(tokens)))
+        for (data, start, end), (exp_data, exp_start, exp_end) in zip(tokens, expected):
+            self.assertEqual((start, end), (exp_start, exp_end),
+                             msg="wrong token position, expected: {0}, found: {1} ".format((exp_start, exp_end), (start, end)))
+            self.assertEqual(b"".join(data), b"".join(exp_data),
+                             msg="wrong token data for token {0}".format((start, end)))
+
+    def test_atokenize_stream(self):
+        dsource = self._stream_data_source(self.data)
+        tokens = _collect(self.loop, self.tokenizer.atokenize(dsource))
+        self._assert_tokens_equal(tokens, self.expected)
+
+    def test_atokenize_incomplete_sample(self):
+        # a trailing incomplete sample is dropped
+        dsource = self._stream_data_source(self.data + b"\x01")
+        tokens = _collect(self.loop, self.tokenizer.atokenize(dsource))
+        self._assert_tokens_equal(tokens, self.expected)
+
+    def test_atokenize_concurrent_streams(self):
+        nb_streams = 50
+        gens = [self.tokenizer.atokenize(self._stream_data_source(self.data))
+                for _ in range(nb_streams)]
+        results = [[] for _ in range(nb_streams)]
+        active = list(range(nb_streams))
+        while active:
+            # advance all streams at once on the same event loop
+            steps = self.loop.run_until_complete(
+                asyncio.gather(*[gens[i].__anext__() for i in active], return_exceptions=True))
+            still_active = []
+            for i, step in zip(active, steps):
+                if isinstance(step, StopAsyncIteration):
+                    continue
+                if isinstance(step, BaseException):
+                    raise step
+                results[i].append(step)
+                still_active.append(i)
+            active = still_active
+
+        for tokens in results:
+            self._assert_tokens_equal(tokens, self.expected)
+
+    def test_atokenize_interleaved_streams_stateful_validator(self):
+        # each stream has its own copy of the validator, the noise floor of
+        # an AdaptiveEnergyValidator must not leak from one stream to another
+        quiet = struct.pack("<{0}h".format(len(self.data) // 2),
+                            *[sample // 20 for sample in struct.unpack("<{0}h".format(len(self.data) // 2), self.data)])
+        streams = [self.data, quiet]
+        
+        def new_tokenizer():
+            validator = AdaptiveEnergyValidator(sample_width=2, margin=10, window=100)
+            return StreamTokenizer(validator, min_length=20, max_length=1000, max_continuous_silence=30)
+        
+        expected = [_collect(self.loop, new_tokenizer().atokenize(self._stream_data_source(data)))
+                    for data in streams]
+        
+        tokenizer = new_tokenizer()
+        gens = [tokenizer.atokenize(self._stream_data_source(data)) for data in streams]
+        results = [[] for _ in streams]
+        active = list(range(len(streams)))
+        while active:
+            steps = self.loop.run_until_complete(
+                asyncio.gather(*[gens[i].__anext__() for i in active], return_exceptions=True))
+            still_active = []
+            for i, step in zip(active, steps):
+                if isinstance(step, StopAsyncIteration):
+                    continue
+                if isinstance(step, BaseException):
+                    raise step
+                results[i].append(step)
+                still_active.append(i)
+            active = still_active
+        
+        for tokens, exp_tokens in zip(results, expected):
+            self._assert_tokens_equal(tokens, exp_tokens)
+
+    def test_atokenize_executor_audio_source(self):
+        audio_source = AsyncExecutorAudioSource(WaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise))
+        dsource = AsyncAudioDataSource(audio_source, block_dur=0.01)
+        self.loop.run_until_complete(dsource.open())
+        self.assertTrue(dsource.is_open(), msg="audio source should be open")
+        tokens = _collect(self.loop, self.tokenizer.atokenize(dsource))
+        self.loop.run_until_complete(dsource.close())
+        self.assertFalse(dsource.is_open(), msg="audio source should be closed")
+        self._assert_tokens_equal(tokens, self.expected)
+
+    def test_atokenize_keeps_tokenizer_state(self):
+        frames = [self.data[i: i + 320] for i in range(0, len(self.data), 320)]
+        pushed = self.tokenizer.feed(frames[:300])
+        dsource = self._stream_data_source(self.data)
+        tokens = _collect(self.loop, self.tokenizer.atokenize(dsource))
+        self._assert_tokens_equal(tokens, self.expected)
+        # the push session of the tokenizer is not affected
+        pushed += self.tokenizer.feed(frames[300:])
+        pushed += self.tokenizer.flush()
+        self._assert_tokens_equal(pushed, self.expected)
+
+    def test_read_not_open(self):
+        audio_source = AsyncStreamAudioSource(asyncio.StreamReader())
+        with self.assertRaises(IOError):
+            self.loop.run_until_complete(audio_source.read(10))
+
+    def test_wrong_block_size(self):
+        audio_source = AsyncStreamAudioSource(None, sampling_rate=16000)
+        with self.assertRaises(ValueError):
+            AsyncAudioDataSource(audio_source, block_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
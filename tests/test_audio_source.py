@@ -4,8 +4,20 @@ September 2015
 
 '''
 import unittest
+import os
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+import wave
 
-from auditok import BufferAudioSource
+from auditok import BufferAudioSource, WaveAudioSource, MmapWaveAudioSource, FFmpegAudioSource, \
+    PrefetchAudioSource, dataset
+
+_requires_mmap_buffers = unittest.skipIf(sys.version_info < (3, 0), "MmapWaveAudioSource requires Python 3")
 
 
 class TestBufferAudioSource_SR10_SW1_CH1(unittest.TestCase):
@@ -450,6 +462,72 @@ class TestBufferAudioSource_SR11_SW4_CH1(unittest.TestCase):
             self.assertRaises(ValueError, self.audio_source.set_data("abcdef"))
 
 
+class TestBufferAudioSource_SR8_SW2_CH2(unittest.TestCase):
+
+    def setUp(self):
+        self.signal = "ABCDEFGHIJKLMNOPQRSTUVWXYZ012345"
+        self.audio_source = BufferAudioSource(data_buffer=self.signal,
+                                              sampling_rate=8, sample_width=2, channels=2)
+        self.audio_source.open()
+
+    def tearDown(self):
+        self.audio_source.close()
+
+    def test_sr8_sw2_ch2_read_multiple(self):
+
+        block = self.audio_source.read(1)
+        self.assertEqual(block, "ABCD", msg="wrong block, expected: 'ABCD', found: {0} ".format(block))
+
+        block = self.audio_source.read(3)
+        self.assertEqual(block, "EFGHIJKLMNOP", msg="wrong block, expected: 'EFGHIJKLMNOP', found: {0} ".format(block))
+
+        block = self.audio_source.read(9999)
+        self.assertEqual(block, "QRSTUVWXYZ012345", msg="wrong block, expected: 'QRSTUVWXYZ012345', found: {0} ".format(block))
+
+    def test_sr8_sw2_ch2_get_channels(self):
+
+        channels = self.audio_source.get_channels()
+        self.assertEqual(channels, 2, msg="wrong number of channels, expected: 2, found: {0} ".format(channels))
+
+    def test_sr8_sw2_ch2_get_position_5(self):
+
+        self.audio_source.read(5)
+        pos = self.audio_source.get_position()
+        self.assertEqual(pos, 5, msg="wrong position, expected: 5, found: {0} ".format(pos))
+
+    def test_sr8_sw2_ch2_set_position_3(self):
+
+        self.audio_source.set_position(3)
+        pos = self.audio_source.get_position()
+        self.assertEqual(pos, 3, msg="wrong position, expected: 3, found: {0} ".format(pos))
+
+        block = self.audio_source.read(1)
+        self.assertEqual(block, "MNOP", msg="wrong block, expected: 'MNOP', found: {0} ".format(block))
+
+    def test_sr8_sw2_ch2_get_time_position_0_5(self):
+
+        self.audio_source.read(4)
+        tp = self.audio_source.get_time_position()
+        self.assertEqual(tp, 0.5, msg="wrong time position, expected: 0.5, found: {0} ".format(tp))
+
+    def test_sr8_sw2_ch2_set_time_position_end(self):
+
+        self.audio_source.set_time_position(1)
+        pos = self.audio_source.get_position()
+        self.assertEqual(pos, 8, msg="wrong position, expected: 8, found: {0} ".format(pos))
+        self.assertIsNone(self.audio_source.read(1), msg="expected None at end of data")
+
+    def test_sr8_sw2_ch2_set_data_exception(self):
+
+        with self.assertRaises(ValueError):
+            self.audio_source.set_data("abcdef")
+
+    def test_channels_exception(self):
+
+        with self.assertRaises(ValueError):
+            BufferAudioSource(data_buffer="", sampling_rate=8, sample_width=2, channels=0)
+
+
 class TestAudioSourceProperties(unittest.TestCase):
 
     def test_read_properties(self):
@@ -506,5 +584,538 @@ class TestAudioSourceShortProperties(unittest.TestCase):
             a_source.ch = 2
 
 
+@_requires_mmap_buffers
+class TestMmapWaveAudioSource(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = dataset.one_to_six_arabic_16000_mono_bc_noise
+        self.audio_source = MmapWaveAudioSource(self.filename)
+        self.audio_source.open()
+
+    def tearDown(self):
+        self.audio_source.close()
+
+    def test_parameters(self):
+
+        wave_source = WaveAudioSource(self.filename)
+        self.assertEqual(self.audio_source.get_sampling_rate(), wave_source.get_sampling_rate(),
+                         msg="wrong sampling rate")
+        self.assertEqual(self.audio_source.get_sample_width(), wave_source.get_sample_width(),
+                         msg="wrong sample width")
+        self.assertEqual(self.audio_source.get_channels(), wave_source.get_channels(),
+                         msg="wrong number of channels")
+
+    def test_read_same_as_wave_audio_source(self):
+
+        wave_source = WaveAudioSource(self.filename)
+        wave_source.open()
+        nb_blocks = 0
+        while True:
+            block = self.audio_source.read(777)
+            expected = wave_source.read(777)
+            if expected is None:
+                self.assertIsNone(block, msg="expected None at the end of stream")
+                break
+            self.assertIsInstance(block, memoryview, msg="read should return a memoryview")
+            self.assertEqual(bytes(block), expected, msg="wrong block number {0}".format(nb_blocks))
+            nb_blocks += 1
+        wave_source.close()
+
+        self.assertEqual(self.audio_source.read(1), None, msg="expected None after the end of stream")
+
+    def test_get_data_buffer(self):
+
+        wave_source = WaveAudioSource(self.filename)
+        wave_source.open()
+        expected = wave_source.read(10 ** 9)
+        wave_source.close()
+
+        self.assertEqual(bytes(self.audio_source.get_data_buffer()), expected,
+                         msg="wrong data buffer")
+        self.audio_source.close()
+        self.assertEqual(bytes(self.audio_source.get_data_buffer()), expected,
+                         msg="wrong data buffer for a closed source")
+
+    def test_set_position(self):
+
+        self.audio_source.read(10)
+        self.audio_source.set_position(1000)
+        position = self.audio_source.get_position()
+        self.assertEqual(position, 1000, msg="wrong position, expected: 1000, found: {0}".format(position))
+        block = self.audio_source.read(5)
+
+        self.audio_source.rewind()
+        self.audio_source.read(1000)
+        expected = self.audio_source.read(5)
+        self.assertEqual(bytes(block), bytes(expected), msg="wrong block after set_position")
+
+    def test_set_time_position(self):
+
+        self.audio_source.set_time_position(1.5)
+        position = self.audio_source.get_position()
+        self.assertEqual(position, 24000, msg="wrong position, expected: 24000, found: {0}".format(position))
+        tp = self.audio_source.get_time_position()
+        self.assertEqual(tp, 1.5, msg="wrong time position, expected: 1.5, found: {0}".format(tp))
+
+    def test_set_position_end(self):
+
+        self.audio_source.set_position(10 ** 9)
+        block = self.audio_source.read(1)
+        self.assertIsNone(block, msg="expected None after the end of stream, found: {0}".format(block))
+
+    def test_set_position_exception(self):
+
+        with self.assertRaises(ValueError):
+            self.audio_source.set_position(-1)
+
+    def test_read_closed_exception(self):
+
+        self.audio_source.close()
+        with self.assertRaises(IOError):
+            self.audio_source.read(1)
+
+
+class TestMmapWaveAudioSourcePython2(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info >= (3, 0), "Python 2 only")
+    def test_python2_exception(self):
+
+        with self.assertRaises(ValueError):
+            MmapWaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise)
+
+
+class TestAudioSourceReadinto(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = dataset.one_to_six_arabic_16000_mono_bc_noise
+        wave_source = WaveAudioSource(self.filename)
+        wave_source.open()
+        self.data = wave_source.read(10 ** 9)
+        wave_source.close()
+
+    def _check_readinto(self, audio_source):
+        audio_source.open()
+        buffer = bytearray(777 * 2)
+        read_data = []
+        i = 0
+        while True:
+            # alternate read and readinto
+            if i % 3 == 0:
+                block = audio_source.read(777)
+                if block is None:
+                    break
+                read_data.append(bytes(block))
+            else:
+                nb_bytes = audio_source.readinto(buffer, 777)
+                if nb_bytes == 0:
+                    break
+                read_data.append(bytes(buffer[:nb_bytes]))
+            i += 1
+        audio_source.close()
+
+        self.assertEqual(b"".join(read_data), self.data, msg="wrong data read with readinto")
+        self.assertEqual(len(read_data[-1]), len(self.data) % (777 * 2),
+                         msg="wrong size for last block")
+
+    def test_buffer_audio_source_readinto(self):
+        self._check_readinto(BufferAudioSource(self.data, 16000, 2, 1))
+
+    def test_wave_audio_source_readinto(self):
+        self._check_readinto(WaveAudioSource(self.filename))
+
+    @_requires_mmap_buffers
+    def test_mmap_wave_audio_source_readinto(self):
+        self._check_readinto(MmapWaveAudioSource(self.filename))
+
+    def test_readinto_small_buffer_exception(self):
+        audio_source = BufferAudioSource(self.data, 16000, 2, 1)
+        audio_source.open()
+        with self.assertRaises(ValueError):
+            audio_source.readinto(bytearray(10), 10)
+
+    def test_readinto_closed_exception(self):
+        audio_sources = [BufferAudioSource(self.data, 16000, 2, 1), WaveAudioSource(self.filename)]
+        if sys.version_info >= (3, 0):
+            audio_sources.append(MmapWaveAudioSource(self.filename))
+        for audio_source in audio_sources:
+            with self.assertRaises(IOError):
+                audio_source.readinto(bytearray(20), 10)
+
+
+class TestMultiChannelWaveAudioSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "stereo.wav")
+        self.data = b"".join(struct.pack("<hh", i, -i) for i in range(1000))
+        fp = wave.open(self.filename, "w")
+        fp.setnchannels(2)
+        fp.setsampwidth(2)
+        fp.setframerate(8000)
+        fp.writeframes(self.data)
+        fp.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_all_channels(self):
+
+        audio_sources = [WaveAudioSource(self.filename)]
+        if sys.version_info >= (3, 0):
+            audio_sources.append(MmapWaveAudioSource(self.filename))
+        for audio_source in audio_sources:
+            self.assertEqual(audio_source.get_channels(), 2, msg="wrong number of channels")
+            audio_source.open()
+            block = audio_source.read(10)
+            self.assertEqual(bytes(block), self.data[:40], msg="wrong block for {0}".format(type(audio_source)))
+            audio_source.close()
+
+    @_requires_mmap_buffers
+    def test_mmap_set_position(self):
+
+        audio_source = MmapWaveAudioSource(self.filename)
+        audio_source.open()
+        audio_source.set_position(500)
+        block = audio_source.read(1)
+        self.assertEqual(bytes(block), self.data[2000:2004], msg="wrong block after set_position")
+        self.assertEqual(audio_source.get_position(), 501, msg="wrong position")
+        audio_source.close()
+
+
+# A stand-in for ffmpeg that only decodes wav files. It checks that data is
+# requested in the format of the file and writes data by small chunks.
+_DECODER_SCRIPT = """#!{executable}
+import sys
+import wave
+
+args = sys.argv[1:]
+try:
+    fp = wave.open(args[args.index("-i") + 1])
+except IOError as e:
+    sys.stderr.write(str(e))
+    sys.exit(1)
+
+expected = {{"-ar": str(fp.getframerate()), "-ac": str(fp.getnchannels()),
+             "-f": {{1: "s8", 2: "s16le", 4: "s32le"}}[fp.getsampwidth()]}}
+for option, value in expected.items():
+    if args[args.index(option) + 1] != value:
+        sys.stderr.write("unexpected value for " + option)
+        sys.exit(1)
+
+out = getattr(sys.stdout, "buffer", sys.stdout)
+while True:
+    data = fp.readframes(100)
+    if len(data) == 0:
+        break
+    out.write(data)
+    out.flush()
+"""
+
+_PROBER_SCRIPT = """#!{executable}
+import sys
+import wave
+
+fp = wave.open(sys.argv[-1])
+sys.stdout.write("sample_rate={{0}}\\nchannels={{1}}\\n".format(fp.getframerate(), fp.getnchannels()))
+"""
+
+
+class TestFFmpegAudioSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.decoder = os.path.join(self.tmpdir, "decoder.py")
+        with open(self.decoder, "w") as fp:
+            fp.write(_DECODER_SCRIPT.format(executable=sys.executable))
+        os.chmod(self.decoder, os.stat(self.decoder).st_mode | stat.S_IEXEC)
+        self.prober = os.path.join(self.tmpdir, "prober.py")
+        with open(self.prober, "w") as fp:
+            fp.write(_PROBER_SCRIPT.format(executable=sys.executable))
+        os.chmod(self.prober, os.stat(self.prober).st_mode | stat.S_IEXEC)
+
+        self.filename = dataset.one_to_six_arabic_16000_mono_bc_noise
+        fp = wave.open(self.filename)
+        self.data = fp.readframes(fp.getnframes())
+        fp.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _audio_source(self, filename=None):
+        return FFmpegAudioSource(filename or self.filename, sampling_rate=16000, sample_width=2,
+                                 channels=1, decoder=self.decoder)
+
+    def test_read(self):
+
+        audio_source = self._audio_source()
+        audio_source.open()
+        blocks = []
+        for size in (1, 160, 1000, 12345):
+            blocks.append(audio_source.read(size))
+            self.assertEqual(len(blocks[-1]), size * 2, msg="wrong block size, expected: {0}, found: {1}".format(size * 2, len(blocks[-1])))
+        while True:
+            block = audio_source.read(4000)
+            if block is None:
+                break
+            blocks.append(block)
+        audio_source.close()
+
+        self.assertEqual(b"".join(blocks), self.data, msg="wrong data read from decoder")
+
+    def test_readinto(self):
+
+        audio_source = self._audio_source()
+        audio_source.open()
+        buffer = bytearray(320)
+        blocks = []
+        while True:
+            nb_bytes = audio_source.readinto(buffer, 160)
+            if nb_bytes == 0:
+                break
+            blocks.append(bytes(buffer[:nb_bytes]))
+        audio_source.close()
+
+        self.assertEqual(b"".join(blocks), self.data, msg="wrong data read from decoder with readinto")
+
+    def test_close_before_end(self):
+
+        audio_source = self._audio_source()
+        audio_source.open()
+        audio_source.read(160)
+        audio_source.close()
+        self.assertFalse(audio_source.is_open(), msg="audio source should be closed")
+
+        # decoding starts again from the beginning
+        audio_source.open()
+        block = audio_source.read(160)
+        audio_source.close()
+        self.assertEqual(block, self.data[:320], msg="wrong data after reopening audio source")
+
+    def test_decoder_error(self):
+
+        audio_source = self._audio_source(os.path.join(self.tmpdir, "missing.wav"))
+        audio_source.open()
+        with self.assertRaises(IOError):
+            audio_source.read(160)
+        audio_source.close()
+
+    def test_wrong_audio_format(self):
+
+        audio_source = FFmpegAudioSource(self.filename, sampling_rate=8000, channels=1, decoder=self.decoder)
+        audio_source.open()
+        with self.assertRaises(IOError):
+            while audio_source.read(160) is not None:
+                pass
+        audio_source.close()
+
+    def test_read_closed(self):
+
+        audio_source = self._audio_source()
+        with self.assertRaises(IOError):
+            audio_source.read(160)
+
+    def test_file_format(self):
+
+        # stereo file at 8000 Hz, its format is kept if not given
+        filename = os.path.join(self.tmpdir, "stereo.wav")
+        fp = wave.open(filename, "w")
+        fp.setnchannels(2)
+        fp.setsampwidth(2)
+        fp.setframerate(8000)
+        fp.writeframes(self.data[:32000])
+        fp.close()
+
+        audio_source = FFmpegAudioSource(filename, decoder=self.decoder, prober=self.prober)
+        self.assertEqual(audio_source.get_sampling_rate(), 8000, msg="wrong sampling rate, expected: 8000, found: {0}".format(audio_source.get_sampling_rate()))
+        self.assertEqual(audio_source.get_channels(), 2, msg="wrong number of channels, expected: 2, found: {0}".format(audio_source.get_channels()))
+        audio_source.open()
+        block = audio_source.read(8000)
+        audio_source.close()
+        self.assertEqual(block, self.data[:32000], msg="wrong data read from decoder")
+
+    def test_probe_error(self):
+
+        with self.assertRaises(IOError):
+            FFmpegAudioSource(self.filename, decoder=self.decoder,
+                              prober=os.path.join(self.tmpdir, "missing_prober"))
+        with self.assertRaises(IOError):
+            FFmpegAudioSource(os.path.join(self.tmpdir, "missing.wav"), decoder=self.decoder,
+                              prober=self.prober)
+
+
+class WaitingAudioSource(BufferAudioSource):
+    # An audio source that can only be read once 'event' is set
+
+    def __init__(self, event, *args, **kwargs):
+        BufferAudioSource.__init__(self, *args, **kwargs)
+        self.event = event
+
+    def readinto(self, buffer, size):
+        self.event.wait()
+        return BufferAudioSource.readinto(self, buffer, size)
+
+
+class FailingAudioSource(BufferAudioSource):
+
+    def readinto(self, buffer, size):
+        raise IOError("cannot read data")
+
+
+class TestPrefetchAudioSource(unittest.TestCase):
+
+    def setUp(self):
+        fp = wave.open(dataset.one_to_six_arabic_16000_mono_bc_noise)
+        self.data = fp.readframes(fp.getnframes())
+        fp.close()
+
+    def _audio_source(self, **kwargs):
+        return PrefetchAudioSource(WaveAudioSource(dataset.one_to_six_arabic_16000_mono_bc_noise), **kwargs)
+
+    def test_read(self):
+
+        for chunk_size, nb_buffers in ((None, 4), (100, 1), (333, 3)):
+            audio_source = self._audio_source(chunk_size=chunk_size, nb_buffers=nb_buffers)
+            audio_source.open()
+            blocks = []
+            for size in (1, 160, 1000, 12345):
+                blocks.append(audio_source.read(size))
+                self.assertEqual(len(blocks[-1]), size * 2, msg="wrong block size, expected: {0}, found: {1}".format(size * 2, len(blocks[-1])))
+            while True:
+                block = audio_source.read(250)
+                if block is None:
+                    break
+                blocks.append(block)
+            self.assertIsNone(audio_source.read(250), msg="expected None after end of data")
+            audio_source.close()
+            self.assertEqual(b"".join(blocks), self.data, msg="wrong data for chunk_size={0}".format(chunk_size))
+
+    def test_readinto(self):
+
+        audio_source = self._audio_source(chunk_size=100, nb_buffers=2)
+        audio_source.open()
+        buffer = bytearray(320)
+        blocks = []
+        while True:
+            nb_bytes = audio_source.readinto(buffer, 160)
+            if nb_bytes == 0:
+                break
+            blocks.append(bytes(buffer[:nb_bytes]))
+        audio_source.close()
+        self.assertEqual(b"".join(blocks), self.data, msg="wrong data read with readinto")
+
+    def test_close_before_end(self):
+
+        audio_source = self._audio_source(chunk_size=100, nb_buffers=2)
+        audio_source.open()
+        audio_source.read(10)
+        audio_source.close()
+        self.assertFalse(audio_source.is_open(), msg="audio source should be closed")
+
+        audio_source.open()
+        block = audio_source.read(10)
+        audio_source.close()
+        self.assertEqual(block, self.data[:20], msg="wrong data after reopening audio source")
+
+    def test_prefetch_stalls(self):
+
+        # nothing is read: all buffers get filled and the background thread waits
+        audio_source = self._audio_source(chunk_size=100, nb_buffers=3)
+        audio_source.open()
+        for _ in range(500):
+            if audio_source.prefetch_stalls > 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(audio_source.fill_level, 3, msg="wrong fill level, expected: 3, found: {0}".format(audio_source.fill_level))
+        self.assertGreater(audio_source.prefetch_stalls, 0, msg="expected prefetch stalls")
+        self.assertEqual(audio_source.read_stalls, 0, msg="expected no read stalls")
+        audio_source.close()
+
+    def test_read_stalls(self):
+
+        event = threading.Event()
+        audio_source = PrefetchAudioSource(WaitingAudioSource(event, self.data[:320], 16000, 2, 1))
+        audio_source.open()
+        timer = threading.Timer(0.05, event.set)
+        timer.start()
+        block = audio_source.read(160)
+        audio_source.close()
+        timer.join()
+        self.assertEqual(block, self.data[:320], msg="wrong data read")
+        self.assertGreater(audio_source.read_stalls, 0, msg="expected read stalls")
+
+    def test_read_exception(self):
+
+        audio_source = PrefetchAudioSource(FailingAudioSource(self.data, 16000, 2, 1))
+        audio_source.open()
+        with self.assertRaises(IOError):
+            audio_source.read(160)
+        audio_source.close()
+
+    def test_read_closed(self):
+
+        audio_source = self._audio_source()
+        with self.assertRaises(IOError):
+            audio_source.read(160)
+
+    def test_parameters_exception(self):
+
+        with self.assertRaises(ValueError):
+            self._audio_source(chunk_size=0)
+        with self.assertRaises(ValueError):
+            self._audio_source(nb_buffers=0)
+
+
+@_requires_mmap_buffers
+class TestMmapWaveAudioSourceHeader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_wave(self, data, chunks_before_data=(), sampling_rate=8000, sample_width=2,
+                    audio_format=1):
+        fmt = struct.pack("<HHIIHH", audio_format, 1, sampling_rate,
+                          sampling_rate * sample_width, sample_width, sample_width * 8)
+        body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        for chunk_id, chunk_data in chunks_before_data:
+            body += chunk_id + struct.pack("<I", len(chunk_data)) + chunk_data
+            if len(chunk_data) % 2 == 1:
+                body += b"\x00"
+        body += b"data" + struct.pack("<I", len(data)) + data
+        filename = os.path.join(self.tmpdir, "test.wav")
+        with open(filename, "wb") as fp:
+            fp.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+        return filename
+
+    def test_extra_chunks_before_data(self):
+
+        data = b"".join(struct.pack("<h", i) for i in range(100))
+        filename = self._write_wave(data, [(b"LIST", b"odd"), (b"fact", b"\x64\x00\x00\x00")])
+        audio_source = MmapWaveAudioSource(filename)
+        audio_source.open()
+        block = audio_source.read(1000)
+        audio_source.close()
+
+        self.assertEqual(audio_source.get_sampling_rate(), 8000, msg="wrong sampling rate")
+        self.assertEqual(bytes(block), data, msg="wrong data read from file with extra chunks")
+
+    def test_not_wave_file_exception(self):
+
+        filename = os.path.join(self.tmpdir, "test.wav")
+        with open(filename, "wb") as fp:
+            fp.write(b"\x00" * 100)
+
+        with self.assertRaises(ValueError):
+            MmapWaveAudioSource(filename)
+
+    def test_not_pcm_exception(self):
+
+        filename = self._write_wave(b"\x00" * 10, audio_format=3)
+        with self.assertRaises(ValueError):
+            MmapWaveAudioSource(filename)
+
+
 if __name__ == "__main__":
     unittest.main()